@@ -1,8 +1,7 @@
 import streamlit as st
 
-from utils.io import load_bom, load_materials, load_processes, load_quotes
-from utils.pricing import compute_costs
-from utils.quotes import apply_best_quotes
+from utils.cost_cache import costed_bom
+from utils.repository import load_bom, load_materials, load_processes, load_quotes
 from utils.safe import guard
 
 
@@ -12,7 +11,7 @@ def main():
     procs = load_processes()
     bom = load_bom()
     quotes = load_quotes()
-    df = compute_costs(apply_best_quotes(mats, quotes), procs, bom)
+    df = costed_bom(mats, procs, bom, quotes)
     st.dataframe(
         df[
             [
@@ -1,7 +1,7 @@
 import streamlit as st
 
-from utils.io import load_materials, load_quotes
 from utils.quotes import best_quotes, join_with_materials
+from utils.repository import load_materials, load_quotes
 from utils.safe import guard
 
 
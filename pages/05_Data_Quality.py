@@ -1,6 +1,6 @@
 import streamlit as st
 
-from utils.io import load_bom, load_materials, load_processes
+from utils.repository import load_bom, load_materials, load_processes
 from utils.safe import guard
 from utils.validators import (
     all_rules_ok,
@@ -1,23 +1,29 @@
+import numpy as np
 import streamlit as st
 
-from utils.io import load_bom, load_materials, load_processes
-from utils.pricing import compute_costs
+from utils.cost_cache import costed_bom
+from utils.repository import load_bom, load_materials, load_processes
 from utils.safe import guard
+from utils.scenarios import Scenario, ScenarioModel
 
 
 def main():
     st.title("🧭 Scenario Planner")
-    mats = load_materials().copy()
-    procs = load_processes().copy()
-    bom = load_bom().copy()
+    # Eén calculatie op de gedeelde tabellen; scenario's rekenen daarna op arrays
+    model = ScenarioModel(costed_bom(load_materials(), load_processes(), load_bom()))
     mat_delta = st.sidebar.slider("Materiaalprijs ± %", -50, 50, 0, 5)
     labor_delta = st.sidebar.slider("Arbeidsloon ± %", -50, 50, 0, 5)
     margin_delta = st.sidebar.slider("Marge ± %-punten", -20, 20, 0, 1)
-    mats["price_eur_per_kg"] *= 1 + mat_delta / 100.0
-    procs["labor_rate_eur_h"] *= 1 + labor_delta / 100.0
-    procs["margin_pct"] += margin_delta / 100.0
-    df = compute_costs(mats, procs, bom)
-    st.metric("Nieuw totaal (EUR)", f"{df['total_cost'].sum():,.2f}")
+    machine_delta = st.sidebar.slider("Machinetarief ± %", -50, 50, 0, 5)
+    scn = Scenario(
+        material=mat_delta, labor=labor_delta, margin=margin_delta, machine=machine_delta
+    )
+    df = model.costs(scn)
+    st.metric(
+        "Nieuw totaal (EUR)",
+        f"{df['total_cost'].sum():,.2f}",
+        delta=f"{model.total(scn) - model.base_total:,.2f}",
+    )
     st.dataframe(
         df[
             [
@@ -32,5 +38,25 @@ def main():
         ]
     )
 
+    # ======= Grid: materiaal × arbeid bij de gekozen marge/machine =======
+    st.subheader("Scenario-grid")
+    steps = np.arange(-50, 51, 5)
+    grid = model.grid(material=steps, labor=steps, margin=[margin_delta], machine=[machine_delta])
+    st.caption("Totaal (EUR) per materiaalprijs (rijen) × arbeidsloon (kolommen), in %")
+    st.dataframe(grid.slice2d("material", "labor").round(0), use_container_width=True)
+
+    # ======= Gevoeligheid =======
+    st.subheader("Gevoeligheid (rond het gekozen scenario)")
+    st.dataframe(model.sensitivity(scn), use_container_width=True)
+    tornado = model.tornado(at=scn)
+    st.bar_chart(tornado.set_index("label")[["delta_low", "delta_high"]])
+
+    # ======= Break-even =======
+    st.subheader("Break-even")
+    target = st.number_input(
+        "Doelprijs / budget (EUR)", min_value=0.0, value=float(round(model.total(scn), 2))
+    )
+    st.dataframe(model.break_even(target, at=scn), use_container_width=True)
+
 
 guard(main)
@@ -1,6 +1,7 @@
 import streamlit as st
 
-from utils.io import load_bom, load_materials, load_processes, load_quotes
+from utils.cost_cache import stats as cost_cache_stats
+from utils.repository import load_bom, load_materials, load_processes, load_quotes, stats
 from utils.safe import guard
 
 
@@ -17,6 +18,10 @@ def main():
             st.dataframe(loader())
         except Exception as e:
             st.error(f"{name}: {e}")
+    st.subheader("Data-cache (hits/misses)")
+    st.dataframe(stats())
+    st.subheader("Kostencache (hits/misses/evictions)")
+    st.dataframe(cost_cache_stats())
 
 
 guard(main)
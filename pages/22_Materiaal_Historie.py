@@ -8,11 +8,13 @@ import pandas as pd
 import streamlit as st
 
 from utils.history import (
-    build_history_df,
+    RESOLUTIONS,
+    chart_frame,
+    diff_latest,
     diff_vs_latest,
     find_anomalies,
-    get_price_series,
     load_materials,
+    query_history,
     save_snapshot_current,
 )
 from utils.safe import guard
@@ -59,12 +61,13 @@ def main():
             "Materialen", all_ids, default=all_ids[: min(5, len(all_ids))]
         )
 
-    # Volledige historie voor selectie
-    hist = build_history_df(sel_ids).copy()
+    # Volledige historie voor selectie (uit de geïndexeerde store)
+    hist = query_history(sel_ids).copy()
     if "date" in hist.columns and not pd.api.types.is_datetime64_any_dtype(hist["date"]):
         hist["date"] = pd.to_datetime(hist["date"], errors="coerce")
 
     dmin, dmax = _date_bounds(hist)
+    d_from = d_to = None
     if dmin is not None:
         d_from, d_to = st.sidebar.date_input(
             "Periode",
@@ -82,6 +85,9 @@ def main():
                 (hist["date"] >= pd.Timestamp(d_from)) & (hist["date"] <= pd.Timestamp(d_to))
             ]
 
+    res_labels = {"Automatisch": None, **{v: k for k, v in RESOLUTIONS.items()}}
+    res_pick = st.sidebar.selectbox("Resolutie grafiek", list(res_labels), index=0)
+
     # ======= Acties (snapshots & diffs) =======
     c1, c2, c3 = st.columns(3)
     with c1:
@@ -101,6 +107,13 @@ def main():
                     anomalies[["material_id", "old_price", "new_price", "pct_change"]],
                     use_container_width=True,
                 )
+            full = diff_latest()
+            if full is not None:
+                c = full.counts()
+                with st.expander(
+                    f"Wijzigingen alle velden (+{c['added']} / -{c['removed']} / ~{c['changed']})"
+                ):
+                    st.dataframe(full.changes(), use_container_width=True)
             st.download_button(
                 "Download diff.csv",
                 data=_to_csv_bytes(dif),
@@ -129,17 +142,22 @@ def main():
     if hist.empty:
         st.info("Geen historie gevonden binnen de huidige filters.")
     else:
-        # Eén materiaal: simpele lijn; meerdere: pivot naar wide
-        if pick_mode == "Eén materiaal":
-            series = get_price_series(sel_ids[0])
-            if not series.empty:
-                chart = series.rename(columns={"price_eur_per_kg": "EUR/kg"}).set_index("date")
-                st.line_chart(chart)
-            st.dataframe(series, use_container_width=True)
-        else:
-            wide = hist.pivot_table(
-                index="date", columns="material_id", values="price_eur_per_kg", aggfunc="last"
-            ).sort_index()
+        # Vooraf berekende week/maand-aggregaten; resolutie volgt de gekozen periode
+        wide, freq = chart_frame(sel_ids, d_from, d_to, freq=res_labels[res_pick])
+        st.caption(f"Resolutie: {RESOLUTIONS[freq].lower()} ({len(wide)} punten per lijn)")
+        if pick_mode == "Eén materiaal" and not wide.empty and freq != "D":
+            # Eén materiaal: laatste prijs met min/max binnen de periode
+            chart = pd.DataFrame(
+                {
+                    stat: chart_frame(sel_ids, d_from, d_to, freq=freq, stat=stat)[0].iloc[:, 0]
+                    for stat in ("last", "min", "max")
+                }
+            )
+            st.line_chart(chart)
+            vol, _ = chart_frame(sel_ids, d_from, d_to, freq=freq, stat="volatility")
+            with st.expander("Volatiliteit (rollende std van periode-rendementen)"):
+                st.line_chart(vol)
+        elif not wide.empty:
             st.line_chart(wide)
             with st.expander("Toon tabel (gepivot)"):
                 st.dataframe(wide.reset_index(), use_container_width=True)
@@ -1,18 +1,33 @@
+from datetime import datetime
 from pathlib import Path
 
 import streamlit as st
 
+from utils.snapshots import is_delta, is_ref, snapshot_day, snapshot_files
+
 H = Path("data/history")
 st.title("🆘 Restore Hulp (read-only)")
 if not H.exists():
     st.info("Nog geen snapshots in data/history/. Draai eerst de Weekly Market Update.")
 else:
-    snaps = sorted([p.name for p in H.glob("materials_*.csv")])
+    snaps = snapshot_files(H)
     if not snaps:
         st.info("Geen snapshots gevonden.")
     else:
         st.write(f"Gevonden snapshots: {len(snaps)}")
-        st.table({"snapshots": snaps})
+        # Eén regel per dag; deltas en refs zijn opslagdetails, herstel werkt op de datum
+        st.table(
+            {
+                "datum": [
+                    datetime.strptime(snapshot_day(p), "%Y%m%d").date().isoformat() for p in snaps
+                ],
+                "restore-argument": [snapshot_day(p) for p in snaps],
+                "opslag": [
+                    "delta" if is_delta(p) else "verwijzing" if is_ref(p) else "volledig"
+                    for p in snaps
+                ],
+            }
+        )
         st.caption(
             "Start het herstel in GitHub → Actions → “Panic Button: Restore materials_db.csv from history”."
         )
@@ -3,6 +3,9 @@ from pathlib import Path
 import pandas as pd
 import streamlit as st
 
+from utils.anomalies import StatAnomalyConfig, flag_scores
+from utils.history import history_anomalies, stat_anomalies_vs_latest
+
 H = Path("data/history")
 st.title("🚨 Anomalie Overzicht")
 
@@ -17,3 +20,21 @@ else:
         df = pd.read_csv(H / pick)
         st.write(f"Regels: {len(df)} | Bestand: {pick}")
         st.dataframe(df, use_container_width=True)
+
+    # ======= Statistisch (volledige historie) =======
+    st.subheader("Statistische anomalieën (z-score / MAD per materiaal)")
+    c1, c2, c3 = st.columns(3)
+    window = c1.number_input("Venster (prijsstappen)", min_value=5, max_value=365, value=30)
+    z_thr = c2.number_input("z-drempel", min_value=1.0, max_value=20.0, value=3.0, step=0.5)
+    mad_thr = c3.number_input("MAD-drempel", min_value=1.0, max_value=20.0, value=3.5, step=0.5)
+    cfg = StatAnomalyConfig(window=int(window), z_threshold=z_thr, mad_threshold=mad_thr)
+
+    cur = flag_scores(stat_anomalies_vs_latest(cfg), cfg)
+    st.metric("Huidige prijzen buiten historische spreiding", len(cur))
+    if not cur.empty:
+        st.dataframe(cur, use_container_width=True)
+
+    with st.expander("Historische prijsstappen boven de drempel"):
+        hist = history_anomalies(cfg)
+        st.write(f"Regels: {len(hist)}")
+        st.dataframe(hist, use_container_width=True)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.cost_cache import costed_bom
+from utils.history import price_returns
+from utils.montecarlo import MonteCarloConfig, price_risk, simulate_costs
+from utils.repository import load_bom, load_materials, load_processes, load_quotes
+from utils.safe import guard
+
+FREQS = {"W": "weken", "M": "maanden"}
+
+
+def main():
+    st.title("🎲 Kostenrisico (Monte Carlo)")
+    procs = load_processes()
+    lines = costed_bom(load_materials(), procs, load_bom(), load_quotes())
+    if lines.empty:
+        st.info("De BOM is leeg: er valt niets te simuleren.")
+        return
+
+    st.sidebar.header("Simulatie")
+    freq = st.sidebar.selectbox("Periode", list(FREQS), format_func=FREQS.get)
+    horizon = st.sidebar.number_input(f"Horizon ({FREQS[freq]})", 1, 104, 12)
+    n_sims = st.sidebar.number_input("Aantal simulaties", 1_000, 200_000, 10_000, step=1_000)
+    seed = st.sidebar.number_input("Seed", 0, 2**31 - 1, 42)
+    workers = st.sidebar.number_input("Processen", 1, 16, 1)
+
+    risk = price_risk(price_returns(freq, lines["material_id"].dropna().unique()), freq=freq)
+    cfg = MonteCarloConfig(
+        n_sims=int(n_sims), horizon=int(horizon), seed=int(seed), workers=int(workers)
+    )
+    res = simulate_costs(lines, risk, cfg, keep_samples=True, procs=procs)
+    if res.projects.empty:
+        st.info("Geen regels met een kostprijs om te simuleren.")
+        return
+
+    proj = res.projects.iloc[0]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Vaste prijs (EUR)", f"{proj['base_total']:,.2f}")
+    c2.metric("P50", f"{proj['p50']:,.2f}")
+    c3.metric("P90", f"{proj['p90']:,.2f}")
+    c4.metric("P95", f"{proj['p95']:,.2f}", delta=f"{proj['risk_premium']:,.2f}")
+    if not res.materials["history"].any():
+        st.info("Geen materialen met voldoende historie: prijzen blijven vast.")
+
+    counts, edges = np.histogram(res.samples[:, 0], bins=50)
+    st.bar_chart(pd.DataFrame({"simulaties": counts}, index=np.round(edges[:-1], 2)))
+
+    st.subheader("Per regel")
+    st.dataframe(res.lines, use_container_width=True)
+    with st.expander("Materialen (prijs en volatiliteit over de horizon)"):
+        st.dataframe(res.materials, use_container_width=True)
+
+
+guard(main)
@@ -0,0 +1,52 @@
+import streamlit as st
+
+from utils.bom_tree import explode_bom
+from utils.quotes import apply_best_quotes
+from utils.repository import load_bom, load_materials, load_processes, load_quotes
+from utils.safe import guard
+
+
+def main():
+    st.title("🌳 BOM Structuur")
+    st.caption(
+        "Optionele kolommen in bom.csv: parent_id (assembly van de regel) en child_id "
+        "(regel = qty × sub-assembly)."
+    )
+    mats = apply_best_quotes(load_materials(), load_quotes())
+    try:
+        ex = explode_bom(mats, load_processes(), load_bom())
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    st.metric("Kostprijs per product (EUR)", f"{ex.totals['total_cost']:,.2f}")
+    if ex.undefined:
+        st.warning(f"Sub-assemblies zonder regels (tellen als 0): {', '.join(ex.undefined)}")
+    if ex.orphans:
+        st.warning(
+            f"Assemblies die het product niet gebruikt (tellen niet mee): {', '.join(ex.orphans)}"
+        )
+    if ex.unpriced:
+        st.warning(f"Materialen zonder kostprijs (tellen als 0): {', '.join(ex.unpriced)}")
+
+    st.subheader("Assemblies (kosten per stuk)")
+    st.dataframe(ex.assemblies, use_container_width=True)
+    st.subheader("Uitgeklapte regels")
+    st.dataframe(
+        ex.lines[
+            [
+                "assembly_id",
+                "line_id",
+                "material_id",
+                "qty",
+                "assembly_qty",
+                "ext_qty",
+                "total_cost",
+                "ext_total_cost",
+            ]
+        ],
+        use_container_width=True,
+    )
+
+
+guard(main)
@@ -0,0 +1,38 @@
+import pandas as pd
+import streamlit as st
+
+from utils.quotes import apply_best_quotes
+from utils.repository import load_bom, load_materials, load_processes, load_quotes
+from utils.safe import guard
+from utils.volume import QUANTITIES, VolumeModel
+
+
+def main():
+    st.title("📉 Staffelprijzen")
+    st.caption(
+        "Kostprijs per stuk per ordergrootte. Insteltijd uit routing.csv (process_id,setup_h); "
+        "staffels uit quotes met kolom min_qty_kg."
+    )
+    raw = st.sidebar.text_input("Ordergroottes", ", ".join(str(q) for q in QUANTITIES))
+    try:
+        quantities = [float(x) for x in raw.replace(";", ",").split(",") if x.strip()]
+    except ValueError:
+        st.error("Ordergroottes moeten getallen zijn, gescheiden door komma's.")
+        return
+    up = st.sidebar.file_uploader("routing.csv (optioneel)", type=["csv"])
+    routing = pd.read_csv(up) if up else None
+
+    quotes = load_quotes()
+    model = VolumeModel(
+        apply_best_quotes(load_materials(), quotes), load_processes(), load_bom(), quotes, routing
+    )
+    curve = model.curve(quantities)
+
+    st.subheader("Per stuk")
+    st.line_chart(curve.totals.set_index("order_qty")[["total_cost"]])
+    st.dataframe(curve.totals, use_container_width=True)
+    with st.expander("Per regel"):
+        st.dataframe(curve.lines, use_container_width=True)
+
+
+guard(main)
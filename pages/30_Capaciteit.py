@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.capacity import FREQS, capacity_report
+from utils.safe import guard
+
+
+def main():
+    st.title("🏭 Capaciteit & bezetting")
+    st.write(
+        "Upload orders.csv (order_id,process_route,qty,start_date[,due_date]), "
+        "routing.csv (process_id,time_h_per_unit,setup_h) en "
+        "capaciteit.csv (process_id,hours_per_day[,date])."
+    )
+    orders = st.file_uploader("orders.csv", type=["csv"])
+    routing = st.file_uploader("routing.csv", type=["csv"])
+    calendar = st.file_uploader("capaciteit.csv", type=["csv"])
+    freq = st.sidebar.selectbox("Bucket", list(FREQS), index=1, format_func=FREQS.get)
+    if not (orders and routing):
+        return
+    lines = pd.read_csv(orders)
+    end_col = "due_date" if "due_date" in lines.columns else None
+    rep = capacity_report(
+        lines,
+        pd.read_csv(routing),
+        pd.read_csv(calendar) if calendar else None,
+        freq=freq,
+        end_col=end_col,
+    )
+    if rep.unscheduled_h:
+        st.warning(f"{rep.unscheduled_h:,.1f} uur zonder geldige startdatum niet ingepland.")
+
+    st.subheader("Per machine")
+    st.dataframe(rep.summary, use_container_width=True)
+    st.subheader("Bezetting per bucket")
+    # Load zonder capaciteit geeft utilisation inf; die buckets staan in de tabel eronder
+    util = rep.load.pivot(index="bucket", columns="process_id", values="utilisation")
+    st.line_chart(util.replace([np.inf, -np.inf], np.nan))
+    st.subheader("Overbelasting")
+    if rep.overloads.empty:
+        st.success("Geen overbelaste perioden.")
+    else:
+        n = int(rep.overloads["no_capacity_buckets"].sum())
+        if n:
+            st.warning(
+                f"{n} overbelaste bucket(s) met load maar zonder capaciteit; "
+                "die ontbreken in de grafiek (zie no_capacity_buckets)."
+            )
+        st.dataframe(rep.overloads, use_container_width=True)
+    with st.expander("Load en capaciteit per bucket"):
+        st.dataframe(rep.load, use_container_width=True)
+
+
+guard(main)
@@ -5,7 +5,9 @@ from urllib.parse import urlparse
 import pandas as pd
 import streamlit as st
 
+from utils.history import ingest_snapshot
 from utils.safe import guard
+from utils.snapshots import find_snapshot, write_snapshot
 
 
 def edit_url_to_csv(edit_url: str, gid: str | int = 0) -> str:
@@ -46,6 +48,13 @@ def write_and_snapshot(df: pd.DataFrame, target: Path, history_prefix: str):
     hist_dir = Path("data/history")
     hist_dir.mkdir(parents=True, exist_ok=True)
     stamp = pd.Timestamp.utcnow().strftime("%Y%m%d")
+    if history_prefix == "materials_":
+        # Materials-snapshots mogen als delta worden opgeslagen
+        snap = find_snapshot(hist_dir, stamp)
+        if snap is None:
+            snap = write_snapshot(df, hist_dir, stamp)
+            ingest_snapshot(snap)
+        return target, snap
     snap = hist_dir / f"{history_prefix}{stamp}.csv"
     if not snap.exists():
         df.to_csv(snap, index=False)
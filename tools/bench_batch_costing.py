@@ -0,0 +1,98 @@
+# tools/bench_batch_costing.py
+"""Benchmark: compute_costs_batch (één pass) vs. een lus van compute_costs per project.
+
+Synthetisch: --projects BOMs van 5..--max-lines regels tegen --materials materialen.
+Controleert dat regels en projecttotalen gelijk zijn aan de lus.
+
+Gebruik: python tools/bench_batch_costing.py [--projects 1000] [--max-lines 80]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils.pricing import COST_COLUMNS, compute_costs, compute_costs_batch  # noqa: E402
+
+PROCS = ["LASER_CUT", "CNC_MILL_3AX", "CNC_LATHE", "BENDING", "TIG_WELD"]
+
+
+def make_tables(n_mats: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    mats = pd.DataFrame(
+        {
+            "material_id": [f"MAT_{i:05d}" for i in range(n_mats)],
+            "description": [f"Materiaal {i}" for i in range(n_mats)],
+            "price_eur_per_kg": rng.uniform(0.8, 12, n_mats).round(2),
+        }
+    )
+    procs = pd.DataFrame(
+        {
+            "process_id": PROCS,
+            "machine_rate_eur_h": [65.0, 80.0, 70.0, 55.0, 60.0],
+            "labor_rate_eur_h": [35.0, 45.0, 40.0, 35.0, 45.0],
+            "overhead_pct": [0.15, 0.2, 0.2, 0.15, 0.2],
+            "margin_pct": [0.1, 0.1, 0.1, 0.1, 0.12],
+        }
+    )
+    return mats, procs
+
+
+def make_boms(n_projects: int, max_lines: int, n_mats: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    boms = {}
+    for p in range(n_projects):
+        n = int(rng.integers(5, max_lines + 1))
+        boms[f"P{p:05d}"] = pd.DataFrame(
+            {
+                "line_id": [f"L{i}" for i in range(n)],
+                # ~2% onbekende materialen (NaN-prijs), zoals in de praktijk
+                "material_id": [f"MAT_{i:05d}" for i in rng.integers(0, int(n_mats * 1.02), n)],
+                "qty": rng.integers(1, 500, n),
+                "mass_kg": rng.random(n) * 20,
+                "process_route": np.array(PROCS)[rng.integers(0, len(PROCS), n)],
+                "runtime_h": rng.random(n) * 3,
+            }
+        )
+    return boms
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--projects", type=int, default=1000)
+    ap.add_argument("--max-lines", type=int, default=80)
+    ap.add_argument("--materials", type=int, default=5000)
+    args = ap.parse_args()
+
+    mats, procs = make_tables(args.materials)
+    boms = make_boms(args.projects, args.max_lines, args.materials)
+    n_lines = sum(len(b) for b in boms.values())
+    print(f"{args.projects} projecten, {n_lines} regels")
+
+    t0 = time.perf_counter()
+    loop = {k: compute_costs(mats, procs, b) for k, b in boms.items()}
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = compute_costs_batch(mats, procs, boms)
+    t_batch = time.perf_counter() - t0
+
+    expect = pd.concat(loop.values(), ignore_index=True)
+    pd.testing.assert_frame_equal(batch.lines.drop(columns="project_id"), expect)
+    sums = pd.DataFrame({k: df[COST_COLUMNS].sum() for k, df in loop.items()}).T
+    np.testing.assert_allclose(batch.totals[COST_COLUMNS].to_numpy(), sums.to_numpy(), rtol=1e-12)
+
+    print(f"lus compute_costs : {t_loop * 1000:8.1f} ms")
+    print(f"compute_costs_batch: {t_batch * 1000:8.1f} ms  ({t_loop / t_batch:.0f}x sneller)")
+    print("Regels identiek; projecttotalen gelijk (rtol 1e-12).")
+
+
+if __name__ == "__main__":
+    main()
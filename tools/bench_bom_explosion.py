@@ -0,0 +1,118 @@
+# tools/bench_bom_explosion.py
+"""Benchmark: explode_bom (memo, topologische volgorde) vs. recursief uitklappen per pad.
+
+Synthetisch: --levels lagen van --width sub-assemblies; elke assembly gebruikt
+--fanout willekeurige assemblies uit de laag eronder (gedeelde componenten, dus het
+aantal paden groeit als fanout^levels) en heeft --lines eigen regels. Controleert
+kosten per product en stuks per assembly tegen het recursieve pad.
+
+Gebruik: python tools/bench_bom_explosion.py [--levels 8] [--width 40] [--fanout 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import PROCS, make_tables  # noqa: E402
+from utils.bom_tree import TOP, explode_bom  # noqa: E402
+from utils.pricing import compute_costs  # noqa: E402
+
+
+def make_tree(levels: int, width: int, fanout: int, lines: int, n_mats: int, seed: int = 2):
+    rng = np.random.default_rng(seed)
+    layers = [[None]] + [[f"A{k}_{i}" for i in range(width)] for k in range(1, levels + 1)]
+    rows = []
+    for k, layer in enumerate(layers):
+        for a in layer:
+            for j in range(lines):
+                rows.append(
+                    {
+                        "line_id": f"{a or 'TOP'}-L{j}",
+                        "material_id": f"MAT_{rng.integers(0, n_mats):05d}",
+                        "qty": int(rng.integers(1, 10)),
+                        "mass_kg": float(rng.random() * 5),
+                        "process_route": PROCS[rng.integers(0, len(PROCS))],
+                        "runtime_h": float(rng.random()),
+                        "parent_id": a,
+                        "child_id": None,
+                    }
+                )
+            if k < levels:
+                for c in rng.choice(layers[k + 1], size=min(fanout, width), replace=False):
+                    rows.append(
+                        {
+                            "line_id": f"{a or 'TOP'}-U{c}",
+                            "qty": int(rng.integers(1, 4)),
+                            "parent_id": a,
+                            "child_id": c,
+                        }
+                    )
+    bom = pd.DataFrame(rows)
+    bom["qty"] = bom["qty"].astype("Int64")
+    return bom
+
+
+def explode_recursive(mats, procs, bom):
+    """Referentie: elk pad apart uitklappen (geen memo)."""
+    leaf = bom[bom["child_id"].isna()]
+    costs = compute_costs(mats, procs, leaf.drop(columns=["parent_id", "child_id"]))
+    parents = leaf["parent_id"].fillna(TOP).to_numpy()
+    own = pd.Series(costs["total_cost"].to_numpy()).groupby(parents).sum().to_dict()
+    uses = bom[bom["child_id"].notna()]
+    children = {}
+    for p, c, q in zip(uses["parent_id"].fillna(TOP), uses["child_id"], uses["qty"]):
+        children.setdefault(p, []).append((c, float(q)))
+    count = {}
+
+    def walk(a, mult):
+        count[a] = count.get(a, 0.0) + mult
+        return own.get(a, 0.0) + sum(q * walk(c, mult * q) for c, q in children.get(a, []))
+
+    return walk(TOP, 1.0), count
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--levels", type=int, default=8)
+    ap.add_argument("--width", type=int, default=40)
+    ap.add_argument("--fanout", type=int, default=4)
+    ap.add_argument("--lines", type=int, default=5)
+    ap.add_argument("--materials", type=int, default=2000)
+    args = ap.parse_args()
+
+    mats, procs = make_tables(args.materials)
+    bom = make_tree(args.levels, args.width, args.fanout, args.lines, args.materials)
+    n_uses = int(bom["child_id"].notna().sum())
+    print(
+        f"{len(bom) - n_uses} regels, {n_uses} gebruiksrelaties, ~{args.fanout**args.levels} paden"
+    )
+
+    t0 = time.perf_counter()
+    ex = explode_bom(mats, procs, bom)
+    t_memo = time.perf_counter() - t0
+    print(f"explode_bom : {t_memo * 1000:8.1f} ms  ({len(ex.order)} assemblies)")
+
+    if args.fanout**args.levels > 2_000_000:
+        print("Recursief uitklappen overgeslagen (te veel paden).")
+        return
+    t0 = time.perf_counter()
+    total, count = explode_recursive(mats, procs, bom)
+    t_rec = time.perf_counter() - t0
+    np.testing.assert_allclose(ex.totals["total_cost"], total, rtol=1e-9)
+    got = ex.assemblies.set_index("assembly_id")["quantity"]
+    np.testing.assert_allclose(got.reindex(list(count)).to_numpy(), list(count.values()))
+    print(f"recursief   : {t_rec * 1000:8.1f} ms  ({t_rec / t_memo:.0f}x trager)")
+    print("Totaal en stuks per assembly gelijk (rtol 1e-9).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# tools/bench_capacity.py
+"""Benchmark: capacity_report (verschil-array + cumsum) vs. een lus per orderregel.
+
+Synthetisch: --orders orders met 1..5 regels over 5 machines, start binnen --days dagen
+en een doorlooptijd van 0..14 dagen. Controleert de dagload tegen de lus (op een
+deelverzameling) en dat er geen uren verloren gaan.
+
+Gebruik: python tools/bench_capacity.py [--orders 20000] [--check 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import PROCS  # noqa: E402
+from utils.capacity import capacity_report, daily_load  # noqa: E402
+from utils.routing import compute_routing_cost  # noqa: E402
+
+
+def make_orders(n_orders: int, days: int, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    per = rng.integers(1, 6, n_orders)
+    n = int(per.sum())
+    start = pd.Timestamp("2026-01-05") + pd.to_timedelta(
+        np.repeat(rng.integers(0, days, n_orders), per), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "order_id": np.repeat([f"O{i:06d}" for i in range(n_orders)], per),
+            "process_route": np.array(PROCS)[rng.integers(0, len(PROCS), n)],
+            "qty": rng.integers(1, 200, n),
+            "start_date": start,
+            "due_date": start + pd.to_timedelta(rng.integers(0, 15, n), unit="D"),
+        }
+    )
+
+
+def loop_load(lines, routing, machines, first, n_days):
+    """Referentie: per orderregel de uren over de werkdagen verdelen."""
+    df = compute_routing_cost(lines, routing)
+    load = np.zeros((len(machines), n_days))
+    origin = pd.Timestamp(np.datetime64(first, "D"))
+    for route, start, due, h in zip(
+        df["process_route"], df["start_date"], df["due_date"], df["routing_time_h"]
+    ):
+        i = machines.get_loc(route)
+        days = pd.bdate_range(start, due - pd.Timedelta(days=1)) if due > start else []
+        if len(days):
+            for d in days:
+                load[i, (d - origin).days] += h / len(days)
+        else:
+            # Geen werkdag in het venster: op de startdag, of de eerstvolgende werkdag
+            load[i, (pd.offsets.BDay().rollforward(start) - origin).days] += h
+    return load
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=20_000)
+    ap.add_argument("--days", type=int, default=180)
+    ap.add_argument("--check", type=int, default=2_000)
+    args = ap.parse_args()
+
+    lines = make_orders(args.orders, args.days)
+    routing = pd.DataFrame(
+        {
+            "process_id": PROCS,
+            "time_h_per_unit": [0.02, 0.08, 0.05, 0.01, 0.06],
+            "setup_h": [0.5, 1.5, 1.0, 0.25, 0.75],
+        }
+    )
+    calendar = pd.DataFrame({"process_id": PROCS, "hours_per_day": [16.0, 24.0, 16.0, 8.0, 16.0]})
+    print(f"{args.orders} orders, {len(lines)} regels")
+
+    t0 = time.perf_counter()
+    rep = capacity_report(lines, routing, calendar, freq="W", end_col="due_date")
+    t_vec = time.perf_counter() - t0
+
+    sub = lines.head(args.check)
+    machines, first, load, _ = daily_load(sub, routing, end_col="due_date")
+    t0 = time.perf_counter()
+    ref = loop_load(sub, routing, machines, first, load.shape[1])
+    t_loop = time.perf_counter() - t0
+    np.testing.assert_allclose(load, ref, atol=1e-9)
+    total = compute_routing_cost(lines, routing)["routing_time_h"].sum()
+    np.testing.assert_allclose(rep.load["load_h"].sum(), total, rtol=1e-12)
+
+    per_line = t_loop / len(sub)
+    print(f"capacity_report      : {t_vec * 1000:8.1f} ms")
+    print(
+        f"lus per orderregel   : {per_line * len(lines) * 1000:8.1f} ms (geëxtrapoleerd van {len(sub)} regels)"
+    )
+    print(
+        f"{len(rep.overloads)} overbelastingsvensters; dagload gelijk aan de lus, geen uren verloren."
+    )
+
+
+if __name__ == "__main__":
+    main()
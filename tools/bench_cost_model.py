@@ -0,0 +1,61 @@
+# tools/bench_cost_model.py
+"""Benchmark: CostModel (integer-codes + array-gathers) vs. het merge-pad van compute_costs.
+
+Synthetisch (zelfde tabellen als bench_batch_costing), met onbekende materialen en
+processen. Controleert dat de uitvoer exact gelijk is aan de twee merges.
+
+Gebruik: python tools/bench_cost_model.py [--lines 20000] [--materials 5000] [--repeat 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import make_boms, make_tables  # noqa: E402
+from utils.pricing import CostModel, _compute_costs_merge, compute_costs  # noqa: E402
+
+
+def _best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=20_000)
+    ap.add_argument("--materials", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    mats, procs = make_tables(args.materials)
+    boms = make_boms(args.lines // 40 + 1, 80, args.materials)
+    bom = pd.concat(boms.values(), ignore_index=True).head(args.lines)
+    bom.loc[::37, "process_route"] = "ONBEKEND"
+    print(f"{len(bom)} regels, {len(mats)} materialen")
+
+    model = CostModel(mats, procs)
+    pd.testing.assert_frame_equal(model.costs(bom), _compute_costs_merge(mats, procs, bom))
+
+    t_merge = _best(lambda: _compute_costs_merge(mats, procs, bom), args.repeat)
+    t_call = _best(lambda: compute_costs(mats, procs, bom), args.repeat)
+    t_model = _best(lambda: model.costs(bom), args.repeat)
+    print(f"merges (oud)            : {t_merge * 1000:8.2f} ms")
+    print(f"compute_costs (CostModel): {t_call * 1000:8.2f} ms  ({t_merge / t_call:.1f}x)")
+    print(f"CostModel.costs (hergebr.): {t_model * 1000:8.2f} ms  ({t_merge / t_model:.1f}x)")
+    print("Uitvoer identiek aan het merge-pad.")
+
+
+if __name__ == "__main__":
+    main()
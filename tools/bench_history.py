@@ -0,0 +1,114 @@
+# tools/bench_history.py
+"""Benchmark: build_history_df (kolomsgewijs) vs. de oude iterrows-versie.
+
+Synthetische historie: --days dagelijkse snapshots x --materials materialen.
+De oude versie is traag; die draait alleen op de eerste --legacy-days snapshots.
+
+Gebruik: python tools/bench_history.py [--days 1826] [--materials 10000] [--legacy-days 10]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils import history  # noqa: E402
+
+
+def legacy_build_history_df(material_ids=None) -> pd.DataFrame:
+    """De iterrows-implementatie van vóór de kolomsgewijze herschrijving (referentie)."""
+    rows = []
+    snaps = history.list_snapshots()
+    if not snaps:
+        return pd.DataFrame(columns=history.HISTORY_COLUMNS)
+    want = set(str(x) for x in material_ids) if material_ids else None
+    for p in snaps:
+        dt = history._date_from_name(p)
+        if dt is None:
+            continue
+        try:
+            df = pd.read_csv(p)
+        except Exception:
+            continue
+        for col in ["material_id", "description", "commodity", "price_eur_per_kg"]:
+            if col not in df.columns:
+                df[col] = pd.NA if col == "price_eur_per_kg" else ""
+        if want:
+            df = df[df["material_id"].astype(str).isin(want)]
+        for _, r in df.iterrows():
+            rows.append(
+                dict(
+                    date=dt,
+                    material_id=str(r.get("material_id", "")),
+                    description=str(r.get("description", "")),
+                    commodity=str(r.get("commodity", "")),
+                    price_eur_per_kg=pd.to_numeric(r.get("price_eur_per_kg"), errors="coerce"),
+                )
+            )
+    out = pd.DataFrame(rows)
+    if not out.empty:
+        out = out.sort_values(["material_id", "date"]).reset_index(drop=True)
+    return out
+
+
+def write_history(d: Path, days: int, n_mat: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    ids = np.array([f"MAT_{i:05d}" for i in range(n_mat)])
+    desc = np.array([f"Materiaal {i}" for i in range(n_mat)])
+    cmd = np.array(["Staal", "RVS", "Aluminium", "Koper"])[rng.integers(0, 4, n_mat)]
+    price = rng.uniform(0.5, 20, n_mat)
+    start = datetime(2020, 1, 1)
+    for i in range(days):
+        price = price * (1 + rng.normal(0, 0.005, n_mat))
+        stamp = (start + timedelta(days=i)).strftime("%Y%m%d")
+        pd.DataFrame(
+            {"material_id": ids, "description": desc, "commodity": cmd, "price_eur_per_kg": price.round(4)}
+        ).to_csv(d / f"materials_{stamp}.csv", index=False)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=5 * 365 + 1)
+    ap.add_argument("--materials", type=int, default=10_000)
+    ap.add_argument("--legacy-days", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full, sub = Path(tmp) / "full", Path(tmp) / "sub"
+        full.mkdir()
+        sub.mkdir()
+        print(f"Schrijf {args.days} snapshots x {args.materials} materialen …")
+        write_history(full, args.days, args.materials)
+        for p in sorted(full.glob("materials_*.csv"))[: args.legacy_days]:
+            (sub / p.name).write_bytes(p.read_bytes())
+
+        history.HISTORY_DIR = sub
+        old, t_old = timed(legacy_build_history_df)
+        new, t_new_sub = timed(history.build_history_df)
+        pd.testing.assert_frame_equal(old, new)
+        print(f"{args.legacy_days} snapshots: oud {t_old:.2f}s | nieuw {t_new_sub:.2f}s "
+              f"({t_old / t_new_sub:.0f}x) — output identiek")
+
+        history.HISTORY_DIR = full
+        new, t_new = timed(history.build_history_df)
+        est = t_old / max(args.legacy_days, 1) * args.days
+        print(f"{args.days} snapshots: nieuw {t_new:.2f}s ({len(new):,} regels) | oud geschat ~{est:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# tools/bench_io_sidecar.py
+"""Benchmark: koude CSV-load (_read_csv) vs warme sidecar-load (read_csv_cached).
+
+Gebruik: python tools/bench_io_sidecar.py [--rows 500000] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils.io import SCHEMA_BOM, _read_csv, read_csv_cached, sidecar_path  # noqa: E402
+
+
+def make_bom(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    mats = np.array([f"MAT_{i:05d}" for i in range(5_000)])
+    procs = np.array(["LASER_CUT", "CNC_MILL_3AX", "CNC_LATHE", "BENDING", "TIG_WELD"])
+    return pd.DataFrame(
+        {
+            "line_id": [f"L{i}" for i in range(n)],
+            "material_id": mats[rng.integers(0, len(mats), n)],
+            "qty": rng.integers(1, 500, n),
+            "mass_kg": rng.random(n) * 20,
+            "process_route": procs[rng.integers(0, len(procs), n)],
+            "runtime_h": rng.random(n) * 3,
+        }
+    )
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        p = Path(tmp) / "bom.csv"
+        make_bom(args.rows).to_csv(p, index=False)
+        print(f"CSV: {p.stat().st_size / 1e6:.1f} MB, {args.rows} regels")
+
+        cold = best_of(lambda: _read_csv(p, SCHEMA_BOM), args.repeat)
+        t0 = time.perf_counter()
+        read_csv_cached(p, SCHEMA_BOM)
+        build = time.perf_counter() - t0
+        print(f"Sidecar: {sidecar_path(p).stat().st_size / 1e6:.1f} MB")
+        warm = best_of(lambda: read_csv_cached(p, SCHEMA_BOM), args.repeat)
+
+        pd.testing.assert_frame_equal(_read_csv(p, SCHEMA_BOM), read_csv_cached(p, SCHEMA_BOM))
+        print(f"koud (CSV)          : {cold * 1000:8.1f} ms")
+        print(f"eerste load + sidecar: {build * 1000:8.1f} ms")
+        print(f"warm (sidecar)      : {warm * 1000:8.1f} ms  ({cold / warm:.1f}x sneller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# tools/bench_quotebook.py
+"""Benchmark: QuoteBook (incrementeel) vs. best_quotes op de hele tabel na elke wijziging.
+
+Synthetisch: een quotetabel met --quotes rijen over --materials materialen, daarna
+--batches rondes van een kleine append, het intrekken van willekeurige quotes (expire)
+en het laten vervallen op datum. Controleert na elke ronde dat QuoteBook.best_frame()
+gelijk is aan best_quotes van de levende quotes, en dat de heaps niet groeien met het
+aantal verwijderde quotes.
+
+Gebruik: python tools/bench_quotebook.py [--quotes 300000] [--batches 20] [--append 500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils.quotes import QuoteBook, best_quotes  # noqa: E402
+
+
+def make_quotes(n: int, n_mats: int, rng: np.random.Generator, start: int = 0) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "material_id": [f"MAT_{i:05d}" for i in rng.integers(0, n_mats, n)],
+            "supplier": [f"SUP_{i:06d}" for i in range(start, start + n)],
+            "price_eur_per_kg": rng.integers(100, 500, n) / 100,
+            "lead_time_days": rng.integers(1, 30, n),
+            "preferred": (rng.random(n) < 0.05).astype(int),
+            "valid_until": pd.Timestamp("2026-01-01")
+            + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        }
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quotes", type=int, default=300_000)
+    ap.add_argument("--materials", type=int, default=5000)
+    ap.add_argument("--batches", type=int, default=20)
+    ap.add_argument("--append", type=int, default=500)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    quotes = make_quotes(args.quotes, args.materials, rng)
+    print(f"{len(quotes)} quotes, {args.materials} materialen, {args.batches} rondes")
+
+    t0 = time.perf_counter()
+    book = QuoteBook(quotes)
+    t_build = time.perf_counter() - t0
+
+    # Index van de tabel = quote-id in het boek (beide tellen op vanaf 0)
+    table, t_full, t_book, n = quotes, 0.0, 0.0, len(quotes)
+    for i in range(args.batches):
+        new = make_quotes(args.append, args.materials, rng, start=n).set_axis(
+            pd.RangeIndex(n, n + args.append)
+        )
+        n += len(new)
+        cutoff = pd.Timestamp("2026-01-01") + pd.Timedelta(days=i + 1)
+        withdrawn = rng.choice(table.index.to_numpy(), args.append, replace=False)
+
+        t0 = time.perf_counter()
+        table = pd.concat([table.drop(index=withdrawn), new])
+        table = table[table["valid_until"] >= cutoff]
+        ref = best_quotes(table)
+        t_full += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        book.insert(new)
+        book.expire(withdrawn)
+        book.expire_until(cutoff)
+        got = book.best_frame()
+        t_book += time.perf_counter() - t0
+
+        pd.testing.assert_frame_equal(got, ref.reset_index(drop=True))
+        # Compactie: verlopen items houden hooguit de helft van een heap bezet
+        assert all(len(h) <= 2 * (len(h) - book._dead[m]) + 1 for m, h in book._heaps.items())
+        assert len(book._expiry) <= 2 * len(book) + 64
+
+    print(f"QuoteBook opbouwen        : {t_build * 1000:8.1f} ms (eenmalig)")
+    print(f"best_quotes per ronde     : {t_full / args.batches * 1000:8.1f} ms")
+    print(f"QuoteBook per ronde       : {t_book / args.batches * 1000:8.1f} ms")
+    print(f"Na elke ronde gelijk aan best_quotes ({len(book)} levende quotes).")
+    heap_items = sum(len(h) for h in book._heaps.values())
+    print(f"Heap-items: {heap_items} | verloopheap: {len(book._expiry)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# tools/bench_recosting.py
+"""Benchmark: IncrementalCosting (alleen geraakte regels) vs. alles opnieuw met compute_costs.
+
+Synthetisch: gestapelde BOMs van --projects projecten (tabellen uit bench_batch_costing).
+Per stap wijzigt één materiaalprijs; controleert dat regels en projecttotalen gelijk
+blijven aan een volledige herberekening.
+
+Gebruik: python tools/bench_recosting.py [--projects 5000] [--steps 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import make_boms, make_tables  # noqa: E402
+from utils.pricing import COST_COLUMNS, compute_costs, compute_costs_batch  # noqa: E402
+from utils.recosting import IncrementalCosting  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--projects", type=int, default=5000)
+    ap.add_argument("--materials", type=int, default=5000)
+    ap.add_argument("--steps", type=int, default=20)
+    args = ap.parse_args()
+
+    mats, procs = make_tables(args.materials)
+    boms = make_boms(args.projects, 80, args.materials)
+    bom = pd.concat(boms, names=["project_id", None]).reset_index(level=0)
+    inc = IncrementalCosting(mats, procs, bom, group_col="project_id")
+    print(f"{args.projects} projecten, {len(bom)} regels")
+
+    rng = np.random.default_rng(7)
+    t_inc = t_full = 0.0
+    rows = 0
+    for _ in range(args.steps):
+        mid = mats["material_id"].iloc[int(rng.integers(0, len(mats)))]
+        t0 = time.perf_counter()
+        upd = inc.set_prices({mid: float(rng.uniform(0.8, 12))})
+        t_inc += time.perf_counter() - t0
+        rows += len(upd.rows)
+        t0 = time.perf_counter()
+        full = compute_costs(inc.mats, procs, bom)
+        t_full += time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(inc.lines, full)
+    expect = compute_costs_batch(inc.mats, procs, bom).totals.set_index("project_id")
+    np.testing.assert_allclose(
+        inc.group_totals[COST_COLUMNS].to_numpy(), expect[COST_COLUMNS].to_numpy(), rtol=1e-9
+    )
+    n = args.steps
+    print(f"gem. geraakte regels : {rows / n:8.1f}")
+    print(f"alles opnieuw        : {t_full / n * 1000:8.2f} ms per wijziging")
+    print(f"incrementeel         : {t_inc / n * 1000:8.2f} ms  ({t_full / t_inc:.1f}x sneller)")
+    print("Regels identiek; projecttotalen gelijk (rtol 1e-9).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# tools/bench_routes.py
+"""Benchmark: meerstapsroutes in compute_costs vs. een lus per regel en bewerking.
+
+Synthetisch: BOMs uit bench_batch_costing, waarvan --routed (aandeel) een route-string
+van 2..4 bewerkingen krijgt. Controleert total_cost per regel tegen de lus (op een
+deelverzameling) en dat de routinguren per regel gelijk zijn aan de som per bewerking.
+
+Gebruik: python tools/bench_routes.py [--projects 2000] [--routed 0.5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import PROCS, make_boms, make_tables  # noqa: E402
+from utils.pricing import compute_costs  # noqa: E402
+from utils.routing import ROUTE_SEP, compute_routing_cost  # noqa: E402
+
+ROUTES = [
+    ROUTE_SEP.join(["LASER_CUT", "BENDING"]),
+    ROUTE_SEP.join(["LASER_CUT", "BENDING", "TIG_WELD"]),
+    ROUTE_SEP.join(["CNC_LATHE", "CNC_MILL_3AX", "TIG_WELD", "BENDING"]),
+]
+
+
+def loop_totals(mats, procs, bom):
+    """Referentie: per regel elke bewerking apart, materiaal bij de eerste."""
+    price = mats.drop_duplicates("material_id").set_index("material_id")["price_eur_per_kg"]
+    rates = procs.drop_duplicates("process_id").set_index("process_id")
+    out = []
+    for r in bom.itertuples():
+        ops = str(r.process_route).split(ROUTE_SEP)
+        mat = r.mass_kg * price.get(r.material_id, np.nan)
+        total = 0.0
+        for i, pid in enumerate(ops):
+            p = rates.loc[pid]
+            proc = r.runtime_h / len(ops) * (p.machine_rate_eur_h + p.labor_rate_eur_h)
+            base = ((mat if i == 0 else 0.0) + proc) * (1 + p.overhead_pct)
+            total += base * (1 + p.margin_pct)
+        out.append(total)
+    return np.array(out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--projects", type=int, default=2000)
+    ap.add_argument("--max-lines", type=int, default=100)
+    ap.add_argument("--materials", type=int, default=5000)
+    ap.add_argument("--routed", type=float, default=0.5)
+    ap.add_argument("--check", type=int, default=2000)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(4)
+    mats, procs = make_tables(args.materials)
+    bom = pd.concat(
+        make_boms(args.projects, args.max_lines, args.materials).values(), ignore_index=True
+    )
+    bom["process_route"] = bom["process_route"].astype(object)
+    hit = rng.random(len(bom)) < args.routed
+    bom.loc[hit, "process_route"] = np.array(ROUTES, dtype=object)[rng.integers(0, 3, hit.sum())]
+    print(f"{len(bom)} regels, {int(hit.sum())} met een meerstapsroute")
+
+    t0 = time.perf_counter()
+    lines = compute_costs(mats, procs, bom)
+    t_vec = time.perf_counter() - t0
+
+    sub = bom.head(args.check)
+    t0 = time.perf_counter()
+    ref = loop_totals(mats, procs, sub)
+    t_loop = (time.perf_counter() - t0) / len(sub) * len(bom)
+    np.testing.assert_allclose(lines["total_cost"].to_numpy()[: len(sub)], ref, rtol=1e-12)
+
+    routing = pd.DataFrame(
+        {"process_id": PROCS, "time_h_per_unit": [0.02, 0.08, 0.05, 0.01, 0.06], "setup_h": 0.5}
+    )
+    per_line = compute_routing_cost(bom, routing)["routing_time_h"].sum()
+    per_op = compute_routing_cost(bom, routing, by_operation=True)["routing_time_h"].sum()
+    np.testing.assert_allclose(per_line, per_op, rtol=1e-12)
+
+    print(f"compute_costs        : {t_vec * 1000:8.1f} ms")
+    print(f"lus per bewerking    : {t_loop * 1000:8.1f} ms (geëxtrapoleerd van {len(sub)} regels)")
+    print("total_cost gelijk aan de lus (rtol 1e-12); routinguren per regel = per bewerking.")
+
+
+if __name__ == "__main__":
+    main()
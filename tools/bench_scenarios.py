@@ -0,0 +1,80 @@
+# tools/bench_scenarios.py
+"""Benchmark: ScenarioModel-grid vs. compute_costs per scenario (zoals de oude Scenario Planner).
+
+Synthetisch: --lines BOM-regels (tabellen uit bench_batch_costing), grid van
+50 (materiaal) × 50 (arbeid) × 20 (marge) × 5 (machine). Een steekproef van
+scenario's wordt gecontroleerd tegen compute_costs op aangepaste tabellen.
+
+Gebruik: python tools/bench_scenarios.py [--lines 100000] [--checks 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import make_boms, make_tables  # noqa: E402
+from utils.pricing import compute_costs  # noqa: E402
+from utils.scenarios import Scenario, ScenarioModel  # noqa: E402
+
+
+def scenario_costs(mats, procs, bom, scn: Scenario) -> pd.DataFrame:
+    """Oude werkwijze: tabellen kopiëren, aanpassen en alles opnieuw doorrekenen."""
+    mats, procs = mats.copy(), procs.copy()
+    mats["price_eur_per_kg"] *= 1 + scn.material / 100.0
+    procs["labor_rate_eur_h"] *= 1 + scn.labor / 100.0
+    procs["machine_rate_eur_h"] *= 1 + scn.machine / 100.0
+    procs["margin_pct"] += scn.margin / 100.0
+    return compute_costs(mats, procs, bom)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=100_000)
+    ap.add_argument("--materials", type=int, default=5000)
+    ap.add_argument("--checks", type=int, default=5)
+    args = ap.parse_args()
+
+    mats, procs = make_tables(args.materials)
+    boms = make_boms(args.lines // 40 + 1, 80, args.materials)
+    bom = pd.concat(boms.values(), ignore_index=True).head(args.lines)
+
+    t0 = time.perf_counter()
+    model = ScenarioModel(compute_costs(mats, procs, bom))
+    t_prep = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    grid = model.grid(
+        material=np.linspace(-50, 50, 50),
+        labor=np.linspace(-50, 50, 50),
+        margin=np.linspace(-10, 10, 20),
+        machine=np.linspace(-20, 20, 5),
+    )
+    t_grid = time.perf_counter() - t0
+    n = grid.totals.size
+
+    rng = np.random.default_rng(0)
+    t0 = time.perf_counter()
+    for _ in range(args.checks):
+        i = tuple(int(rng.integers(0, s)) for s in grid.totals.shape)
+        scn = Scenario(*(grid.axes[d][j] for d, j in zip(grid.axes, i)))
+        expect = scenario_costs(mats, procs, bom, scn)["total_cost"].sum()
+        np.testing.assert_allclose(grid.totals[i], expect, rtol=1e-12)
+    t_one = (time.perf_counter() - t0) / max(args.checks, 1)
+
+    print(f"{len(bom)} regels, grid {'×'.join(map(str, grid.totals.shape))} = {n} scenario's")
+    print(f"voorbereiden (1× compute_costs): {t_prep * 1000:8.1f} ms")
+    print(f"hele grid                      : {t_grid * 1000:8.1f} ms")
+    print(f"oud, per scenario              : {t_one * 1000:8.1f} ms  (grid ≈ {t_one * n:,.0f} s)")
+    print(f"Steekproef van {args.checks} scenario's gelijk aan compute_costs (rtol 1e-12).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# tools/bench_volume_curve.py
+"""Benchmark: VolumeModel.curve (één pass over alle ordergroottes) vs. compute_costs per grootte.
+
+Synthetisch: BOMs uit bench_batch_costing gestapeld, routing met setup_h per proces en
+drie staffels per materiaal. Controleert dat de curve zonder setup/staffels per
+ordergrootte gelijk is aan compute_costs.
+
+Gebruik: python tools/bench_volume_curve.py [--projects 2000] [--quantities 1,10,100,1000,10000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.bench_batch_costing import PROCS, make_boms, make_tables  # noqa: E402
+from utils.pricing import compute_costs  # noqa: E402
+from utils.quotes import apply_best_quotes  # noqa: E402
+from utils.volume import VolumeModel  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--projects", type=int, default=2000)
+    ap.add_argument("--max-lines", type=int, default=100)
+    ap.add_argument("--materials", type=int, default=5000)
+    ap.add_argument("--quantities", default="1,10,100,1000,10000")
+    args = ap.parse_args()
+
+    qs = [float(x) for x in args.quantities.split(",")]
+    mats, procs = make_tables(args.materials)
+    bom = pd.concat(
+        make_boms(args.projects, args.max_lines, args.materials).values(), ignore_index=True
+    )
+    routing = pd.DataFrame({"process_id": PROCS, "setup_h": [0.5, 1.5, 1.0, 0.25, 0.75]})
+    quotes = pd.DataFrame(
+        {
+            "material_id": np.repeat(mats["material_id"].to_numpy(), 3),
+            "price_eur_per_kg": (
+                np.repeat(mats["price_eur_per_kg"].to_numpy(), 3)
+                * np.tile([0.95, 0.9, 0.8], len(mats))
+            ),
+            "min_qty_kg": np.tile([100.0, 1_000.0, 10_000.0], len(mats)),
+        }
+    )
+    print(f"{len(bom)} regels, {len(qs)} ordergroottes")
+
+    t0 = time.perf_counter()
+    loop = [compute_costs(mats, procs, bom) for _ in qs]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    curve = VolumeModel(mats, procs, bom, quotes, routing).curve(qs)
+    t_curve = time.perf_counter() - t0
+
+    flat_model = VolumeModel(mats, procs, bom)
+    flat = flat_model.curve(qs)
+    for q, ref in zip(qs, loop):
+        got = flat.lines.loc[flat.lines["order_qty"] == q, "total_cost"].to_numpy()
+        np.testing.assert_array_equal(got, ref["total_cost"].to_numpy())
+
+    # Staffelquotes mogen de basisprijs niet zetten: materials zonder prijs krijgen via
+    # apply_best_quotes de gewone quote (zonder min_qty_kg), nooit een staffelprijs
+    base_quotes = mats[["material_id", "price_eur_per_kg"]].assign(min_qty_kg=np.nan)
+    all_quotes = pd.concat([base_quotes, quotes], ignore_index=True).assign(
+        supplier="S", lead_time_days=1
+    )
+    unpriced = mats.assign(price_eur_per_kg=np.nan)
+    model = VolumeModel(apply_best_quotes(unpriced, all_quotes), procs, bom, all_quotes)
+    below = model._kg[model._mcodes] < 100.0  # bij 1 stuk geen staffel bereikt
+    np.testing.assert_array_equal(model.prices([1.0])[0][below], flat_model.price[below])
+
+    print(f"compute_costs per grootte: {t_loop * 1000:8.1f} ms (zonder setup/staffels)")
+    print(f"VolumeModel.curve        : {t_curve * 1000:8.1f} ms (met setup en staffels)")
+    print(
+        curve.totals[["order_qty", "setup_cost", "material_cost", "total_cost"]].to_string(
+            index=False
+        )
+    )
+    print("Zonder setup/staffels gelijk aan compute_costs per ordergrootte.")
+    print("Staffelquotes veranderen de prijs bij 1 stuk niet.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# tools/compact_history.py
+"""Zet volledige materials-snapshots om naar base + deltas en meet de winst.
+
+Standaard wordt alleen gemeten (op een kopie); met --apply wordt data/history
+zelf omgezet. Per snapshot wordt gecontroleerd dat reconstructie gelijk is aan het origineel.
+Nieuwe snapshots worden standaard volledig geschreven; zet SNAPSHOT_BASE_EVERY om ook
+die als delta op te slaan.
+
+Vooraf controleert het op een synthetische reeks (refs, deltas en volledige snapshots
+door elkaar) dat geen keten langer wordt dan --base-every bestanden, zowel bij schrijven
+als na compact_history.
+
+Gebruik: python tools/compact_history.py [--history data/history] [--base-every 30] [--apply]
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils.snapshots import (  # noqa: E402
+    COMPACT_BASE_EVERY,
+    compact_history,
+    iter_snapshots,
+    read_snapshot,
+    snapshot_day,
+    snapshot_deps,
+    snapshot_files,
+    write_snapshot,
+)
+
+
+def dir_bytes(files) -> int:
+    return sum(p.stat().st_size for p in files)
+
+
+def read_all(d: Path) -> float:
+    t0 = time.perf_counter()
+    for _ in iter_snapshots(d):
+        pass
+    return time.perf_counter() - t0
+
+
+def read_latest(d: Path) -> float:
+    t0 = time.perf_counter()
+    read_snapshot(snapshot_files(d)[-1])
+    return time.perf_counter() - t0
+
+
+def mixed_days(n_days: int = 80, n_mat: int = 200, seed: int = 0):
+    """Synthetische dagen: herhaalde inhoud (ref), kleine wijziging (delta), alles nieuw."""
+    rng = np.random.default_rng(seed)
+    ids = [f"MAT_{i:04d}" for i in range(n_mat)]
+    price = rng.uniform(1, 10, n_mat).round(4)
+    seen = []
+    for i in range(n_days):
+        r = rng.random()
+        if seen and r < 0.3:
+            price = seen[rng.integers(len(seen))].copy()
+        elif r < 0.4:
+            price = rng.uniform(1, 10, n_mat).round(4)
+        else:
+            price = price.copy()
+            price[rng.integers(0, n_mat, 3)] = rng.uniform(1, 10, 3).round(4)
+        seen.append(price)
+        yield (
+            f"{20240101 + i // 28 * 100 + i % 28:08d}",
+            pd.DataFrame({"material_id": ids, "price_eur_per_kg": price}),
+        )
+
+
+def check_chains(d: Path, base_every: int, expected: dict) -> None:
+    for p in snapshot_files(d):
+        n = len(snapshot_deps(p))
+        assert n <= base_every, f"{p.name}: keten van {n} bestanden > {base_every}"
+        pd.testing.assert_frame_equal(read_snapshot(p), expected[snapshot_day(p)])
+
+
+def check_chain_bound(base_every: int) -> None:
+    days = dict(mixed_days())
+    with tempfile.TemporaryDirectory() as tmp:
+        written, full = Path(tmp) / "written", Path(tmp) / "full"
+        for day, df in days.items():
+            write_snapshot(df, written, day, base_every=base_every)
+            write_snapshot(df, full, day, base_every=0)
+        check_chains(written, base_every, days)
+        compact_history(full, base_every)
+        check_chains(full, base_every, days)
+        kinds = {p.name.split(".")[-2] for p in snapshot_files(written)}
+        assert {"ref", "delta"} <= kinds, kinds
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--history", default="data/history")
+    ap.add_argument("--base-every", type=int, default=COMPACT_BASE_EVERY)
+    ap.add_argument("--apply", action="store_true")
+    args = ap.parse_args()
+
+    check_chain_bound(args.base_every)
+    print(f"Ketens met refs, deltas en bases blijven ≤ {args.base_every} bestanden.")
+
+    src = Path(args.history)
+    files = snapshot_files(src)
+    if not files:
+        raise SystemExit(f"Geen snapshots in {src}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp) / "history"
+        work.mkdir()
+        for p in files:
+            shutil.copy2(p, work / p.name)
+        originals = {snapshot_day(p): read_snapshot(p) for p in files}
+
+        t_full_all, t_full_last = read_all(work), read_latest(work)
+        before = dir_bytes(snapshot_files(work))
+        converted, kept = compact_history(work, args.base_every)
+        after_files = snapshot_files(work)
+        after = dir_bytes(after_files)
+        t_delta_all, t_delta_last = read_all(work), read_latest(work)
+
+        for p in after_files:
+            pd.testing.assert_frame_equal(read_snapshot(p), originals[snapshot_day(p)])
+
+    print(f"Snapshots: {len(files)} | omgezet naar delta: {converted} | bases: {kept}")
+    print(f"Schijf : {before / 1e6:8.2f} MB -> {after / 1e6:8.2f} MB ({after / before:.1%})")
+    print(f"Alles lezen : {t_full_all:6.2f}s -> {t_delta_all:6.2f}s")
+    print(f"Laatste lezen: {t_full_last * 1000:6.1f}ms -> {t_delta_last * 1000:6.1f}ms")
+    print("Reconstructie identiek aan origineel voor alle snapshots.")
+
+    if args.apply:
+        converted, kept = compact_history(src, args.base_every)
+        print(f"✅ {src} omgezet: {converted} deltas, {kept} bases")
+
+
+if __name__ == "__main__":
+    main()
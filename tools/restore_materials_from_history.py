@@ -7,6 +7,13 @@ import os
 import sys
 import pandas as pd
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from utils.anomalies import scan_price_anomalies  # noqa: E402
+from utils.snapshot_diff import diff_frames  # noqa: E402
+from utils.snapshots import find_snapshot, read_snapshot, snapshot_files  # noqa: E402
+
 DATA = Path("data")
 HISTORY = DATA / "history"
 MATS = DATA / "materials_db.csv"
@@ -22,7 +29,7 @@ FORCE = os.getenv("FORCE", "false").strip().lower() == "true"
 def pick_snapshot(arg: Optional[str]) -> Path:
     if not HISTORY.exists():
         raise FileNotFoundError(f"Geen history map: {HISTORY}")
-    snaps = sorted(HISTORY.glob("materials_*.csv"))
+    snaps = snapshot_files(HISTORY)
     if not snaps:
         raise FileNotFoundError("Geen snapshots gevonden in data/history/")
     if not arg or arg.lower() == "latest":
@@ -33,64 +40,17 @@ def pick_snapshot(arg: Optional[str]) -> Path:
         if not p.exists():
             raise FileNotFoundError(f"Snapshot bestaat niet: {p}")
         return p
-    p = HISTORY / f"materials_{arg}.csv"
-    if not p.exists():
-        raise FileNotFoundError(f"Snapshot bestaat niet: {p}")
+    p = find_snapshot(HISTORY, arg)
+    if p is None:
+        raise FileNotFoundError(f"Snapshot bestaat niet: {HISTORY / f'materials_{arg}.csv'}")
     return p
 
 def show_diff(before: pd.DataFrame, after: pd.DataFrame) -> str:
-    def keyset(df: pd.DataFrame):
-        return set(df["material_id"].astype(str)) if "material_id" in df.columns else set()
-    kb, ka = keyset(before), keyset(after)
-    added, removed = sorted(list(ka - kb)), sorted(list(kb - ka))
-    changed = []
-    b, a = before.set_index("material_id"), after.set_index("material_id")
-    common = sorted(list(kb & ka))
-    fields = ["price_eur_per_kg", "commodity", "description"]
-    for mid in common:
-        vb, va = b.loc[mid].to_dict(), a.loc[mid].to_dict()
-        diffs = [f"{f}: {vb.get(f)} -> {va.get(f)}" for f in fields if vb.get(f) != va.get(f)]
-        if diffs:
-            changed.append(f"{mid}: " + "; ".join(diffs))
-    out = [
-        f"Toegevoegd: {len(added)} | Verwijderd: {len(removed)} | Gewijzigd: {len(changed)}",
-    ]
-    if added:
-        out.append(" + " + ", ".join(added[:10]) + (" …" if len(added) > 10 else ""))
-    if removed:
-        out.append(" - " + ", ".join(removed[:10]) + (" …" if len(removed) > 10 else ""))
-    if changed:
-        out.append(" ~ " + " | ".join(changed[:5]) + (" …" if len(changed) > 5 else ""))
-    return "\n".join(out)
+    return diff_frames(before, after).summary()
 
 def anomaly_scan(before: pd.DataFrame, after: pd.DataFrame, thr: float) -> Tuple[pd.DataFrame, int]:
     """Return (anomalies_df, count) voor abs(pct change) > thr"""
-    if "material_id" not in before.columns or "material_id" not in after.columns:
-        return pd.DataFrame(), 0
-    b = before.set_index("material_id")
-    a = after.set_index("material_id")
-    common = b.index.intersection(a.index)
-    out = []
-    for mid in common:
-        try:
-            old = float(pd.to_numeric(b.loc[mid, "price_eur_per_kg"], errors="coerce"))
-            new = float(pd.to_numeric(a.loc[mid, "price_eur_per_kg"], errors="coerce"))
-        except Exception:
-            continue
-        if not pd.notna(old) or not pd.notna(new) or old == 0:
-            continue
-        pct = (new - old) / old
-        if abs(pct) > thr:
-            out.append(
-                {
-                    "material_id": mid,
-                    "old_price": old,
-                    "new_price": new,
-                    "pct_change": pct,
-                    "abs_pct": abs(pct),
-                }
-            )
-    df = pd.DataFrame(out).sort_values("abs_pct", ascending=False)
+    df = scan_price_anomalies(before, after, thr)
     return df, len(df)
 
 def write_anomalies(df: pd.DataFrame, tag: str) -> Optional[Path]:
@@ -113,7 +73,7 @@ def main():
         raise FileNotFoundError(f"{MATS} ontbreekt; niets om te overschrijven.")
 
     before = pd.read_csv(MATS)
-    after = pd.read_csv(snap)
+    after = read_snapshot(snap)
 
     # sanity
     req = {"material_id", "price_eur_per_kg"}
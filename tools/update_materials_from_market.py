@@ -3,8 +3,21 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Optional, Tuple
 from datetime import datetime
+import sys
 import pandas as pd
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from utils.anomalies import (  # noqa: E402
+    flag_scores,
+    price_changes,
+    scan_price_anomalies,
+    score_changes,
+)
+from utils.history import ingest_snapshot, material_price_stats  # noqa: E402
+from utils.snapshots import find_snapshot, write_snapshot  # noqa: E402
+
 DATA = Path("data")
 HISTORY = DATA / "history"
 MATS_CSV = DATA / "materials_db.csv"
@@ -104,38 +117,37 @@ def apply_market_factors(mats: pd.DataFrame, factors: pd.DataFrame) -> pd.DataFr
 def _save_history(df: pd.DataFrame, label: str) -> Path:
     HISTORY.mkdir(parents=True, exist_ok=True)
     stamp = datetime.utcnow().strftime("%Y%m%d")
-    p = HISTORY / f"materials_{stamp}.csv"
-    if not p.exists():
-        df.to_csv(p, index=False)
+    p = find_snapshot(HISTORY, stamp)
+    if p is None:
+        p = write_snapshot(df, HISTORY, stamp)
+        ingest_snapshot(p)
         print(f"🗂️ Snapshot ({label}): {p}")
     else:
         print(f"ℹ️ Snapshot ({label}) bestond al: {p}")
     return p
 
 def _anomaly_log(before: pd.DataFrame, after: pd.DataFrame, thr: float) -> None:
-    if "material_id" not in before.columns or "material_id" not in after.columns:
-        return
-    b = before.set_index("material_id")
-    a = after.set_index("material_id")
-    common = b.index.intersection(a.index)
-    rows = []
-    for mid in common:
-        try:
-            old = float(pd.to_numeric(b.loc[mid, "price_eur_per_kg"], errors="coerce"))
-            new = float(pd.to_numeric(a.loc[mid, "price_eur_per_kg"], errors="coerce"))
-        except Exception:
-            continue
-        if not pd.notna(old) or not pd.notna(new) or old == 0:
-            continue
-        pct = (new - old) / old
-        if abs(pct) > thr:
-            rows.append({"material_id": mid, "old_price": old, "new_price": new, "pct_change": pct})
-    if rows:
+    rows = scan_price_anomalies(before, after, thr).drop(columns="abs_pct")
+    if not rows.empty:
         ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
         p = HISTORY / f"anomalies_update_{ts}.csv"
-        pd.DataFrame(rows).sort_values("pct_change").to_csv(p, index=False)
+        rows.sort_values("pct_change", kind="mergesort").to_csv(p, index=False)
         print(f"📝 Anomaly-log: {p} (>{thr*100:.1f}%)")
 
+def _stat_anomaly_log(before: pd.DataFrame, after: pd.DataFrame) -> None:
+    # Wijzigingen buiten de historische volatiliteit van het materiaal (z-/MAD-score)
+    try:
+        stats = material_price_stats()
+    except Exception as e:
+        print(f"⚠️ Statistische anomaly-check overgeslagen: {e}")
+        return
+    hits = flag_scores(score_changes(price_changes(before, after), stats))
+    if not hits.empty:
+        ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        p = HISTORY / f"anomalies_stat_{ts}.csv"
+        hits.to_csv(p, index=False)
+        print(f"📝 Statistische anomalieën: {len(hits)} → {p}")
+
 def main():
     mats = _read_csv_safe(MATS_CSV, ["material_id","description","price_eur_per_kg"])
     if mats is None or mats.empty:
@@ -167,6 +179,7 @@ def main():
         mats.to_csv(MATS_CSV, index=False)
         print("✅ materials_db.csv bijgewerkt.")
         _anomaly_log(before, mats, ANOMALY_LOG_THR)
+        _stat_anomaly_log(before, mats)
     else:
         print("ℹ️ Geen prijswijzigingen.")
     _save_history(mats, "after")
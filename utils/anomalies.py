@@ -0,0 +1,276 @@
+# utils/anomalies.py
+"""
+Prijswijzigingen en -anomalieën tussen twee materials-tabellen (vóór/na).
+
+Eén gevectoriseerde pass: prijzen één keer numeriek maken, uitlijnen via een
+index-join op material_id en filteren met maskers. Gebruikt door
+utils.history.find_anomalies en de tools (restore/update).
+
+Dubbele of lege material_ids zijn niet eenduidig te koppelen en worden overgeslagen
+(net als de oude per-rij-lus, die daarop stilletjes een exception ving).
+
+Daarnaast een statistische detector over de volledige historie: per materiaal een
+rollende z-score en een MAD-score (robuust) van elke prijsstap t.o.v. de vorige
+`window` stappen. Een 25%-sprong in een volatiele commodity is dan ruis, in een
+stabiele legering niet.
+"""
+
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+CHANGE_COLUMNS = ["material_id", "old_price", "new_price", "pct_change"]
+ANOMALY_COLUMNS = [*CHANGE_COLUMNS, "abs_pct"]
+
+
+def _unique_prices(df: pd.DataFrame, key: str, col: str) -> pd.Series:
+    """Numerieke prijs per material_id, alleen voor niet-lege, unieke ids."""
+    if key not in df.columns or col not in df.columns:
+        return pd.Series(dtype=float)
+    ids = df[key]
+    keep = (ids.notna() & ~ids.duplicated(keep=False)).to_numpy()
+    prices = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return pd.Series(prices[keep], index=pd.Index(ids.to_numpy()[keep]))
+
+
+def price_changes(
+    before: pd.DataFrame,
+    after: pd.DataFrame,
+    key: str = "material_id",
+    col: str = "price_eur_per_kg",
+) -> pd.DataFrame:
+    """
+    Relatieve prijswijziging voor materialen die in beide tabellen staan, met een
+    geldige oude (≠ 0) en nieuwe prijs. Volgorde: die van `before`.
+    """
+    b = _unique_prices(before, key, col)
+    a = _unique_prices(after, key, col)
+    if b.empty or a.empty:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    pos = a.index.get_indexer(b.index)
+    old = b.to_numpy()
+    new = np.where(pos >= 0, a.to_numpy()[pos], np.nan)
+    ok = (pos >= 0) & ~np.isnan(old) & ~np.isnan(new) & (old != 0)
+    old, new = old[ok], new[ok]
+    return pd.DataFrame(
+        {
+            "material_id": b.index[ok],
+            "old_price": old,
+            "new_price": new,
+            "pct_change": (new - old) / old,
+        }
+    )
+
+
+def flag_anomalies(changes: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    """Regels met abs(pct_change) > threshold, met abs_pct, grootste eerst."""
+    if changes.empty or "pct_change" not in changes.columns:
+        return pd.DataFrame(columns=[*changes.columns, "abs_pct"])
+    pct = pd.to_numeric(changes["pct_change"], errors="coerce")
+    out = changes[(pct.abs() > threshold).to_numpy()].copy()
+    out["abs_pct"] = pct[out.index].abs()
+    return out.sort_values("abs_pct", ascending=False, kind="mergesort")
+
+
+def scan_price_anomalies(
+    before: pd.DataFrame,
+    after: pd.DataFrame,
+    threshold: float,
+    key: str = "material_id",
+    col: str = "price_eur_per_kg",
+) -> pd.DataFrame:
+    """price_changes + flag_anomalies: material_id, old/new_price, pct_change, abs_pct."""
+    return flag_anomalies(price_changes(before, after, key, col), threshold).reset_index(drop=True)
+
+
+# --- Statistische detector (volledige historie) -----------------------------------
+
+SCORE_COLUMNS = ["material_id", "date", "price", "ret", "zscore", "mad_score"]
+STATS_COLUMNS = ["material_id", "n", "mean", "std", "median", "mad", "last_price", "last_date"]
+# MAD -> std-schaal voor normaal verdeelde data (robuuste z = (x - mediaan) / (1.4826 * MAD))
+_MAD_SCALE = 1.4826
+
+
+@dataclass
+class StatAnomalyConfig:
+    window: int = 30  # aantal voorgaande prijsstappen per materiaal
+    min_periods: int = 5  # minder stappen: geen score
+    z_threshold: float = 3.0
+    mad_threshold: float = 3.5
+    min_scale: float = 0.01  # ondergrens std/MAD (1%): kleine stappen in vlakke reeksen
+
+
+# Cellen (rijen × window) per blok: houdt het geheugen rond 32 MB, ook bij window=365
+# over jaren historie van duizenden materialen
+WINDOW_CELLS = 4_000_000
+
+
+def group_windows(
+    x: np.ndarray, keys: np.ndarray, window: int, lag: int = 0, rows=None
+) -> np.ndarray:
+    """
+    (len(rows), window)-matrix met per rij de `window` waarden die eindigen op positie
+    i - lag, binnen aaneengesloten groepen (keys gesorteerd); buiten de groep NaN.
+    Zonder `rows` alle posities. Vervangt groupby().rolling(), dat per groep een
+    Python-lus draait; voor grote invoer zie iter_windows.
+    """
+    n = len(x)
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.intp)
+    if n == 0 or len(rows) == 0:
+        return np.empty((0, window))
+    new_group = np.r_[True, keys[1:] != keys[:-1]]
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+    pos = rows[:, None] - lag - np.arange(window - 1, -1, -1)[None, :]
+    vals = np.asarray(x, dtype=float)[np.maximum(pos, 0)]
+    return np.where(pos >= group_start[rows][:, None], vals, np.nan)
+
+
+def iter_windows(x: np.ndarray, keys: np.ndarray, window: int, lag: int = 0, rows=None):
+    """group_windows in blokken van hooguit WINDOW_CELLS cellen: (rijposities, matrix)."""
+    rows = np.arange(len(x)) if rows is None else np.asarray(rows, dtype=np.intp)
+    step = max(1, WINDOW_CELLS // max(window, 1))
+    for i in range(0, len(rows), step):
+        chunk = rows[i : i + step]
+        yield chunk, group_windows(x, keys, window, lag, chunk)
+
+
+def _window_stats(win: np.ndarray, min_periods: int) -> dict:
+    """n, mean, std, median en MAD per rij; NaN bij minder dan min_periods waarden."""
+    cnt = np.sum(~np.isnan(win), axis=1)
+    ok = cnt >= max(min_periods, 2)
+    out = {k: np.full(len(win), np.nan) for k in ("mean", "std", "median", "mad")}
+    if ok.any():
+        w = win[ok]
+        med = np.nanmedian(w, axis=1)
+        out["mean"][ok] = np.nanmean(w, axis=1)
+        out["std"][ok] = np.nanstd(w, axis=1, ddof=1)
+        out["median"][ok] = med
+        out["mad"][ok] = np.nanmedian(np.abs(w - med[:, None]), axis=1)
+    out["n"] = cnt
+    return out
+
+
+def window_stats(
+    x: np.ndarray, keys: np.ndarray, window: int, min_periods: int, lag: int = 0, rows=None
+) -> dict:
+    """_window_stats over de vensters van `rows` (default alle), blok voor blok."""
+    rows = np.arange(len(x)) if rows is None else np.asarray(rows, dtype=np.intp)
+    out = {k: np.full(len(rows), np.nan) for k in ("mean", "std", "median", "mad")}
+    out["n"] = np.zeros(len(rows), dtype=int)
+    done = 0
+    for chunk, win in iter_windows(x, keys, window, lag, rows):
+        st = _window_stats(win, min_periods)
+        for k, v in st.items():
+            out[k][done : done + len(chunk)] = v
+        done += len(chunk)
+    return out
+
+
+def _scores(ret: np.ndarray, st: dict, cfg: StatAnomalyConfig) -> tuple[np.ndarray, np.ndarray]:
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        z = (ret - st["mean"]) / np.fmax(st["std"], cfg.min_scale)
+        m = (ret - st["median"]) / np.fmax(_MAD_SCALE * st["mad"], cfg.min_scale)
+    return z, m
+
+
+def _price_steps(hist: pd.DataFrame) -> pd.DataFrame:
+    """
+    material_id/date/price, gesorteerd, met `ret` = relatieve stap t.o.v. de vorige
+    notering. Lege ids en ids die binnen één datum dubbel voorkomen gaan eruit.
+    """
+    if hist.empty:
+        return pd.DataFrame(columns=["material_id", "date", "price", "ret"])
+    df = pd.DataFrame(
+        {
+            "material_id": hist["material_id"].to_numpy(),
+            "date": pd.to_datetime(hist["date"]).to_numpy(),
+            "price": pd.to_numeric(hist["price_eur_per_kg"], errors="coerce").to_numpy(),
+        }
+    )
+    ids = df["material_id"]
+    df = df[ids.notna() & (ids.astype(str).str.strip() != "")]
+    df = df[~df.duplicated(["material_id", "date"], keep=False)].dropna(subset=["price"])
+    df = df.sort_values(["material_id", "date"], kind="mergesort").reset_index(drop=True)
+    prev = df.groupby("material_id", sort=False)["price"].shift()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["ret"] = np.where(prev != 0, (df["price"] - prev) / prev, np.nan)
+    return df
+
+
+def score_history(
+    hist: pd.DataFrame, cfg: StatAnomalyConfig = StatAnomalyConfig(), since=None
+) -> pd.DataFrame:
+    """
+    Scoor elke prijsstap in een lange historie (material_id, date, price_eur_per_kg)
+    t.o.v. de `window` voorgaande stappen van hetzelfde materiaal. Eén pass voor alle
+    materialen. Met `since` worden alleen stappen vanaf die datum gescoord en
+    teruggegeven (eerdere rijen dienen dan alleen als aanloop).
+    """
+    df = _price_steps(hist)
+    if df.empty:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+    ret = df["ret"].to_numpy(dtype=float)
+    keys = df["material_id"].to_numpy()
+    rows = None
+    if since is not None:
+        keep = (df["date"] >= pd.Timestamp(since)).to_numpy()
+        rows = np.flatnonzero(keep)
+        df = df[keep].reset_index(drop=True)
+    st = window_stats(ret, keys, cfg.window, cfg.min_periods, lag=1, rows=rows)
+    df["zscore"], df["mad_score"] = _scores(ret if rows is None else ret[rows], st, cfg)
+    return df[SCORE_COLUMNS]
+
+
+def material_stats(
+    scores: pd.DataFrame, cfg: StatAnomalyConfig = StatAnomalyConfig()
+) -> pd.DataFrame:
+    """Statistiek per materiaal over de laatste `window` stappen (incl. de laatste)."""
+    if scores.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    keys = scores["material_id"].to_numpy()
+    last = np.r_[keys[1:] != keys[:-1], True]
+    # Alleen de vensters van de laatste rij per materiaal
+    st = window_stats(
+        scores["ret"].to_numpy(dtype=float),
+        keys,
+        cfg.window,
+        cfg.min_periods,
+        rows=np.flatnonzero(last),
+    )
+    out = pd.DataFrame({k: st[k] for k in ("n", "mean", "std", "median", "mad")})
+    out.insert(0, "material_id", keys[last])
+    out["last_price"] = scores["price"].to_numpy()[last]
+    out["last_date"] = scores["date"].to_numpy()[last]
+    return out[STATS_COLUMNS]
+
+
+def flag_scores(scores: pd.DataFrame, cfg: StatAnomalyConfig = StatAnomalyConfig()) -> pd.DataFrame:
+    """Rijen waar |zscore| of |mad_score| boven de drempel ligt, grootste eerst."""
+    z = scores["zscore"].abs()
+    m = scores["mad_score"].abs()
+    hit = (z > cfg.z_threshold) | (m > cfg.mad_threshold)
+    out = scores[hit.to_numpy()].copy()
+    out["score"] = np.fmax(z[hit], m[hit])
+    return out.sort_values("score", ascending=False, kind="mergesort").reset_index(drop=True)
+
+
+def score_changes(
+    changes: pd.DataFrame, stats: pd.DataFrame, cfg: StatAnomalyConfig = StatAnomalyConfig()
+) -> pd.DataFrame:
+    """
+    Scoor kandidaat-wijzigingen (uitvoer van price_changes) tegen de historische
+    statistiek per materiaal. Zonder voldoende historie blijven de scores NaN.
+    """
+    out = changes.reset_index(drop=True).copy()
+    if out.empty:
+        return out.assign(n=[], zscore=[], mad_score=[])
+    st = stats.set_index("material_id").reindex(out["material_id"].to_numpy())
+    arrs = {k: st[k].to_numpy(dtype=float) for k in ("mean", "std", "median", "mad")}
+    out["n"] = st["n"].fillna(0).to_numpy(dtype=int)
+    out["zscore"], out["mad_score"] = _scores(out["pct_change"].to_numpy(dtype=float), arrs, cfg)
+    return out
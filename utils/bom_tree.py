@@ -0,0 +1,229 @@
+# utils/bom_tree.py
+"""
+Meerlaagse BOM: sub-assemblies met gedeelde componenten.
+
+Naast SCHEMA_BOM kent een BOM-regel twee optionele kolommen:
+
+    parent_id  assembly waar de regel onder valt (leeg = het product zelf, TOP)
+    child_id   gevuld: de regel is een gebruik van sub-assembly `child_id`, `qty` keer
+               per stuk van de parent (zo'n regel wordt zelf niet gecalculeerd)
+
+Een assembly bestaat zodra hij als parent_id voorkomt; bewerkingen op de assembly
+zelf (lassen, montage) zijn gewone regels met die parent_id. Zonder beide kolommen is
+alles TOP en zijn de kostenkolommen gelijk aan compute_costs.
+
+explode_bom rekent alle bladregels in één compute_costs door, telt ze per assembly op
+en rolt de kosten in topologische volgorde (kinderen eerst) omhoog: elke assembly wordt
+precies één keer uitgerekend, hoe vaak hij ook gedeeld wordt. Daarna van boven naar
+beneden het aantal stuks per product. Beide passes lopen per niveau over de
+gebruiksrelaties, dus de rekentijd schaalt met assemblies + relaties, niet met het
+aantal uitgeklapte paden (dat bij gedeelde componenten exponentieel kan groeien).
+Een cyclus geeft een ValueError met het pad.
+
+Ontbrekende kosten tellen als 0 en worden gemeld: bladregels zonder kostprijs in
+`unpriced`, sub-assemblies zonder eigen regels in `undefined`. Zo blijft het totaal van
+het product bruikbaar in plaats van NaN. Assemblies die vanuit het product niet bereikt
+worden (geen pad van gebruiksregels vanaf TOP) tellen niet mee en staan in `orphans`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .pricing import COST_COLUMNS, cost_model
+
+TOP = "(top)"  # assembly-id voor regels zonder parent_id
+
+
+@dataclass
+class BomExplosion:
+    lines: pd.DataFrame  # bladregels: compute_costs-uitvoer + aantallen/kosten per product
+    assemblies: pd.DataFrame  # per assembly: niveau, stuks per product, kosten per stuk
+    order: List[str]  # topologische volgorde: kinderen vóór hun parents
+    undefined: List[str]  # child_ids zonder eigen regels (kosten tellen als 0)
+    orphans: List[str]  # assemblies die TOP niet gebruikt, direct of indirect (tellen niet mee)
+    unpriced: List[str]  # material_ids van bladregels zonder kostprijs (tellen als 0)
+
+    @property
+    def totals(self) -> Dict[str, float]:
+        """Kosten van één product (TOP), per COST_COLUMN."""
+        top = self.assemblies.set_index("assembly_id").loc[TOP]
+        return {c: float(top[c]) for c in COST_COLUMNS}
+
+
+def _ids(bom: pd.DataFrame, col: str) -> np.ndarray:
+    """Kolom als object-array met None voor leeg; ontbrekende kolom = overal leeg."""
+    if col not in bom.columns:
+        return np.full(len(bom), None, dtype=object)
+    s = bom[col].astype("string").str.strip()
+    s = s.mask(s == "")
+    return s.astype(object).where(s.notna(), None).to_numpy(copy=True)
+
+
+def _by_key(keys: np.ndarray, n: int):
+    """Relaties gegroepeerd per sleutel (CSR): volgorde + startposities."""
+    order = np.argsort(keys, kind="stable")
+    return order, np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=n))])
+
+
+def _edges(csr, nodes) -> np.ndarray:
+    order, starts = csr
+    parts = [order[starts[i] : starts[i + 1]] for i in nodes]
+    return np.concatenate(parts).astype(np.intp) if parts else np.empty(0, np.intp)
+
+
+def _find_cycle(left: np.ndarray, parent: np.ndarray, child: np.ndarray, names) -> List[str]:
+    """Eén cyclus onder de onopgeloste assemblies: elk heeft nog een onopgelost kind."""
+    nxt = {}
+    for p, c in zip(parent, child):
+        if left[p] and left[c]:
+            nxt.setdefault(p, c)
+    node = int(np.flatnonzero(left)[0])
+    seen: Dict[int, int] = {}
+    path: List[int] = []
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = nxt[node]
+    cycle = path[seen[node] :] + [node]
+    return [str(names[i]) for i in cycle]
+
+
+def _levels(parent: np.ndarray, child: np.ndarray, by_child, names) -> List[np.ndarray]:
+    """
+    Assemblies per niveau van onderaf (Kahn): niveau 0 heeft geen sub-assemblies, elk
+    volgend niveau alleen kinderen uit eerdere niveaus. ValueError bij een cyclus.
+    """
+    n = len(names)
+    pending = np.bincount(parent, minlength=n)  # nog niet opgeloste gebruiksrelaties
+    levels = []
+    frontier = np.flatnonzero(pending == 0)
+    done = 0
+    while len(frontier):
+        levels.append(frontier)
+        done += len(frontier)
+        parents = parent[_edges(by_child, frontier)]
+        np.subtract.at(pending, parents, 1)
+        cand = np.unique(parents)
+        frontier = cand[pending[cand] == 0]
+    if done < n:
+        left = np.ones(n, dtype=bool)
+        left[np.concatenate(levels) if levels else []] = False
+        path = _find_cycle(left, parent, child, names)
+        raise ValueError(f"Cyclus in BOM: {' -> '.join(path)}")
+    return levels
+
+
+def explode_bom(mats: pd.DataFrame, procs: pd.DataFrame, bom: pd.DataFrame) -> BomExplosion:
+    """
+    Klap een meerlaagse BOM uit en rol kosten en aantallen op naar het product.
+
+    `lines` bevat de bladregels zoals compute_costs ze teruggeeft, plus `assembly_id`,
+    `assembly_qty` (stuks van die assembly per product), `ext_qty` (qty · assembly_qty)
+    en `ext_total_cost` (total_cost · assembly_qty). `assemblies` geeft per assembly de
+    opgerolde COST_COLUMNS per stuk; Σ ext_total_cost == totals["total_cost"].
+    Regels met een NaN-totaal en sub-assemblies zonder regels tellen als 0 (zie
+    `unpriced` en `undefined`); assemblies buiten het product staan in `orphans`.
+    """
+    bom = bom.reset_index(drop=True)
+    parent_ids = _ids(bom, "parent_id")
+    parent_ids[pd.isna(parent_ids)] = TOP
+    child_ids = _ids(bom, "child_id")
+    usage = ~pd.isna(child_ids)
+
+    # Assemblies: alles wat als parent of als kind voorkomt, TOP altijd
+    names = pd.Index(pd.unique(np.concatenate([[TOP], parent_ids, child_ids[usage]])))
+    n = len(names)
+    defined = np.zeros(n, dtype=bool)
+    defined[names.get_indexer(pd.unique(parent_ids))] = True
+    defined[names.get_loc(TOP)] = True
+
+    # Bladregels: één compute_costs, daarna per assembly opgeteld
+    leaf = np.flatnonzero(~usage)
+    extra = [c for c in ("parent_id", "child_id") if c in bom.columns]
+    lines = cost_model(mats, procs).costs(bom.iloc[leaf].drop(columns=extra))
+    if len(lines) != len(leaf):
+        raise ValueError("Dubbele material_id/process_id in de tabellen: uitklappen niet eenduidig")
+    lcodes = names.get_indexer(parent_ids[leaf])
+    costs = (
+        np.column_stack(
+            [
+                pd.to_numeric(lines[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+                for c in COST_COLUMNS
+            ]
+        )
+        if len(lines)
+        else np.zeros((0, len(COST_COLUMNS)))
+    )
+    # Assemblies zonder regels (~defined) blijven 0, net als bladregels zonder prijs
+    unit = np.zeros((n, len(COST_COLUMNS)))
+    np.add.at(unit, lcodes, np.nan_to_num(costs, nan=0.0))
+
+    # Gebruiksrelaties parent -> kind, qty per stuk parent
+    u = np.flatnonzero(usage)
+    parent = names.get_indexer(parent_ids[u])
+    child = names.get_indexer(child_ids[u])
+    qty = pd.to_numeric(bom["qty"].iloc[u], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    by_child, by_parent = _by_key(child, n), _by_key(parent, n)
+    levels = _levels(parent, child, by_child, names)
+
+    # Omhoog: per niveau de (al complete) kinderen bij hun parents optellen
+    for nodes in levels:
+        e = _edges(by_child, nodes)
+        np.add.at(unit, parent[e], qty[e, None] * unit[child[e]])
+
+    # Omlaag: stuks per product. Alle parents van een assembly liggen op hogere niveaus,
+    # dus van boven naar beneden is het aantal van een parent al compleet
+    count = np.zeros(n)
+    count[names.get_loc(TOP)] = 1.0
+    depth = np.zeros(n, dtype=int)
+    reached = np.zeros(n, dtype=bool)
+    reached[names.get_loc(TOP)] = True
+    for nodes in reversed(levels):
+        e = _edges(by_parent, nodes)
+        np.add.at(count, child[e], count[parent[e]] * qty[e])
+        np.maximum.at(depth, child[e], depth[parent[e]] + 1)
+        reached[child[e][reached[parent[e]]]] = True
+
+    assembly_qty = count[lcodes]
+    lines.insert(0, "assembly_id", names[lcodes].to_numpy(dtype=object))
+    lines["assembly_qty"] = assembly_qty
+    lines["ext_qty"] = (
+        pd.to_numeric(lines["qty"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        * assembly_qty
+        if "qty" in lines.columns
+        else np.nan
+    )
+    lines["ext_total_cost"] = costs[:, -1] * assembly_qty if len(lines) else np.empty(0)
+
+    asm = pd.DataFrame(
+        {
+            "assembly_id": names.to_numpy(dtype=object),
+            "level": depth,
+            "quantity": count,
+            "lines": np.bincount(lcodes, minlength=n),
+            "defined": defined,
+        }
+    )
+    for j, c in enumerate(COST_COLUMNS):
+        asm[c] = unit[:, j]
+    asm["ext_total_cost"] = asm["total_cost"] * asm["quantity"]
+    order = [str(names[i]) for nodes in levels for i in nodes]
+    unpriced = []
+    if len(lines) and "material_id" in lines.columns:
+        missing = lines["material_id"][np.isnan(costs[:, -1])].dropna()
+        unpriced = [str(x) for x in pd.unique(missing.to_numpy())]
+    return BomExplosion(
+        lines=lines,
+        assemblies=asm.sort_values(["level", "assembly_id"], kind="mergesort").reset_index(
+            drop=True
+        ),
+        order=order,
+        undefined=[str(x) for x in names[~defined]],
+        orphans=[str(x) for x in names[~reached]],
+        unpriced=unpriced,
+    )
@@ -0,0 +1,236 @@
+# utils/capacity.py
+"""
+Capaciteit en bezetting per machine (process_id) over veel open orders.
+
+1. Routinguren per bewerking via compute_routing_cost(by_operation=True)
+   (time_h_per_unit · qty + setup_h), in één merge voor alle orders. Meerstapsroutes
+   belasten elke machine van de route, binnen hetzelfde tijdvenster als de regel.
+2. Uren per dag: op de startdatum, of met een einddatum gelijk verdeeld over de dagen
+   [start, eind). Dat verdelen gaat met een verschil-array per machine (+uur/dag op de
+   start, -uur/dag op het eind) en een cumsum over de dagen, dus geen lus per order.
+3. Capaciteitskalender: per machine hours_per_day op werkdagen (ma–vr), met optionele
+   rijen met een `date` die één dag overschrijven (feestdag = 0, extra ploeg, ...).
+4. Per bucket (dag "D" of week "W", week begint maandag): load, capaciteit, bezetting en
+   overbelasting; aaneengesloten overbelaste buckets worden overbelastingsvensters.
+
+Machines zonder kalender hebben capaciteit NaN (geen bezetting, nooit overbelast).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .routing import compute_routing_cost
+
+FREQS = {"D": "dag", "W": "week"}
+_STEP_DAYS = {"D": 1, "W": 7}
+WORKDAYS = 5  # ma..vr krijgen de standaardcapaciteit
+
+
+@dataclass
+class CapacityReport:
+    load: pd.DataFrame  # per machine × bucket: load_h, capacity_h, utilisation, overload_h
+    overloads: pd.DataFrame  # vensters van aaneengesloten overbelaste buckets
+    summary: pd.DataFrame  # per machine over de hele periode
+    unscheduled_h: float = 0.0  # uren van regels zonder (geldige) datum
+
+
+def _days(s: pd.Series) -> np.ndarray:
+    """Datums als dagnummers (int64 sinds 1970-01-01); NaT -> iNaT."""
+    d = pd.to_datetime(s, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    return d.astype("datetime64[D]").astype(np.int64)
+
+
+_NAT = np.datetime64("NaT").astype(np.int64)
+
+
+def _bucket_start(days: np.ndarray, freq: str) -> np.ndarray:
+    # 1970-01-01 was een donderdag: (dag + 3) % 7 == 0 op maandag
+    return days if freq == "D" else days - (days + 3) % 7
+
+
+def _weekmask() -> str:
+    return "1" * WORKDAYS + "0" * (7 - WORKDAYS)
+
+
+def daily_load(
+    lines: pd.DataFrame,
+    routing: pd.DataFrame,
+    start_col: str = "start_date",
+    end_col: Optional[str] = None,
+    routes: Optional[pd.DataFrame] = None,
+):
+    """
+    (machines, eerste dag, load-matrix machines × dagen, ongeplande uren).
+    `lines` zijn orderregels met process_route, qty en de datumkolom(men). Met `end_col`
+    worden de uren gelijk verdeeld over de werkdagen in [start, eind); zonder werkdag
+    daarin (of zonder end_col) staan ze op de startdag, of de eerstvolgende werkdag als
+    die in het weekend valt.
+    """
+    df = compute_routing_cost(lines, routing, routes, by_operation=True)
+    hours = pd.to_numeric(df["routing_time_h"], errors="coerce").to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    start = _days(df[start_col])
+    end = _days(df[end_col]) if end_col else start + 1
+    route = df["process_id"]
+    ok = (start != _NAT) & (end != _NAT) & ~np.isnan(hours) & route.notna().to_numpy()
+    unscheduled = float(np.nansum(hours[~ok]))
+    mcodes, machines = pd.factorize(route.to_numpy()[ok])
+    if not ok.any():
+        return pd.Index(machines), 0, np.zeros((len(machines), 0)), unscheduled
+    start, hours = start[ok], hours[ok]
+    end = np.maximum(end[ok], start + 1)
+    mask = _weekmask()
+    spread = (
+        np.busday_count(start.astype("datetime64[D]"), end.astype("datetime64[D]"), weekmask=mask)
+        > 0
+    )
+    # Zonder werkdag in het venster (bijv. start op zaterdag zonder einddatum): naar de
+    # eerstvolgende werkdag, anders staat er load op een dag zonder capaciteit
+    start[~spread] = np.busday_offset(
+        start[~spread].astype("datetime64[D]"), 0, roll="forward", weekmask=mask
+    ).astype(np.int64)
+    end = np.maximum(end, start + 1)
+    first = int(start.min())
+    n_days = int(end.max()) - first
+    load = np.zeros((len(machines), n_days))
+
+    # Verdelen in werkdag-ruimte: +uur/dag op de eerste, -uur/dag na de laatste werkdag,
+    # cumsum, en de werkdagen terug op hun kalenderdag
+    origin = np.datetime64(first, "D")
+    b_start = np.busday_count(origin, start.astype("datetime64[D]"), weekmask=mask)
+    b_end = np.busday_count(origin, end.astype("datetime64[D]"), weekmask=mask)
+    workday = (np.arange(first, first + n_days) + 3) % 7 < WORKDAYS
+    diff = np.zeros((len(machines), int(workday.sum()) + 1))
+    rate = hours[spread] / (b_end - b_start)[spread]
+    np.add.at(diff, (mcodes[spread], b_start[spread]), rate)
+    np.add.at(diff, (mcodes[spread], b_end[spread]), -rate)
+    load[:, workday] = np.cumsum(diff, axis=1)[:, :-1]
+    np.add.at(load, (mcodes[~spread], start[~spread] - first), hours[~spread])
+    # Afrondingsrest van de cumsum op dagen zonder load
+    load[np.abs(load) < 1e-9 * max(1.0, float(np.abs(load).max()))] = 0.0
+    return pd.Index(machines), first, load, unscheduled
+
+
+def daily_capacity(
+    calendar: pd.DataFrame, machines: pd.Index, first: int, n_days: int
+) -> np.ndarray:
+    """Capaciteit machines × dagen uit de kalender; NaN voor machines zonder kalender."""
+    cap = np.full((len(machines), n_days), np.nan)
+    if calendar is None or not len(calendar) or not n_days:
+        return cap
+    pos = machines.get_indexer(calendar["process_id"])
+    hours = pd.to_numeric(calendar["hours_per_day"], errors="coerce").to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    dates = _days(calendar["date"]) if "date" in calendar.columns else np.full(len(calendar), _NAT)
+    day = np.arange(first, first + n_days)
+    workday = (day + 3) % 7 < WORKDAYS
+    default = (pos >= 0) & (dates == _NAT)
+    exc = (pos >= 0) & (dates != _NAT)
+    # Machines met een kalender: 0 buiten de werkdagen en op dagen zonder standaardrij
+    cap[np.unique(pos[default | exc])] = 0.0
+    # Bij meerdere rijen voor dezelfde machine/dag wint de laatste
+    cap[pos[default][:, None], np.flatnonzero(workday)[None, :]] = hours[default][:, None]
+    exc &= (dates >= first) & (dates < first + n_days)
+    cap[pos[exc], dates[exc] - first] = hours[exc]
+    return cap
+
+
+def _overload_windows(load: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Aaneengesloten overbelaste buckets per machine (run-id via cumsum).
+
+    `no_capacity_buckets` telt de buckets met load maar zonder capaciteit (utilisation inf).
+    """
+    cols = ["process_id", "start", "end", "buckets", "load_h", "capacity_h", "overload_h"]
+    over = load[load["overload_h"] > 0]
+    if over.empty:
+        return pd.DataFrame(columns=[*cols, "peak_utilisation", "no_capacity_buckets"])
+    over = over.assign(no_capacity=np.isinf(over["utilisation"]))
+    # Nieuw venster bij een andere machine of een gat van meer dan één bucket
+    gap = over["bucket"].diff() != pd.Timedelta(days=_STEP_DAYS[freq])
+    new = gap | (over["process_id"] != over["process_id"].shift())
+    run = new.cumsum()
+    g = over.groupby(run, sort=False)
+    out = g.agg(
+        process_id=("process_id", "first"),
+        start=("bucket", "first"),
+        end=("bucket", "last"),
+        buckets=("bucket", "size"),
+        load_h=("load_h", "sum"),
+        capacity_h=("capacity_h", "sum"),
+        overload_h=("overload_h", "sum"),
+        peak_utilisation=("utilisation", "max"),
+        no_capacity_buckets=("no_capacity", "sum"),
+    )
+    return out.sort_values("overload_h", ascending=False, kind="mergesort").reset_index(drop=True)
+
+
+def capacity_report(
+    lines: pd.DataFrame,
+    routing: pd.DataFrame,
+    calendar: Optional[pd.DataFrame],
+    freq: str = "W",
+    start_col: str = "start_date",
+    end_col: Optional[str] = None,
+    routes: Optional[pd.DataFrame] = None,
+) -> CapacityReport:
+    """
+    Bezetting per machine per bucket voor alle orderregels in `lines` (zie daily_load),
+    tegen `calendar` (process_id, hours_per_day, optioneel date).
+    """
+    if freq not in FREQS:
+        raise ValueError(f"Onbekende bucket: {freq} (kies uit {list(FREQS)})")
+    machines, first, load, unscheduled = daily_load(lines, routing, start_col, end_col, routes)
+    if load.shape[1]:
+        # Aanvullen tot hele buckets, zodat de capaciteit van een deelweek klopt
+        lead = first - int(_bucket_start(np.array([first]), freq)[0])
+        tail = -(load.shape[1] + lead) % _STEP_DAYS[freq]
+        load = np.pad(load, ((0, 0), (lead, tail)))
+        first -= lead
+    n_days = load.shape[1]
+    cap = daily_capacity(calendar, machines, first, n_days)
+
+    # Dagen -> buckets: de dagas loopt over hele buckets, dus één reshape + som
+    step = _STEP_DAYS[freq]
+    starts = np.arange(first, first + n_days, step)
+    b_load = load.reshape(len(machines), -1, step).sum(axis=2)
+    b_cap = cap.reshape(len(machines), -1, step).sum(axis=2)
+
+    m, k = b_load.shape
+    out = pd.DataFrame(
+        {
+            "process_id": np.repeat(machines.to_numpy(dtype=object), k),
+            "bucket": np.tile(starts.astype("datetime64[D]").astype("datetime64[ns]"), m),
+            "load_h": b_load.ravel(),
+            "capacity_h": b_cap.ravel(),
+        }
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        util = out["load_h"].to_numpy() / out["capacity_h"].to_numpy()
+    # Load zonder capaciteit (bijv. in het weekend ingepland) is volledig overbelast
+    out["utilisation"] = np.where(
+        out["capacity_h"] > 0, util, np.where(out["load_h"] > 0, np.inf, 0.0)
+    )
+    out.loc[out["capacity_h"].isna(), "utilisation"] = np.nan
+    out["overload_h"] = (out["load_h"] - out["capacity_h"]).clip(lower=0).fillna(0.0)
+
+    g = out.groupby("process_id", sort=False)
+    summary = g[["load_h", "capacity_h", "overload_h"]].sum(min_count=1)
+    summary["overload_h"] = summary["overload_h"].fillna(0.0)
+    summary["utilisation"] = summary["load_h"] / summary["capacity_h"].where(
+        summary["capacity_h"] > 0
+    )
+    summary["peak_utilisation"] = g["utilisation"].max()
+    summary["overloaded_buckets"] = (out["overload_h"] > 0).groupby(out["process_id"]).sum()
+    return CapacityReport(
+        load=out,
+        overloads=_overload_windows(out, freq),
+        summary=summary.reset_index(),
+        unscheduled_h=unscheduled,
+    )
@@ -0,0 +1,159 @@
+# utils/cost_cache.py
+"""
+Gedeelde cache voor gecalculeerde BOMs: compute_costs(apply_best_quotes(mats, quotes),
+procs, bom), zoals Calculatie, Quick Cost, Rapport en de offerte-pages die draaien.
+
+Sleutel = content-fingerprint van de vier invoerframes (kolommen, dtypes, index en een
+rijhash over de waarden), dus dezelfde data geeft dezelfde sleutel, ook als het een
+ander object is. Een fingerprint wordt per frame-object één keer berekend
+(utils.frame_memo): de frames uit utils.repository worden gedeeld en blijven dezelfde
+objecten tot het bestand verandert. Wordt een frame in-place gewijzigd, dan merkt de
+memo dat (Copy-on-Write) en wordt opnieuw gehasht; zonder Copy-on-Write (pandas 2.x)
+wordt elke aanroep gehasht. Eviction is LRU, begrensd op aantal entries en geheugen.
+
+Geretourneerde frames worden gedeeld tussen pages/sessies: behandel ze als read-only
+en gebruik .copy() vóór je ze aanpast (zoals bij utils.repository).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from .frame_memo import FrameMemo
+from .pricing import compute_costs
+from .quotes import apply_best_quotes
+
+MAX_ENTRIES = 8
+MAX_BYTES = 512 * 1024**2
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Content-hash van een frame: gelijk bij gelijke kolommen, dtypes, index en waarden."""
+    h = hashlib.sha1()
+    h.update(repr((list(df.columns), [str(t) for t in df.dtypes], df.shape)).encode())
+    h.update(pd.util.hash_pandas_object(df.index, categorize=False).to_numpy().tobytes())
+    if len(df.columns):
+        rows = pd.util.hash_pandas_object(df, index=False, categorize=False)
+        h.update(rows.to_numpy().tobytes())
+    return h.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class CostCache:
+    """LRU-cache sleutel -> gecalculeerd frame, begrensd op entries en bytes."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Eén lock per sleutel: twee sessies die tegelijk missen rekenen maar één keer
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._entries: "OrderedDict[tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._stats = CacheStats()
+        self._fp = FrameMemo(max_entries=32)
+
+    def key(self, *frames: Optional[pd.DataFrame]) -> tuple:
+        return tuple(
+            None if f is None else self._fp.get((f,), lambda f=f: fingerprint(f)) for f in frames
+        )
+
+    def _lookup(self, key: tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return entry[0]
+
+    def get_or_compute(self, key: tuple, fn: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        df = self._lookup(key)
+        if df is not None:
+            return df
+        with self._lock:
+            klock = self._key_locks.setdefault(key, threading.Lock())
+        with klock:
+            try:
+                df = self._lookup(key)
+                if df is not None:
+                    return df
+                df = fn()
+                with self._lock:
+                    self._stats.misses += 1
+                    self._put(key, df)
+                return df
+            finally:
+                # Ook als fn() faalt (bijv. een ongeldige BOM): geen lock per sleutel laten staan
+                with self._lock:
+                    if self._key_locks.get(key) is klock:
+                        del self._key_locks[key]
+
+    def _put(self, key: tuple, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        self._entries[key] = (df, size)
+        self._stats.bytes += size
+        # De nieuwste entry blijft altijd staan, ook als hij alleen al te groot is
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._stats.bytes > self.max_bytes
+        ):
+            _, (_, old) = self._entries.popitem(last=False)
+            self._stats.bytes -= old
+            self._stats.evictions += 1
+        self._stats.entries = len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats.entries = self._stats.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return asdict(self._stats)
+
+
+_CACHE = CostCache()
+
+
+def get_cost_cache() -> CostCache:
+    return _CACHE
+
+
+def costed_bom(
+    mats: pd.DataFrame,
+    procs: pd.DataFrame,
+    bom: pd.DataFrame,
+    quotes: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    compute_costs(apply_best_quotes(mats, quotes), procs, bom) via de gedeelde cache
+    (zonder quotes: compute_costs(mats, procs, bom)). Read-only resultaat.
+    """
+    key = _CACHE.key(mats, procs, bom, quotes)
+
+    def run() -> pd.DataFrame:
+        m = mats if quotes is None else apply_best_quotes(mats, quotes)
+        return compute_costs(m, procs, bom)
+
+    return _CACHE.get_or_compute(key, run)
+
+
+def stats() -> pd.DataFrame:
+    """Hits/misses/evictions van de kostencache (voor Diagnose)."""
+    s = _CACHE.stats()
+    total = s["hits"] + s["misses"]
+    s["hit_ratio"] = round(s["hits"] / total, 3) if total else None
+    return pd.DataFrame([s])
@@ -0,0 +1,101 @@
+# utils/frame_memo.py
+"""
+Memo op frame-identiteit die in-place wijzigingen opmerkt.
+
+Een entry hoort bij een tuple frames (op id, met zwakke referenties) en een token per
+frame: kolomnamen plus per kolom het data-adres (NumPy) of het array-object
+(extension arrays). De entry houdt zelf views op de kolommen vast; onder
+Copy-on-Write (altijd aan vanaf pandas 3) kopieert pandas een kolom dan bij elke
+schrijfactie (df.loc[...] = ..., fillna(inplace=True), df[c] = ...), zodat het token
+verandert en de entry opnieuw wordt berekend.
+
+Zonder Copy-on-Write (pandas 2.x met de standaardinstelling) schrijft pandas wél in
+dezelfde buffer; dan wordt er niets gememoriseerd en elke keer opnieuw berekend.
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def copy_on_write() -> bool:
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+def _column_token(s: pd.Series):
+    if isinstance(s.dtype, np.dtype):
+        a = s.to_numpy(copy=False)
+        return (a.__array_interface__["data"][0], a.shape, a.strides)
+    return id(s.array)
+
+
+def frame_token(df: pd.DataFrame) -> Tuple[tuple, list]:
+    """(token, views): het token verandert zodra een vastgehouden view wordt gekopieerd."""
+    views = [df.iloc[:, i] for i in range(df.shape[1])]
+    return (tuple(df.columns), df.shape, tuple(_column_token(s) for s in views)), views
+
+
+class FrameMemo:
+    """LRU-memo frames -> waarde, geldig zolang de frames leven en niet gewijzigd zijn."""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        # Reentrant: een weakref-callback (_drop) kan afgaan terwijl de lock al vastzit,
+        # bijv. als het verwijderen van een entry de laatste referentie naar een frame was
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def get(self, frames: tuple, compute: Callable[[], object]):
+        """Waarde voor `frames` (None-elementen toegestaan); berekend bij een miss."""
+        if not copy_on_write():
+            return compute()
+        key = tuple(id(f) for f in frames)
+        tokens = [None if f is None else frame_token(f)[0] for f in frames]
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and self._valid(hit, frames, tokens):
+                self._entries.move_to_end(key)
+                return hit[3]
+        value = compute()
+        refs, views, tokens = [], [], []
+        for f in frames:
+            if f is None:
+                refs.append(None)
+                tokens.append(None)
+                continue
+            refs.append(weakref.ref(f, lambda _, k=key: self._drop(k)))
+            token, held = frame_token(f)
+            tokens.append(token)
+            views.append(held)
+        with self._lock:
+            self._entries[key] = (refs, tokens, views, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _valid(entry: tuple, frames: tuple, tokens: list) -> bool:
+        refs, old, _, _ = entry
+        alive = all(
+            (r is None and f is None) or (r is not None and r() is f) for r, f in zip(refs, frames)
+        )
+        return alive and old == tokens
+
+    def _drop(self, key: tuple) -> None:
+        with self._lock:
+            entry: Optional[tuple] = self._entries.get(key)
+            if entry is not None and any(r is not None and r() is None for r in entry[0]):
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,14 +1,46 @@
 # utils/history.py
 from __future__ import annotations
 
-import re
+import bisect
+import hashlib
+import os
+import pickle
+import sqlite3
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from utils.anomalies import (
+    CHANGE_COLUMNS,
+    StatAnomalyConfig,
+    flag_anomalies,
+    flag_scores,
+    iter_windows,
+    material_stats,
+    price_changes,
+    score_changes,
+    score_history,
+)
+from utils.history_store import HistoryStore
+from utils.snapshot_diff import DIFF_FIELDS, SnapshotDiff, diff_frames
+from utils.snapshots import (
+    SNAP_RE,
+    deps_stamp,
+    find_snapshot,
+    is_delta,
+    is_ref,
+    iter_snapshots,
+    read_snapshot,
+    ref_target,
+    snapshot_files,
+    write_snapshot,
+)
+
 # Paden
 DATA_DIR = Path("data")
 HISTORY_DIR = DATA_DIR / "history"
@@ -41,15 +73,12 @@ def load_materials() -> pd.DataFrame:
 
 # --- Snapshots utilities -------------------------------------------------------
 
-_SNAP_RE = re.compile(r"materials_(\d{8})\.csv$", re.IGNORECASE)
+_SNAP_RE = SNAP_RE
 
 
 def list_snapshots() -> List[Path]:
-    """Alle materials-snapshots op datum (oplopend gesorteerd)."""
-    if not HISTORY_DIR.exists():
-        return []
-    snaps = [p for p in HISTORY_DIR.glob("materials_*.csv") if _SNAP_RE.search(p.name)]
-    return sorted(snaps, key=lambda p: p.name)
+    """Alle materials-snapshots op datum (oplopend gesorteerd), volledig of delta."""
+    return snapshot_files(HISTORY_DIR)
 
 
 def latest_snapshot() -> Optional[Path]:
@@ -68,107 +97,679 @@ def save_snapshot_current() -> Path:
     """Sla huidige materials op als materials_YYYYMMDD.csv (overschrijft niet)."""
     HISTORY_DIR.mkdir(parents=True, exist_ok=True)
     today = datetime.utcnow().strftime("%Y%m%d")
-    out = HISTORY_DIR / f"materials_{today}.csv"
-    if not out.exists():
-        df = load_materials()
-        df.to_csv(out, index=False)
+    out = find_snapshot(HISTORY_DIR, today)
+    if out is None:
+        out = write_snapshot(load_materials(), HISTORY_DIR, today)
+        ingest_snapshot(out)
     return out
 
 
 # --- Historie opbouwen ---------------------------------------------------------
 
 
+HISTORY_COLUMNS = ["date", "material_id", "price_eur_per_kg", "description", "commodity"]
+_TEXT_COLUMNS = ["material_id", "description", "commodity"]
+
+
+# Dtype die pandas kiest voor een lijst Python-str (object, of "str" vanaf pandas 3)
+_TEXT_DTYPE = pd.Series(["x"]).dtype
+
+
+def _as_text(s: pd.Series) -> pd.Series:
+    """Zelfde als str(waarde) per cel (NaN -> "nan", 12 -> "12"), zonder map als het al str is."""
+    if s.notna().all() and pd.api.types.infer_dtype(s, skipna=False) == "string":
+        return s
+    return s.astype(object).map(str)
+
+
+def _normalize_snapshot(df: pd.DataFrame, want: Optional[set]) -> pd.DataFrame:
+    """Eén snapshot naar (material_id, description, commodity, price_eur_per_kg)."""
+    for col in ["material_id", "description", "commodity", "price_eur_per_kg"]:
+        if col not in df.columns:
+            df[col] = pd.NA if col == "price_eur_per_kg" else ""
+    if want:
+        df = df[df["material_id"].astype(str).isin(want)]
+    out = {c: _as_text(df[c]) for c in _TEXT_COLUMNS}
+    out["price_eur_per_kg"] = pd.to_numeric(df["price_eur_per_kg"], errors="coerce")
+    return pd.DataFrame(out).reset_index(drop=True)
+
+
+def _history_rows(items: Iterable[Tuple[Path, Optional[pd.DataFrame]]]) -> pd.DataFrame:
+    """(snapshot, frame)-paren naar de lange tabel, ongesorteerd (leeg frame als geen regels)."""
+    frames: List[pd.DataFrame] = []
+    dates: List[datetime] = []
+    for p, df in items:
+        dt = _date_from_name(p)
+        if dt is None or df is None:
+            continue
+        part = _normalize_snapshot(df, None)
+        if not part.empty:
+            frames.append(part)
+            dates.append(dt)
+
+    if not frames:
+        return pd.DataFrame()
+
+    body = pd.concat(frames, ignore_index=True)
+    # Zelfde datetime-resolutie als pandas bij losse datetime-objecten kiest
+    unit = pd.Series(dates[:1]).dtype
+    date_col = np.repeat(np.array(dates, dtype=unit), [len(f) for f in frames])
+    out = pd.DataFrame({"date": date_col})
+    for c in _TEXT_COLUMNS:
+        out[c] = body[c]
+    out["price_eur_per_kg"] = body["price_eur_per_kg"]
+    return out
+
+
+# --- Watermark: alleen nieuwe/gewijzigde snapshots parsen ------------------------
+
+
+def _sha1(p: Path) -> str:
+    return hashlib.sha1(p.read_bytes()).hexdigest()
+
+
+def _ref_name(p: Path) -> Optional[str]:
+    try:
+        return ref_target(p).name
+    except Exception:
+        return None
+
+
+def scan_snapshots(snaps: List[Path], known: Dict[str, list]) -> Tuple[List[Path], Dict[str, list]]:
+    """
+    Vergelijk snapshots met de vorige stand [size, mtime_ns, sha1, voorganger].
+    Bij gelijke size+mtime wordt niet gehasht. Een delta is ook gewijzigd als zijn
+    voorganger een andere is of als iets eerder in zijn keten gewijzigd is; een ref
+    (voorganger = verwezen bestand) als het verwezen bestand gewijzigd is.
+    Geeft (te parsen snapshots, nieuwe index).
+    """
+    index: Dict[str, list] = {}
+    changed_names = set()
+    prev_name: Optional[str] = None
+    for p in snaps:
+        st = p.stat()
+        pred = prev_name if is_delta(p) else (_ref_name(p) if is_ref(p) else None)
+        old = known.get(p.name)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            sha, changed = old[2], old[3] != pred
+        else:
+            sha = _sha1(p)
+            changed = not (old and old[0] == st.st_size and old[2] == sha and old[3] == pred)
+        index[p.name] = [st.st_size, st.st_mtime_ns, sha, pred]
+        if changed:
+            changed_names.add(p.name)
+        prev_name = p.name
+
+    # Doorgeven langs ketens en refs (een ref kan naar een latere dag wijzen: herhalen)
+    dirty_names = set()
+    while True:
+        chain_dirty = False
+        before = len(dirty_names)
+        for p in snaps:
+            pred = index[p.name][3]
+            ref_dirty = is_ref(p) and pred in dirty_names
+            chain_dirty = p.name in changed_names or ref_dirty or (chain_dirty and is_delta(p))
+            if chain_dirty:
+                dirty_names.add(p.name)
+        if len(dirty_names) == before:
+            break
+    return [p for p in snaps if p.name in dirty_names], index
+
+
+def _history_cache_path() -> Path:
+    return HISTORY_DIR / ".history_cache.pkl"
+
+
+_HISTORY_MEMO: Dict[str, object] = {}
+
+
+def _read_cache(p: Path, memo: Dict[str, object]) -> Optional[dict]:
+    """Pickle-cache lezen (in-memory zolang het bestand niet wijzigt); None bij mismatch."""
+    try:
+        stamp = (str(p.resolve()), p.stat().st_mtime_ns)
+        if memo.get("stamp") == stamp:
+            return memo["data"]  # type: ignore[return-value]
+        with p.open("rb") as f:
+            data = pickle.load(f)
+        if data.get("pandas") != pd.__version__:
+            return None
+        memo.update(stamp=stamp, data=data)
+        return data
+    except Exception:
+        return None
+
+
+def _write_cache(p: Path, memo: Dict[str, object], data: dict) -> None:
+    data = {"pandas": pd.__version__, **data}
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+        memo.update(stamp=(str(p.resolve()), p.stat().st_mtime_ns), data=data)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+def _load_history_cache() -> Tuple[Dict[str, list], Optional[pd.DataFrame]]:
+    data = _read_cache(_history_cache_path(), _HISTORY_MEMO)
+    if data is None:
+        return {}, None
+    return data["index"], data["frame"]
+
+
+def _save_history_cache(index: Dict[str, list], frame: pd.DataFrame) -> None:
+    _write_cache(_history_cache_path(), _HISTORY_MEMO, {"index": index, "frame": frame})
+
+
+def _full_history(snaps: List[Path]) -> pd.DataFrame:
+    """
+    Volledige lange tabel (gesorteerd), incrementeel bijgewerkt: alleen snapshots die
+    nieuw of gewijzigd zijn t.o.v. de opgeslagen index worden geparsed.
+    """
+    known, cached = _load_history_cache()
+    if cached is None:
+        known = {}
+    dirty, index = scan_snapshots(snaps, known)
+    if cached is not None and not dirty and index == known:
+        return cached
+
+    if cached is None or len(dirty) > len(snaps) // 2:
+        frame = _history_rows(iter_snapshots(HISTORY_DIR))
+    else:
+        # Rijen van gewijzigde/verdwenen snapshots eruit, nieuwe versies erbij
+        stale = {_date_from_name(Path(n)) for n in set(known) - set(index)}
+        stale |= {_date_from_name(p) for p in dirty}
+        keep = cached[~cached["date"].isin(list(stale))] if not cached.empty else cached
+        fresh = _history_rows((p, _read_snapshot_or_none(p)) for p in dirty)
+        frame = pd.concat([f for f in (keep, fresh) if not f.empty] or [keep], ignore_index=True)
+
+    if not frame.empty:
+        for c in _TEXT_COLUMNS:
+            frame[c] = frame[c].astype(_TEXT_DTYPE)
+        frame = frame.sort_values(["material_id", "date"]).reset_index(drop=True)
+    _save_history_cache(index, frame)
+    return frame
+
+
+def _read_snapshot_or_none(p: Path) -> Optional[pd.DataFrame]:
+    try:
+        return read_snapshot(p)
+    except Exception:
+        return None
+
+
+# Vanaf pandas 3 blijft NaN bij astype(str) NaN, en matcht een "nan"-filter dus niet
+_NAN_ID_MATCHES = not pd.Series([np.nan], dtype=object).astype(str).isna().iloc[0]
+
+
 def build_history_df(material_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
     """
     Bouw een lange tabel met kolommen:
       date (datetime64), material_id, price_eur_per_kg, description, commodity (optioneel)
+    Gebruikt een gecachte tabel (data/history/.history_cache.pkl); alleen nieuwe of
+    gewijzigde snapshots worden geparsed.
     """
-    rows: List[dict] = []
     snaps = list_snapshots()
     if not snaps:
-        return pd.DataFrame(
-            columns=["date", "material_id", "price_eur_per_kg", "description", "commodity"]
-        )
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
 
+    out = _full_history(snaps)
     want = set(str(x) for x in material_ids) if material_ids else None
+    if want and not out.empty:
+        hit = out["material_id"].isin(want)
+        if not _NAN_ID_MATCHES:
+            hit &= out["material_id"] != "nan"
+        out = out[hit].reset_index(drop=True)
+    if out.empty:
+        return pd.DataFrame()
+    return out.copy()
+
+
+# --- Geconsolideerde store (SQLite) ---------------------------------------------
+
+
+def history_store() -> HistoryStore:
+    return HistoryStore(HISTORY_DIR / "history.sqlite")
+
+
+def ingest_snapshot(p: Path, sig: Optional[list] = None) -> bool:
+    """Neem één snapshot op in de store (vervangt eerdere rijen van die datum)."""
+    dt = _date_from_name(p)
+    if dt is None:
+        return False
+    if sig is None:
+        names = [s.name for s in list_snapshots()]
+        i = names.index(p.name) if p.name in names else 0
+        pred = names[i - 1] if is_delta(p) and i > 0 else (_ref_name(p) if is_ref(p) else None)
+        st = p.stat()
+        sig = [st.st_size, st.st_mtime_ns, _sha1(p), pred]
+    df = _read_snapshot_or_none(p)
+    try:
+        history_store().ingest(
+            p.name, dt, _normalize_snapshot(df if df is not None else pd.DataFrame(), None), sig
+        )
+    except sqlite3.Error:
+        # Store is een afgeleide index; snapshot zelf is al geschreven
+        return False
+    return True
 
-    for p in snaps:
-        dt = _date_from_name(p)
-        if dt is None:
-            continue
-        try:
-            df = pd.read_csv(p)
-        except Exception:
-            continue
 
-        # Normaliseer kolommen
-        for col in ["material_id", "description", "commodity", "price_eur_per_kg"]:
-            if col not in df.columns:
-                if col == "price_eur_per_kg":
-                    df[col] = pd.NA
-                else:
-                    df[col] = ""
-
-        if want:
-            df = df[df["material_id"].astype(str).isin(want)]
-
-        for _, r in df.iterrows():
-            rows.append(
-                dict(
-                    date=dt,
-                    material_id=str(r.get("material_id", "")),
-                    description=str(r.get("description", "")),
-                    commodity=str(r.get("commodity", "")),
-                    price_eur_per_kg=pd.to_numeric(r.get("price_eur_per_kg"), errors="coerce"),
+def sync_history_store() -> int:
+    """
+    Breng de store in lijn met data/history: nieuwe of gewijzigde snapshots (opnieuw)
+    erin, verdwenen eruit. Parse-kosten zijn O(nieuwe snapshots).
+    """
+    snaps = list_snapshots()
+    store = history_store()
+    known = store.ingested()
+    dirty, index = scan_snapshots(snaps, known)
+    for name in set(known) - set(index):
+        store.remove(name)
+    n = 0
+    pending = {p.name for p in dirty}
+    for p in dirty:
+        target = index[p.name][3] if is_ref(p) else None
+        if target and target not in pending and _date_from_name(Path(target)):
+            # Ref naar een al bijgewerkte snapshot: rijen in de store kopiëren i.p.v. parsen
+            try:
+                store.ingest_copy(
+                    p.name, _date_from_name(p), _date_from_name(Path(target)), index[p.name]
                 )
-            )
-
-    out = pd.DataFrame(rows)
-    if not out.empty:
-        out = out.sort_values(["material_id", "date"]).reset_index(drop=True)
-    return out
+                ok = True
+            except sqlite3.Error:
+                ok = False
+        else:
+            ok = ingest_snapshot(p, index[p.name])
+        pending.discard(p.name)
+        if ok:
+            n += 1
+    redo = {p.name for p in dirty}
+    for name, sig in index.items():
+        # Alleen mtime veranderd (hash gelijk): index bijwerken zodat we niet opnieuw hashen
+        if name not in redo and known.get(name) != sig:
+            store.set_sig(name, sig)
+    return n
+
+
+def query_history(
+    material_ids: Optional[Iterable[str]] = None, date_from=None, date_to=None
+) -> pd.DataFrame:
+    """Als build_history_df, maar uit de geïndexeerde store (kost O(resultaat))."""
+    if not list_snapshots():
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    sync_history_store()
+    return history_store().query(material_ids, date_from, date_to)
 
 
 def get_price_series(material_id: str) -> pd.DataFrame:
     """Geschiedenis voor één materiaal (date, price_eur_per_kg)."""
-    df = build_history_df([material_id])
+    df = query_history([material_id])
     if df.empty:
         return df
     return df[["date", "price_eur_per_kg"]].sort_values("date")
 
 
-# --- Diffs & controles ---------------------------------------------------------
+# --- Statistische anomalieën over de volledige historie ------------------------------
 
+# Eén cachebestand per (window, min_periods, min_scale): page 26 en de tools met
+# andere instellingen overschrijven elkaars cache dan niet
+_ANOMALY_MEMO: Dict[tuple, Dict[str, object]] = {}
+ANOMALY_CACHE_KEEP = 4  # aantal configuraties op schijf (oudste eerst weg)
 
-def diff_vs_latest() -> pd.DataFrame:
+
+def _anomaly_cache_path(key: tuple) -> Path:
+    return HISTORY_DIR / (".anomaly_cache." + "_".join(str(k) for k in key) + ".pkl")
+
+
+def _prune_anomaly_caches(keep: Path) -> None:
+    try:
+        files = sorted(
+            HISTORY_DIR.glob(".anomaly_cache.*.pkl"),
+            key=lambda p: p.stat().st_mtime_ns,
+            reverse=True,
+        )
+        for p in [f for f in files if f != keep][ANOMALY_CACHE_KEEP - 1 :]:
+            p.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _append_scores(
+    scores: pd.DataFrame, fresh: pd.DataFrame, since: datetime, cfg: StatAnomalyConfig
+) -> pd.DataFrame:
+    """Scoor alleen nieuwe noteringen, met de laatste window+1 cache-rijen als aanloop."""
+    tail = scores.groupby("material_id", sort=False).tail(cfg.window + 1)
+    tail = tail[["material_id", "date", "price"]].rename(columns={"price": "price_eur_per_kg"})
+    fresh = fresh[["material_id", "date", "price_eur_per_kg"]]
+    new = score_history(pd.concat([tail, fresh], ignore_index=True), cfg, since=since)
+    out = pd.concat([f for f in (scores, new) if not f.empty] or [scores], ignore_index=True)
+    return out.sort_values(["material_id", "date"], kind="mergesort").reset_index(drop=True)
+
+
+def price_scores(cfg: StatAnomalyConfig = StatAnomalyConfig()) -> pd.DataFrame:
     """
-    Vergelijk current materials_db.csv met laatste snapshot.
-    Geeft: material_id, old_price, new_price, pct_change
+    z-score en MAD-score van elke prijsstap in de historie (zie utils.anomalies).
+    Gecachet in data/history/.anomaly_cache.<config>.pkl; komen er alleen snapshots na
+    de laatste gecachete datum bij, dan worden alleen die gescoord.
+    """
+    if not list_snapshots():
+        return score_history(pd.DataFrame(), cfg)
+    sync_history_store()
+    store = history_store()
+    known = store.ingested()
+    key = (cfg.window, cfg.min_periods, cfg.min_scale)
+    path = _anomaly_cache_path(key)
+    memo = _ANOMALY_MEMO.setdefault(key, {})
+    cache = _read_cache(path, memo)
+    if cache is not None and cache["key"] == key and cache["known"] == known:
+        return cache["scores"]
+
+    scores = None
+    if cache is not None and cache["key"] == key:
+        old = cache["known"]
+        added = [n for n in known if n not in old]
+        last = max((_date_from_name(Path(n)) for n in old), default=None)
+        unchanged = all(known.get(n) == sig for n, sig in old.items())
+        if unchanged and added and last is not None:
+            since = min(_date_from_name(Path(n)) for n in added)
+            if since > last:
+                scores = _append_scores(cache["scores"], store.query(date_from=since), since, cfg)
+    if scores is None:
+        scores = score_history(store.query(), cfg)
+    _write_cache(path, memo, {"key": key, "known": known, "scores": scores})
+    _prune_anomaly_caches(path)
+    return scores
+
+
+def material_price_stats(cfg: StatAnomalyConfig = StatAnomalyConfig()) -> pd.DataFrame:
+    """Per materiaal: n, mean/std/median/mad van recente prijsstappen, laatste prijs."""
+    return material_stats(price_scores(cfg), cfg)
+
+
+def history_anomalies(cfg: StatAnomalyConfig = StatAnomalyConfig()) -> pd.DataFrame:
+    """Alle historische prijsstappen boven de z- of MAD-drempel."""
+    return flag_scores(price_scores(cfg), cfg)
+
+
+def stat_anomalies_vs_latest(cfg: StatAnomalyConfig = StatAnomalyConfig()) -> pd.DataFrame:
+    """
+    Huidige materials_db.csv t.o.v. laatste snapshot, gescoord tegen de historische
+    volatiliteit van elk materiaal (i.p.v. een vaste procentdrempel).
     """
     snap = latest_snapshot()
     if snap is None or not MATERIALS_CSV.exists():
-        return pd.DataFrame(columns=["material_id", "old_price", "new_price", "pct_change"])
+        return score_changes(pd.DataFrame(columns=CHANGE_COLUMNS), material_stats(pd.DataFrame()))
+    changes = price_changes(read_snapshot(snap), pd.read_csv(MATERIALS_CSV))
+    return score_changes(changes, material_price_stats(cfg), cfg)
+
+
+# --- Aggregaties voor grafieken --------------------------------------------------
+
+# Resolutie -> pandas periodecode; "D" is de ruwe reeks (laatste waarde per dag)
+RESOLUTIONS = {"D": "Dag", "W": "Week", "M": "Maand"}
+AGG_STATS = ["last", "min", "max", "mean"]
+# Venster (in perioden) voor de rollende volatiliteit (std van periode-rendementen)
+VOL_WINDOW = {"D": 20, "W": 12, "M": 6}
+# Meer punten dan dit per lijn schaalt slecht in st.line_chart
+MAX_CHART_POINTS = 400
+
+_AGG_MEMO: Dict[str, object] = {}
+
+
+def _aggregate(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Eén gevectoriseerde pass over de lange tabel: per (material_id, periode) last/min/max/
+    mean/n en een rollende volatiliteit. `date` is de laatste dag van de periode.
+    """
+    cols = ["material_id", "date", *AGG_STATS, "n", "volatility"]
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+    work = pd.DataFrame(
+        {
+            "material_id": df["material_id"].astype(str).to_numpy(),
+            "date": pd.to_datetime(df["date"]).dt.to_period(freq).dt.end_time.dt.normalize(),
+            "price": pd.to_numeric(df["price_eur_per_kg"], errors="coerce").to_numpy(),
+        }
+    ).dropna(subset=["date", "price"])
+    # Stabiele sortering: 'last' is de laatste notering binnen de periode
+    work = work.sort_values(["material_id", "date"], kind="mergesort")
+    out = (
+        work.groupby(["material_id", "date"], sort=False)["price"]
+        .agg(last="last", min="min", max="max", mean="mean", n="count")
+        .reset_index()
+    )
+    ret = out.groupby("material_id", sort=False)["last"].pct_change().to_numpy(float)
+    out["volatility"] = _rolling_std(ret, out["material_id"].to_numpy(), VOL_WINDOW.get(freq, 12))
+    return out[cols]
+
+
+def _rolling_std(x: np.ndarray, keys: np.ndarray, window: int) -> np.ndarray:
+    """Rollende steekproef-std (min. 2 waarden) binnen aaneengesloten groepen."""
+    out = np.full(len(x), np.nan)
+    for rows, win in iter_windows(x, keys, window):
+        ok = np.sum(~np.isnan(win), axis=1) >= 2
+        if ok.any():
+            out[rows[ok]] = np.nanstd(win[ok], axis=1, ddof=1)
+    return out
+
+
+def history_aggregates(freq: str = "W") -> pd.DataFrame:
+    """
+    Week- ("W") of maand- ("M") aggregaten voor alle materialen (lang formaat).
+    Worden in één pass voor alle resoluties berekend en in-memory bewaard tot de
+    store verandert.
+    """
+    if freq not in RESOLUTIONS:
+        raise ValueError(f"Onbekende resolutie {freq!r}; kies uit {list(RESOLUTIONS)}")
+    if freq == "D":
+        return _aggregate(query_history(), "D")
+    if not list_snapshots():
+        return _aggregate(pd.DataFrame(), freq)
+    sync_history_store()
+    db = history_store().db_path
+    st = db.stat()
+    stamp = (str(db.resolve()), st.st_size, st.st_mtime_ns)
+    if _AGG_MEMO.get("stamp") != stamp:
+        full = history_store().query()
+        _AGG_MEMO.clear()
+        _AGG_MEMO.update({f: _aggregate(full, f) for f in RESOLUTIONS if f != "D"}, stamp=stamp)
+    return _AGG_MEMO[freq]  # type: ignore[return-value]
+
+
+def pick_resolution(date_from, date_to, max_points: int = MAX_CHART_POINTS) -> str:
+    """Fijnste resolutie die binnen `max_points` punten per lijn blijft."""
+    if date_from is None or date_to is None:
+        return "M"
+    days = (pd.Timestamp(date_to) - pd.Timestamp(date_from)).days + 1
+    if days <= max_points:
+        return "D"
+    if days / 7 <= max_points:
+        return "W"
+    return "M"
+
+
+def chart_frame(
+    material_ids: Iterable[str],
+    date_from=None,
+    date_to=None,
+    freq: Optional[str] = None,
+    stat: str = "last",
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Wide frame (index=date, kolom per material_id) voor st.line_chart, op de gevraagde
+    of (bij freq=None) automatisch gekozen resolutie. Geeft (frame, resolutie).
+    """
+    ids = [str(x) for x in material_ids]
+    if freq is None:
+        dates = [d for d in _snapshot_index()[0] if d is not None]
+        lo = date_from if date_from is not None else (dates[0] if dates else None)
+        hi = date_to if date_to is not None else (dates[-1] if dates else None)
+        freq = pick_resolution(lo, hi)
+    if freq == "D":
+        agg = _aggregate(query_history(ids, date_from, date_to), "D")
+    else:
+        agg = history_aggregates(freq)
+        agg = agg[agg["material_id"].isin(ids)]
+        if date_from is not None:
+            agg = agg[agg["date"] >= pd.Timestamp(date_from)]
+        if date_to is not None:
+            # Periode-einde kan na date_to vallen; die periode hoort er wel bij
+            agg = agg[agg["date"].dt.to_period(freq).dt.start_time <= pd.Timestamp(date_to)]
+    if agg.empty:
+        return pd.DataFrame(), freq
+    wide = agg.pivot(index="date", columns="material_id", values=stat).sort_index()
+    return wide, freq
+
+
+def price_returns(freq: str = "W", material_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Log-rendementen van de laatste prijs per periode: wide frame (index=periode-einde,
+    kolom per material_id). Basis voor volatiliteit/correlatie in utils.montecarlo.
+    Niet-positieve prijzen en ontbrekende perioden geven NaN.
+    """
+    agg = _aggregate(query_history(), "D") if freq == "D" else history_aggregates(freq)
+    if material_ids is not None:
+        agg = agg[agg["material_id"].isin([str(x) for x in material_ids])]
+    if agg.empty:
+        return pd.DataFrame()
+    wide = agg.pivot(index="date", columns="material_id", values="last").sort_index()
+    logp = np.log(wide.where(wide > 0))
+    return logp.diff().iloc[1:]
+
+
+# --- Point-in-time ---------------------------------------------------------------
+
+
+_SNAP_INDEX: Dict[str, object] = {}
+
+
+def _snapshot_index() -> Tuple[List[datetime], List[Path]]:
+    """Gesorteerde snapshotdatums + paden (voor binary search), in-memory zolang de map
+    niet verandert (mtime van de map wijzigt bij toevoegen/verwijderen)."""
+    try:
+        stamp = (str(HISTORY_DIR.resolve()), HISTORY_DIR.stat().st_mtime_ns)
+    except OSError:
+        return [], []
+    if _SNAP_INDEX.get("stamp") != stamp:
+        snaps = list_snapshots()
+        _SNAP_INDEX.update(stamp=stamp, dates=[_date_from_name(p) for p in snaps], snaps=snaps)
+    return _SNAP_INDEX["dates"], _SNAP_INDEX["snaps"]  # type: ignore[return-value]
+
+
+def _as_datetime(date) -> datetime:
+    return pd.Timestamp(date).to_pydatetime().replace(tzinfo=None)
+
 
-    current = pd.read_csv(MATERIALS_CSV)
-    prev = pd.read_csv(snap)
+def _index_as_of(date) -> int:
+    dates, _ = _snapshot_index()
+    return bisect.bisect_right(dates, _as_datetime(date)) - 1
 
-    # Alleen nodige kolommen
-    for df in (current, prev):
-        for col in ["material_id", "price_eur_per_kg"]:
-            if col not in df.columns:
-                df[col] = pd.NA
 
-    c = current[["material_id", "price_eur_per_kg"]].copy()
-    p = prev[["material_id", "price_eur_per_kg"]].copy()
-    c["price_eur_per_kg"] = pd.to_numeric(c["price_eur_per_kg"], errors="coerce")
-    p["price_eur_per_kg"] = pd.to_numeric(p["price_eur_per_kg"], errors="coerce")
+def snapshot_as_of(date) -> Optional[Path]:
+    """Laatste snapshot op of vóór `date` (None als er geen is)."""
+    i = _index_as_of(date)
+    return _snapshot_index()[1][i] if i >= 0 else None
 
-    m = p.merge(c, on="material_id", suffixes=("_old", "_new"), how="outer")
-    m["pct_change"] = (m["price_eur_per_kg_new"] - m["price_eur_per_kg_old"]) / m[
-        "price_eur_per_kg_old"
-    ]
-    m = m.rename(columns={"price_eur_per_kg_old": "old_price", "price_eur_per_kg_new": "new_price"})
-    return m
+
+@lru_cache(maxsize=32)
+def _snapshot_at(path: str, stamp: tuple) -> Tuple[pd.DataFrame, pd.Series]:
+    """Gereconstrueerde tabel + prijs per material_id (laatste bij dubbelen); LRU op stamp."""
+    df = read_snapshot(Path(path))
+    if "material_id" in df.columns and "price_eur_per_kg" in df.columns:
+        prices = pd.Series(
+            pd.to_numeric(df["price_eur_per_kg"], errors="coerce").to_numpy(),
+            index=df["material_id"].astype(str),
+        )
+        prices = prices[~prices.index.duplicated(keep="last")]
+    else:
+        prices = pd.Series(dtype="float64")
+    return df, prices
+
+
+def _cached_snapshot(i: int) -> Tuple[pd.DataFrame, pd.Series]:
+    snaps = _snapshot_index()[1]
+    # Stamp over de hele keten (en verwezen snapshots): een gewijzigde base maakt ook
+    # de delta ongeldig
+    return _snapshot_at(str(snaps[i]), deps_stamp(snaps[i]))
+
+
+def materials_as_of(date) -> pd.DataFrame:
+    """Materials-tabel zoals die was op `date` (laatste snapshot op of vóór die datum)."""
+    i = _index_as_of(date)
+    if i < 0:
+        return pd.DataFrame(columns=list(SCHEMA_MATERIALS))
+    return _cached_snapshot(i)[0].copy()
+
+
+def price_as_of(material_id: str, date) -> Optional[float]:
+    """Prijs (EUR/kg) van één materiaal op `date`; None als onbekend."""
+    i = _index_as_of(date)
+    if i < 0:
+        return None
+    v = _cached_snapshot(i)[1].get(str(material_id))
+    return None if v is None or pd.isna(v) else float(v)
+
+
+def prices_as_of(queries: pd.DataFrame) -> pd.DataFrame:
+    """
+    Batch: queries met material_id + date -> extra kolommen snapshot_date en
+    price_eur_per_kg. Eén merge_asof op de snapshotdatums, daarna één join op de store;
+    er worden geen volledige snapshots geladen.
+    """
+    q = queries.copy()
+    q["_order"] = np.arange(len(q))
+    q["_mid"] = q["material_id"].astype(str)
+    q["_date"] = pd.to_datetime(q["date"], errors="coerce").astype("datetime64[ns]")
+    dates, _ = _snapshot_index()
+    snap = pd.DataFrame({"snapshot_date": pd.to_datetime(dates).astype("datetime64[ns]")})
+
+    valid = q[q["_date"].notna()].sort_values("_date")
+    if snap.empty or valid.empty:
+        valid = valid.assign(snapshot_date=pd.NaT)
+    else:
+        valid = pd.merge_asof(
+            valid, snap, left_on="_date", right_on="snapshot_date", direction="backward"
+        )
+    q = pd.concat([valid, q[q["_date"].isna()].assign(snapshot_date=pd.NaT)])
+
+    hist = pd.DataFrame(columns=["_mid", "snapshot_date", "price_eur_per_kg"])
+    if q["snapshot_date"].notna().any():
+        h = query_history(q["_mid"].unique(), q["snapshot_date"].min(), q["snapshot_date"].max())
+        hist = (
+            h.drop_duplicates(["material_id", "date"], keep="last")
+            .rename(columns={"material_id": "_mid", "date": "snapshot_date"})
+            .astype({"snapshot_date": "datetime64[ns]"})[
+                ["_mid", "snapshot_date", "price_eur_per_kg"]
+            ]
+        )
+    q = q.drop(columns=["price_eur_per_kg"], errors="ignore")
+    out = q.merge(hist, on=["_mid", "snapshot_date"], how="left")
+    out = out.sort_values("_order").drop(columns=["_order", "_mid", "_date"])
+    out["price_eur_per_kg"] = pd.to_numeric(out["price_eur_per_kg"], errors="coerce")
+    return out.reset_index(drop=True)
+
+
+# --- Diffs & controles ---------------------------------------------------------
+
+
+def diff_latest(fields: Iterable[str] = DIFF_FIELDS) -> Optional[SnapshotDiff]:
+    """Gestructureerde diff van materials_db.csv t.o.v. de laatste snapshot (None als die ontbreekt)."""
+    snap = latest_snapshot()
+    if snap is None or not MATERIALS_CSV.exists():
+        return None
+    return diff_frames(read_snapshot(snap), pd.read_csv(MATERIALS_CSV), fields)
+
+
+def diff_vs_latest() -> pd.DataFrame:
+    """
+    Vergelijk current materials_db.csv met laatste snapshot.
+    Geeft: material_id, old_price, new_price, pct_change
+    """
+    d = diff_latest(["price_eur_per_kg"])
+    if d is None:
+        return pd.DataFrame(columns=["material_id", "old_price", "new_price", "pct_change"])
+    return d.price_table()
 
 
 @dataclass
@@ -181,7 +782,4 @@ def find_anomalies(df_diff: pd.DataFrame, cfg: AnomalyConfig = AnomalyConfig())
     """Filter regels met abs(pct_change) > threshold."""
     if df_diff.empty or "pct_change" not in df_diff.columns:
         return pd.DataFrame(columns=df_diff.columns)
-    a = df_diff.copy()
-    a = a[pd.notna(a["pct_change"])]
-    a["abs_pct"] = a["pct_change"].abs()
-    return a[a["abs_pct"] > cfg.threshold_pct].sort_values("abs_pct", ascending=False)
+    return flag_anomalies(df_diff, cfg.threshold_pct)
@@ -0,0 +1,153 @@
+# utils/history_store.py
+"""
+Geconsolideerde prijs-historie in één SQLite-bestand naast de snapshots.
+
+Eén rij per (snapshot, material_id), geïndexeerd op (material_id, date): een reeks of
+een set materialen opvragen kost O(resultaat) i.p.v. O(aantal snapshots).
+De materials_YYYYMMDD.csv-bestanden blijven de bron; de store is afgeleid en kan
+altijd opnieuw worden opgebouwd (bestand weggooien volstaat).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    material_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    price_eur_per_kg REAL,
+    description TEXT,
+    commodity TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_prices_material_date ON prices (material_id, date);
+CREATE INDEX IF NOT EXISTS ix_prices_date ON prices (date);
+CREATE TABLE IF NOT EXISTS snapshots (
+    name TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    sig TEXT
+);
+"""
+# Maximaal aantal material_ids per IN (...)-query (SQLite-standaard: 999 variabelen)
+_MAX_IDS = 900
+# Ophogen bij schemawijziging: de store wordt dan leeg opnieuw opgebouwd
+_SCHEMA_VERSION = 2
+
+# Zelfde volgorde als een gevulde build_history_df
+STORE_COLUMNS = ["date", "material_id", "description", "commodity", "price_eur_per_kg"]
+
+
+def _iso(d) -> str:
+    return pd.Timestamp(d).strftime("%Y-%m-%d")
+
+
+class HistoryStore:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.db_path, timeout=30)
+        if con.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            con.executescript("DROP TABLE IF EXISTS prices; DROP TABLE IF EXISTS snapshots;")
+            con.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        con.executescript(_SCHEMA)
+        return con
+
+    def ingested(self) -> Dict[str, list]:
+        """Opgenomen snapshots met hun watermark [size, mtime_ns, sha1, voorganger]."""
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT name, sig FROM snapshots").fetchall()
+        return {name: json.loads(sig) if sig else [] for name, sig in rows}
+
+    def set_sig(self, name: str, sig: list) -> None:
+        with closing(self._connect()) as con, con:
+            con.execute("UPDATE snapshots SET sig = ? WHERE name = ?", (json.dumps(sig), name))
+
+    def ingest(
+        self, name: str, date: datetime, frame: pd.DataFrame, sig: Optional[list] = None
+    ) -> None:
+        """
+        Vervang de rijen van één snapshot. frame: material_id, description, commodity,
+        price_eur_per_kg (zoals history._normalize_snapshot die maakt).
+        """
+        day = _iso(date)
+        price = pd.to_numeric(frame["price_eur_per_kg"], errors="coerce").astype(object)
+        rows = zip(
+            frame["material_id"].astype(str),
+            [day] * len(frame),
+            price.where(price.notna(), None),
+            frame["description"].astype(str),
+            frame["commodity"].astype(str),
+        )
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM prices WHERE date = ?", (day,))
+            con.executemany("INSERT INTO prices VALUES (?, ?, ?, ?, ?)", rows)
+            con.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                (name, day, json.dumps(sig) if sig is not None else None),
+            )
+
+    def ingest_copy(self, name: str, date: datetime, source_date: datetime, sig: list) -> None:
+        """Vervang de rijen van één snapshot door een kopie van die van source_date (refs)."""
+        day, src = _iso(date), _iso(source_date)
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM prices WHERE date = ?", (day,))
+            con.execute(
+                "INSERT INTO prices SELECT material_id, ?, price_eur_per_kg, description, "
+                "commodity FROM prices WHERE date = ? ORDER BY rowid",
+                (day, src),
+            )
+            con.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (name, day, json.dumps(sig))
+            )
+
+    def remove(self, name: str) -> None:
+        with closing(self._connect()) as con, con:
+            row = con.execute("SELECT date FROM snapshots WHERE name = ?", (name,)).fetchone()
+            if row:
+                con.execute("DELETE FROM prices WHERE date = ?", (row[0],))
+                con.execute("DELETE FROM snapshots WHERE name = ?", (name,))
+
+    def query(
+        self,
+        material_ids: Optional[Iterable[str]] = None,
+        date_from=None,
+        date_to=None,
+    ) -> pd.DataFrame:
+        """Lange tabel (zelfde kolommen als build_history_df), gesorteerd op material_id, date."""
+        where, args = [], []
+        ids = sorted({str(x) for x in material_ids}) if material_ids is not None else None
+        if date_from is not None:
+            where.append("date >= ?")
+            args.append(_iso(date_from))
+        if date_to is not None:
+            where.append("date <= ?")
+            args.append(_iso(date_to))
+        # Ids in blokken: oudere SQLite-builds staan maar 999 variabelen per query toe.
+        # De blokken zijn gesorteerd en disjunct, dus aan elkaar geplakt blijft de volgorde
+        chunks = [ids[i : i + _MAX_IDS] for i in range(0, len(ids), _MAX_IDS)] if ids else [[]]
+        rows = []
+        with closing(self._connect()) as con:
+            for chunk in chunks:
+                cond = [f"material_id IN ({','.join('?' * len(chunk))})"] if chunk else []
+                sql = (
+                    "SELECT date, material_id, description, commodity, price_eur_per_kg FROM prices"
+                    + (f" WHERE {' AND '.join(cond + where)}" if cond + where else "")
+                    + " ORDER BY material_id, date, rowid"
+                )
+                rows.extend(con.execute(sql, [*chunk, *args]).fetchall())
+        df = pd.DataFrame(rows, columns=STORE_COLUMNS)
+        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+        df["price_eur_per_kg"] = pd.to_numeric(df["price_eur_per_kg"], errors="coerce")
+        return df
+
+    def series(self, material_id: str) -> pd.DataFrame:
+        return self.query([material_id])[["date", "price_eur_per_kg"]]
@@ -1,3 +1,8 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
 from pathlib import Path
 
 import pandas as pd
@@ -27,6 +32,10 @@ SCHEMA_QUOTES = {
     "preferred": "Int64",
 }
 
+# Binaire sidecar (.<naam>.csv.pkl) naast elke CSV; uitzetten met COSTFORGE_SIDECAR=false
+SIDECAR_VERSION = 1
+SIDECAR_ENABLED = os.getenv("COSTFORGE_SIDECAR", "true").strip().lower() != "false"
+
 
 def paths():
     d = Path("data")
@@ -38,28 +47,166 @@ def paths():
     }
 
 
+def _apply_int64(df, schema):
+    for c, t in schema.items():
+        if t == "Int64" and c in df.columns:
+            df[c] = df[c].astype("Int64")
+    return df
+
+
 def _read_csv(p, schema=None):
     if schema is None:
         return pd.read_csv(p)
     dtypes = {k: v for k, v in schema.items() if v != "Int64"}
     df = pd.read_csv(p, dtype=dtypes)
-    for c, t in schema.items():
-        if t == "Int64" and c in df.columns:
-            df[c] = df[c].astype("Int64")
+    return _apply_int64(df, schema)
+
+
+def iter_csv_chunks(p, schema=None, chunksize=100_000):
+    """Als _read_csv, maar in stukken van `chunksize` regels (zelfde dtypes per chunk)."""
+    dtypes = {k: v for k, v in (schema or {}).items() if v != "Int64"} or None
+    with pd.read_csv(p, dtype=dtypes, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield _apply_int64(chunk, schema) if schema else chunk
+
+
+def sidecar_path(p) -> Path:
+    p = Path(p)
+    return p.with_name(f".{p.name}.pkl")
+
+
+def _schema_hash(schema) -> str:
+    raw = json.dumps(list((schema or {}).items()))
+    return hashlib.sha1(f"{SIDECAR_VERSION}|{pd.__version__}|{raw}".encode()).hexdigest()
+
+
+def _sidecar_key(p: Path, schema) -> tuple:
+    st = p.stat()
+    return (st.st_size, st.st_mtime_ns, _schema_hash(schema))
+
+
+def _read_sidecar(p: Path, key: tuple):
+    sc = sidecar_path(p)
+    try:
+        with sc.open("rb") as f:
+            # Eerst alleen de sleutel; het frame pas laden als die klopt
+            if pickle.load(f) != key:
+                return None
+            df = pickle.load(f)
+    except Exception:
+        return None
+    return df if isinstance(df, pd.DataFrame) else None
+
+
+def _write_sidecar(p: Path, key: tuple, df: pd.DataFrame) -> None:
+    sc = sidecar_path(p)
+    tmp = sc.with_name(f"{sc.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, sc)
+    except OSError:
+        # Read-only map e.d.: dan gewoon zonder sidecar verder
+        tmp.unlink(missing_ok=True)
+
+
+def read_csv_cached(p, schema=None):
+    """Als _read_csv, maar via een sidecar die geldig is zolang size/mtime/schema gelijk zijn."""
+    p = Path(p)
+    if not SIDECAR_ENABLED:
+        return _read_csv(p, schema)
+    try:
+        key = _sidecar_key(p, schema)
+    except OSError:
+        return _read_csv(p, schema)
+    df = _read_sidecar(p, key)
+    if df is None:
+        df = _read_csv(p, schema)
+        _write_sidecar(p, key, df)
     return df
 
 
 def load_materials():
-    return _read_csv(paths()["materials"], SCHEMA_MATERIALS)
+    return read_csv_cached(paths()["materials"], SCHEMA_MATERIALS)
 
 
 def load_processes():
-    return _read_csv(paths()["processes"], SCHEMA_PROCESSES)
+    return read_csv_cached(paths()["processes"], SCHEMA_PROCESSES)
 
 
 def load_bom():
-    return _read_csv(paths()["bom"], SCHEMA_BOM)
+    return read_csv_cached(paths()["bom"], SCHEMA_BOM)
 
 
 def load_quotes():
-    return _read_csv(paths()["quotes"], SCHEMA_QUOTES)
+    return read_csv_cached(paths()["quotes"], SCHEMA_QUOTES)
+
+
+# --- Compact-modus (opt-in): gedeelde categoricals + optioneel downcasten --------
+
+# Categorie-set -> (dataset, kolom); elke set deelt één CategoricalDtype zodat merges goedkoop blijven
+COMPACT_CATEGORIES = {
+    "material_id": [
+        ("materials", "material_id"),
+        ("bom", "material_id"),
+        ("quotes", "material_id"),
+    ],
+    "process_id": [("processes", "process_id"), ("bom", "process_route")],
+    "supplier": [("quotes", "supplier")],
+}
+COMPACT_DOWNCAST = {
+    "bom": {"qty": "Int32", "mass_kg": "float32", "runtime_h": "float32"},
+    "processes": {"machine_rate_eur_h": "float32", "labor_rate_eur_h": "float32"},
+    "quotes": {"lead_time_days": "Int32", "preferred": "Int8"},
+}
+
+
+def compact_frames(frames: dict, downcast: bool = False) -> dict:
+    """
+    Zet ID-kolommen om naar categoricals met één gedeelde categorie-set per soort ID.
+    downcast=True zet ook aantallen/tarieven om naar 32-bit (verliest precisie na ~7 cijfers).
+    """
+    out = {k: v.copy() for k, v in frames.items()}
+    for cols in COMPACT_CATEGORIES.values():
+        present = [(n, c) for n, c in cols if n in out and c in out[n].columns]
+        values = set()
+        for n, c in present:
+            values.update(out[n][c].dropna().astype(str).unique())
+        dtype = pd.CategoricalDtype(sorted(values))
+        for n, c in present:
+            out[n][c] = out[n][c].astype(dtype)
+    if downcast:
+        for n, casts in COMPACT_DOWNCAST.items():
+            if n in out:
+                for c, t in casts.items():
+                    if c in out[n].columns:
+                        out[n][c] = out[n][c].astype(t)
+    return out
+
+
+def load_compact(downcast: bool = False) -> dict:
+    frames = {
+        "materials": load_materials(),
+        "processes": load_processes(),
+        "bom": load_bom(),
+        "quotes": load_quotes(),
+    }
+    return compact_frames(frames, downcast=downcast)
+
+
+def memory_report(before: dict, after: dict) -> pd.DataFrame:
+    """Geheugengebruik (bytes, deep) per frame voor en na compact_frames."""
+    rows = []
+    for name, df in before.items():
+        b = int(df.memory_usage(deep=True).sum())
+        a = int(after[name].memory_usage(deep=True).sum()) if name in after else None
+        rows.append(
+            {
+                "frame": name,
+                "bytes_before": b,
+                "bytes_after": a,
+                "ratio": round(a / b, 3) if a is not None and b else None,
+            }
+        )
+    return pd.DataFrame(rows)
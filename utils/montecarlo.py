@@ -0,0 +1,230 @@
+# utils/montecarlo.py
+"""
+Monte Carlo kostenrisico: hoe ver kan een vaste offerteprijs afwijken als
+materiaalprijzen bewegen?
+
+1. price_risk: volatiliteit per materiaal en een correlatiematrix uit historische
+   log-rendementen (utils.history.price_returns), paarsgewijs over de beschikbare
+   perioden en daarna positief semi-definiet gemaakt.
+2. simulate_costs: gecorreleerde prijspaden (lognormaal, zonder drift) over
+   `horizon` perioden, door het kostenmodel gehaald.
+
+Een regeltotaal is lineair in de materiaalprijs:
+    total = (mass·price + process_cost) · (1+overhead) · (1+marge) = A·price + B
+Bij een meerstapsroute telt het materiaal bij de eerste bewerking, dus A = mass ·
+(1+oh_1) · (1+marge_1) (utils.pricing.material_markup) en B = total - A·price; daarvoor
+krijgt simulate_costs `procs` en `routes` mee. Zonder `procs` gelden de effectieve
+tarieven van de regel, en dan zijn regels met een meerstapsroute een benadering.
+Een project is dus `base + Δprijzen @ W` (één matrixproduct per blok simulaties), en een
+regelkwantiel volgt exact uit het prijskwantiel (lognormaal). Materialen zonder
+(genoeg) historie blijven op hun huidige prijs. Regels met een NaN-totaal tellen,
+net als bij DataFrame.sum, niet mee in de projecttotalen.
+
+Reproduceerbaar: vaste seed, vaste blokgrootte; elk blok krijgt een eigen
+SeedSequence-kind, dus het resultaat hangt niet af van het aantal workers.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .pricing import material_markup
+
+QUANTILES = (0.5, 0.9, 0.95)
+
+
+def _qlabel(q: float) -> str:
+    return f"p{round(q * 100):d}"
+
+
+@dataclass
+class PriceRisk:
+    materials: pd.Index  # material_ids met voldoende historie
+    sigma: np.ndarray  # std van log-rendement per periode
+    factor: np.ndarray  # (m, r) met factor @ factor.T == correlatie (r = rang)
+    periods: int  # aantal perioden in de historie
+    freq: str = "W"
+
+    @property
+    def corr(self) -> np.ndarray:
+        return self.factor @ self.factor.T
+
+    def table(self) -> pd.DataFrame:
+        return pd.DataFrame({"material_id": self.materials, "sigma": self.sigma})
+
+
+def _corr_factor(c: np.ndarray) -> np.ndarray:
+    """
+    Factor L (m, r) van de dichtstbijzijnde geldige correlatiematrix: negatieve
+    eigenwaarden (paarsgewijze schatting) op 0, rijen genormaliseerd zodat de diagonaal
+    1 is. Alleen positieve eigenwaarden: met T perioden is de rang vaak hooguit T - 1,
+    dus per simulatie zijn er veel minder onafhankelijke normalen nodig. Rijen van L
+    voor een deelverzameling materialen zijn direct de factor van hun deelmatrix.
+    """
+    vals, vecs = np.linalg.eigh((c + c.T) / 2)
+    keep = vals > 1e-10 * max(vals.max(), 1.0)
+    f = vecs[:, keep] * np.sqrt(vals[keep])
+    return f / np.sqrt(np.clip((f**2).sum(axis=1), 1e-12, None))[:, None]
+
+
+def price_risk(returns: pd.DataFrame, min_periods: int = 8, freq: str = "W") -> PriceRisk:
+    """
+    Volatiliteit en correlatie uit een wide frame met log-rendementen (kolom per
+    materiaal). Paarsgewijs: elk paar gebruikt de perioden waarin beide een rendement
+    hebben (min. `min_periods`, anders correlatie 0), met gemiddelde en std per
+    materiaal over al zijn perioden. Via matrixproducten i.p.v. DataFrame.corr, dat per
+    paar een lus draait; wijkt daar bij gaten in de historie licht van af.
+    """
+    if returns.empty:
+        return PriceRisk(pd.Index([]), np.empty(0), np.empty((0, 0)), 0, freq)
+    x = returns.to_numpy(dtype=float)
+    mask = ~np.isnan(x)
+    n = mask.sum(axis=0)
+    keep = n >= max(min_periods, 2)
+    x, mask, n = x[:, keep], mask[:, keep], n[keep]
+    mats = pd.Index(returns.columns[keep])
+    if not len(mats):
+        return PriceRisk(mats, np.empty(0), np.empty((0, 0)), len(returns), freq)
+    mean = np.nansum(x, axis=0) / n
+    xc = np.where(mask, x - mean, 0.0)
+    sigma = np.sqrt((xc**2).sum(axis=0) / (n - 1))
+    m = mask.astype(float)
+    pairs = m.T @ m
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (xc.T @ xc) / (pairs - 1)
+        corr = cov / np.outer(sigma, sigma)
+    corr[(pairs < min_periods) | ~np.isfinite(corr)] = 0.0
+    np.fill_diagonal(corr, 1.0)
+    return PriceRisk(mats, sigma, _corr_factor(np.clip(corr, -1.0, 1.0)), len(returns), freq)
+
+
+@dataclass
+class MonteCarloConfig:
+    n_sims: int = 10_000
+    horizon: int = 12  # perioden vooruit (bij freq "W": weken, bijv. offertegeldigheid)
+    seed: int = 42
+    workers: int = 1  # >1: blokken verdeeld over een process pool
+    chunk: int = 2_000  # simulaties per blok (bepaalt ook de seeds; niet per run wijzigen)
+    quantiles: Sequence[float] = QUANTILES
+
+
+@dataclass
+class MonteCarloResult:
+    lines: pd.DataFrame  # per regel: base_total + kwantielen
+    projects: pd.DataFrame  # per project: base_total, mean, std, kwantielen, risico-opslag
+    materials: pd.DataFrame  # per materiaal: prijs, sigma over de horizon, met/zonder historie
+    samples: Optional[np.ndarray] = None  # (n_sims, projecten) bij keep_samples=True
+
+
+def _line_terms(lines: pd.DataFrame, procs: Optional[pd.DataFrame] = None, routes=None):
+    """A (per EUR/kg), B en het totaal per regel uit de compute_costs-uitvoer."""
+
+    def col(c):
+        return pd.to_numeric(lines[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    if procs is None:
+        w = (1 + col("overhead_pct")) * (1 + col("margin_pct"))
+    else:
+        w = material_markup(lines, procs, routes)
+    a, price, total = col("mass_kg") * w, col("price_eur_per_kg"), col("total_cost")
+    return a, total - a * price, price, total
+
+
+def _simulate_block(args) -> np.ndarray:
+    """Eén blok: (k, projecten)-totalen. Top-level zodat het in een process pool past."""
+    seed, k, p0, drift, scale, factor, weights, base = args
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((k, factor.shape[1])) @ factor.T
+    # Alleen de prijsbeweging t.o.v. p0 door het model; base = totalen bij p0
+    moves = p0 * np.expm1(drift + scale * z)
+    return base + moves @ weights
+
+
+def simulate_costs(
+    lines: pd.DataFrame,
+    risk: PriceRisk,
+    cfg: MonteCarloConfig = MonteCarloConfig(),
+    project_col: Optional[str] = None,
+    keep_samples: bool = False,
+    procs: Optional[pd.DataFrame] = None,
+    routes: Optional[pd.DataFrame] = None,
+) -> MonteCarloResult:
+    """
+    Simuleer materiaalprijzen over cfg.horizon perioden en rapporteer kwantielen van
+    het totaal per regel en per project (`project_col`, anders één project "totaal").
+    `lines` is de uitvoer van compute_costs / compute_costs_batch; geef dezelfde `procs`
+    en `routes` mee, anders zijn regels met een meerstapsroute een benadering.
+    """
+    a, b, price, total = _line_terms(lines, procs, routes)
+    ok = ~np.isnan(total)
+    projects = (
+        lines[project_col].to_numpy() if project_col else np.full(len(lines), "totaal", object)
+    )
+    pcodes, puniq = pd.factorize(projects, use_na_sentinel=False)
+    mcodes, muniq = pd.factorize(lines["material_id"].to_numpy(), use_na_sentinel=False)
+
+    # Prijs per materiaal (eerste regel); risico alleen voor materialen met historie
+    p0 = np.nan_to_num(price[np.unique(mcodes, return_index=True)[1]])
+    pos = risk.materials.get_indexer(pd.Index(muniq))
+    has = np.flatnonzero(pos >= 0)
+    sigma = np.zeros(len(muniq))
+    sigma[has] = np.nan_to_num(risk.sigma[pos[has]])
+    scale = sigma * np.sqrt(cfg.horizon)
+    sim = has[scale[has] > 0]  # alleen bewegende materialen simuleren
+
+    # Projecttotaal = base + Σ_materiaal Δprijs · W[materiaal, project], W = Σ A (geldige regels)
+    weights = np.zeros((len(muniq), len(puniq)))
+    np.add.at(weights, (mcodes[ok], pcodes[ok]), a[ok])
+    base = np.bincount(pcodes[ok], weights=total[ok], minlength=len(puniq))
+    factor = risk.factor[pos[sim]]
+
+    sizes = [min(cfg.chunk, cfg.n_sims - s) for s in range(0, cfg.n_sims, cfg.chunk)]
+    seeds = np.random.SeedSequence(cfg.seed).spawn(len(sizes))
+    drift = -0.5 * scale[sim] ** 2  # verwachte prijs blijft p0
+    jobs = [
+        (sd, k, p0[sim], drift, scale[sim], factor, weights[sim], base)
+        for sd, k in zip(seeds, sizes)
+    ]
+    if cfg.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=cfg.workers) as pool:
+            blocks: List[np.ndarray] = list(pool.map(_simulate_block, jobs))
+    else:
+        blocks = [_simulate_block(j) for j in jobs]
+    totals = np.vstack(blocks) if blocks else np.empty((0, len(puniq)))
+
+    qs = list(cfg.quantiles)
+    proj = pd.DataFrame({project_col or "project": puniq, "base_total": base})
+    proj["mean"] = totals.mean(axis=0)
+    proj["std"] = totals.std(axis=0, ddof=1) if len(totals) > 1 else np.nan
+    for q, v in zip(qs, np.quantile(totals, qs, axis=0) if len(totals) else [np.nan] * len(qs)):
+        proj[_qlabel(q)] = v
+    if qs:
+        proj["risk_premium"] = proj[_qlabel(max(qs))] - proj["base_total"]
+
+    # Regelkwantielen exact: A·prijs + B is monotoon in de (lognormale) prijs
+    line_out = lines[[c for c in ("line_id", "material_id") if c in lines.columns]].copy()
+    if project_col:
+        line_out.insert(0, project_col, projects)
+    line_out["base_total"] = total
+    s_line = scale[mcodes]
+    p_line = np.nan_to_num(price)
+    for q in qs:
+        zq = np.where(a >= 0, NormalDist().inv_cdf(q), NormalDist().inv_cdf(1 - q))
+        pq = p_line * np.exp(-0.5 * s_line**2 + s_line * zq)
+        line_out[_qlabel(q)] = np.where(ok, a * pq + b, np.nan)
+
+    mats_out = pd.DataFrame(
+        {"material_id": muniq, "price": p0, "sigma_horizon": scale, "history": pos >= 0}
+    )
+    return MonteCarloResult(
+        lines=line_out.reset_index(drop=True),
+        projects=proj,
+        materials=mats_out,
+        samples=totals if keep_samples else None,
+    )
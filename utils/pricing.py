@@ -1,23 +1,393 @@
-def compute_costs(mats, procs, bom):
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .frame_memo import FrameMemo
+from .io import SCHEMA_BOM, iter_csv_chunks, paths
+from .routing import explode_routes
+
+COST_COLUMNS = ["material_cost", "process_cost", "overhead", "base_cost", "margin", "total_cost"]
+REQUIRED_COLUMNS = [
+    "mass_kg",
+    "price_eur_per_kg",
+    "runtime_h",
+    "machine_rate_eur_h",
+    "labor_rate_eur_h",
+    "overhead_pct",
+    "margin_pct",
+]
+
+
+def _cost_columns(v) -> Dict[str, object]:
+    """COST_COLUMNS uit de REQUIRED_COLUMNS (Series of NumPy-arrays, zelfde bewerkingen)."""
+    out = {"material_cost": v["mass_kg"] * v["price_eur_per_kg"]}
+    out["process_cost"] = v["runtime_h"] * (v["machine_rate_eur_h"] + v["labor_rate_eur_h"])
+    out["overhead"] = (out["material_cost"] + out["process_cost"]) * v["overhead_pct"]
+    out["base_cost"] = out["material_cost"] + out["process_cost"] + out["overhead"]
+    out["margin"] = out["base_cost"] * v["margin_pct"]
+    out["total_cost"] = out["base_cost"] + out["margin"]
+    return out
+
+
+def _first_rows(procs: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """processes met één rij per process_id (eerste), geïndexeerd op process_id."""
+    if "process_id" not in procs.columns:
+        return None
+    return procs.drop_duplicates("process_id").set_index("process_id")
+
+
+def _apply_routes(df: pd.DataFrame, procs1: Optional[pd.DataFrame], routes) -> pd.DataFrame:
+    """
+    Meerstapsroutes (utils.routing.ROUTE_SEP of een route-tabel) per bewerking
+    doorrekenen en per regel terugschrijven als effectieve tarieven:
+
+        machine/labor = Σ share · tarief van de bewerking  (runtime_h verdeeld naar share)
+        overhead_pct  = (materiaal · oh_1 + Σ proces_i · oh_i) / (materiaal + proces)
+        margin_pct    = Σ basis_i · marge_i / Σ basis_i
+
+    Het materiaal telt bij de eerste bewerking. Zo blijven de COST_COLUMNS van de regel
+    gelijk aan de som over de bewerkingen en geldt de gewone formule op de regel, ook
+    voor modules die daarmee verder rekenen (scenario's, herberekenen).
+    """
+    if procs1 is None or "process_route" not in df.columns:
+        return df
+    # Alleen regels zonder process-match kunnen een route zijn (process_ids gaan voor)
+    cand = df["machine_rate_eur_h"].isna().to_numpy() & df["process_route"].notna().to_numpy()
+    if not cand.any():
+        return df
+    rows = np.flatnonzero(cand)
+    ops = explode_routes(df["process_route"].iloc[rows], routes, procs1.index)
+    if not ops.routed.any():
+        return df
+    take = ops.routed[ops.line]
+    line, share, pid = ops.line[take], ops.share[take], ops.process_id[take]
+    first = ops.step[take] == 1
+    pos = procs1.index.get_indexer(pid)
+
+    def rate(c):
+        v = pd.to_numeric(procs1[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        return np.where(pos >= 0, v[np.maximum(pos, 0)], np.nan)
+
+    def per_line(w):
+        return np.bincount(line, weights=w, minlength=len(rows))
+
+    def col(c):
+        return pd.to_numeric(df[c].iloc[rows], errors="coerce").to_numpy(
+            dtype=float, na_value=np.nan
+        )
+
+    mach, lab, oh, mg = (rate(c) for c in REQUIRED_COLUMNS[3:])
+    mat = np.where(first, (col("mass_kg") * col("price_eur_per_kg"))[line], 0.0)
+    proc = col("runtime_h")[line] * share * (mach + lab)
+    base = (mat + proc) * (1 + oh)
+    eff = {
+        "machine_rate_eur_h": per_line(share * mach),
+        "labor_rate_eur_h": per_line(share * lab),
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        oh1, mg1 = per_line(np.where(first, oh, 0.0)), per_line(np.where(first, mg, 0.0))
+        den = per_line(mat + proc)
+        eff["overhead_pct"] = np.where(den != 0, per_line(mat * oh + proc * oh) / den, oh1)
+        bsum = per_line(base)
+        eff["margin_pct"] = np.where(bsum != 0, per_line(base * mg) / bsum, mg1)
+
+    hit = rows[ops.routed]
+    for c, v in eff.items():
+        df.iloc[hit, df.columns.get_loc(c)] = v[ops.routed]
+    for c, v in _cost_columns(df.iloc[hit]).items():
+        df.iloc[hit, df.columns.get_loc(c)] = v.to_numpy()
+    return df
+
+
+def material_markup(lines: pd.DataFrame, procs: pd.DataFrame, routes=None) -> np.ndarray:
+    """
+    (1 + overhead) · (1 + marge) op de materiaalkosten, per regel van compute_costs-uitvoer:
+    total_cost = mass_kg · prijs · markup + (deel onafhankelijk van de prijs). Bij een
+    meerstapsroute telt het materiaal bij de eerste bewerking, dus gelden diens tarieven
+    en niet de (prijsafhankelijke) effectieve overhead_pct/margin_pct van de regel.
+    """
+
+    def col(df, c):
+        return pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    markup = (1 + col(lines, "overhead_pct")) * (1 + col(lines, "margin_pct"))
+    procs1 = _first_rows(procs)
+    if procs1 is None or "process_route" not in lines.columns or not len(lines):
+        return markup
+    route = lines["process_route"]
+    rows = np.flatnonzero((route.notna() & ~route.isin(procs1.index)).to_numpy())
+    if not len(rows):
+        return markup
+    ops = explode_routes(route.iloc[rows], routes, procs1.index)
+    first = ops.routed[ops.line] & (ops.step == 1)
+    pos = procs1.index.get_indexer(ops.process_id[first])
+    oh, mg = (
+        np.where(pos >= 0, col(procs1, c)[np.maximum(pos, 0)], np.nan)
+        for c in ("overhead_pct", "margin_pct")
+    )
+    markup[rows[ops.line[first]]] = (1 + oh) * (1 + mg)
+    return markup
+
+
+def _compute_costs_merge(mats, procs, bom, routes=None):
+    """Referentiepad: twee merges. Vangnet voor invoer die CostModel niet exact kan volgen."""
     df = bom.merge(mats, on="material_id", how="left").merge(
         procs, left_on="process_route", right_on="process_id", how="left"
     )
-    required = [
-        "mass_kg",
-        "price_eur_per_kg",
-        "runtime_h",
-        "machine_rate_eur_h",
-        "labor_rate_eur_h",
-        "overhead_pct",
-        "margin_pct",
-    ]
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     if missing:
         raise ValueError(f"Ontbrekende kolommen: {missing}")
-    df["material_cost"] = df["mass_kg"] * df["price_eur_per_kg"]
-    df["process_cost"] = df["runtime_h"] * (df["machine_rate_eur_h"] + df["labor_rate_eur_h"])
-    df["overhead"] = (df["material_cost"] + df["process_cost"]) * df["overhead_pct"]
-    df["base_cost"] = df["material_cost"] + df["process_cost"] + df["overhead"]
-    df["margin"] = df["base_cost"] * df["margin_pct"]
-    df["total_cost"] = df["base_cost"] + df["margin"]
-    return df
+    for c, vals in _cost_columns(df).items():
+        df[c] = vals
+    return _apply_routes(df, _first_rows(procs), routes)
+
+
+def _suffixed(left: list, right: list) -> tuple[list, list]:
+    """Kolomnamen na een merge: overlappende namen krijgen _x / _y (zoals DataFrame.merge)."""
+    overlap = set(left) & set(right)
+    return (
+        [f"{c}_x" if c in overlap else c for c in left],
+        [f"{c}_y" if c in overlap else c for c in right],
+    )
+
+
+def _values(s: pd.Series):
+    """ndarray voor NumPy-dtypes, anders de ExtensionArray (string, Int64, category, ...)."""
+    return s.to_numpy() if isinstance(s.dtype, np.dtype) else s.array
+
+
+class _Lookup:
+    """Eén opzoektabel (materials of processes) als positie-geïndexeerde kolommen."""
+
+    def __init__(self, df: pd.DataFrame, key: str, drop_key: bool):
+        self.key_dtype = df[key].dtype
+        keys = pd.Index(df[key])
+        first = ~keys.duplicated()
+        self.index = keys[first]
+        # Dubbele sleutels vermenigvuldigen rijen in een merge: daarvoor terug naar merge
+        self.ambiguous = keys[keys.duplicated(keep=False)].unique()
+        # Merge koppelt elke lege sleutel (NaN/None/NA) aan een lege sleutel in de tabel
+        na = np.flatnonzero(self.index.isna())
+        self.na_code = int(na[0]) if len(na) else -1
+        rows = np.flatnonzero(first)
+        self.columns = [c for c in df.columns if not (drop_key and c == key)]
+        self.arrays = {c: _values(df[c]).take(rows) for c in self.columns}
+        self._ambiguous_codes = self.index.get_indexer(self.ambiguous.dropna())
+
+    def codes(self, ids: pd.Series) -> Optional[np.ndarray]:
+        """Positie per BOM-regel (-1 = onbekend); None als een sleutel niet eenduidig is."""
+        if ids.dtype != self.key_dtype:
+            return None
+        # De hashtabel van self.index wordt één keer opgebouwd en daarna hergebruikt
+        codes = self.index.get_indexer(ids)
+        if self.na_code >= 0:
+            na = ids.isna().to_numpy()
+            if na.any():
+                if self.ambiguous.hasnans:
+                    return None
+                codes[na] = self.na_code
+        if len(self._ambiguous_codes) and np.isin(codes, self._ambiguous_codes).any():
+            return None
+        return codes
+
+    def gather(self, codes: np.ndarray) -> Dict[str, object]:
+        """Kolommen per BOM-regel; onbekende codes (-1) worden NaN, met dezelfde upcast als merge."""
+        return {
+            c: pd.api.extensions.take(a, codes, allow_fill=True) for c, a in self.arrays.items()
+        }
+
+
+class CostModel:
+    """
+    Voorbereide materials/processes: één keer gecodeerd naar positie-geïndexeerde arrays,
+    daarna per BOM alleen ids -> codes (gecachte factorisatie) en array-gathers i.p.v.
+    twee DataFrame-merges. Uitvoer van costs() is gelijk aan die van de merges, incl.
+    kolomvolgorde, _x/_y-suffixen, dtypes en NaN voor onbekende ids.
+
+    Invoer die een merge anders zou behandelen (ontbrekende sleutelkolommen, afwijkende
+    sleutel-dtypes, dubbele sleutels die een BOM raakt, dubbele kolomnamen) gaat via
+    het merge-pad, zodat ook fouten en rijvermenigvuldiging gelijk blijven.
+    """
+
+    def __init__(
+        self, mats: pd.DataFrame, procs: pd.DataFrame, routes: Optional[pd.DataFrame] = None
+    ):
+        self.mats, self.procs, self.routes = mats, procs, routes
+        self._procs1 = _first_rows(procs)
+        ok = (
+            "material_id" in mats.columns
+            and "process_id" in procs.columns
+            and mats.columns.is_unique
+            and procs.columns.is_unique
+        )
+        self._mat = _Lookup(mats, "material_id", drop_key=True) if ok else None
+        self._proc = _Lookup(procs, "process_id", drop_key=False) if ok else None
+
+    def _plan(self, bom: pd.DataFrame):
+        """(kolomnamen, codes) of None als het merge-pad nodig is."""
+        if self._mat is None or not bom.columns.is_unique:
+            return None
+        if "material_id" not in bom.columns or "process_route" not in bom.columns:
+            return None
+        left, mat_cols = _suffixed(list(bom.columns), self._mat.columns)
+        left1 = left + mat_cols
+        left2, proc_cols = _suffixed(left1, self._proc.columns)
+        names = left2 + proc_cols
+        if "process_route" not in left1 or len(set(names)) != len(names):
+            return None
+        mcodes = self._mat.codes(bom["material_id"])
+        pcodes = self._proc.codes(bom["process_route"]) if mcodes is not None else None
+        if pcodes is None:
+            return None
+        return (left2, proc_cols), (mcodes, pcodes)
+
+    def costs(self, bom: pd.DataFrame) -> pd.DataFrame:
+        """Zelfde resultaat als compute_costs(mats, procs, bom) via de merges."""
+        plan = self._plan(bom)
+        if plan is None:
+            return _compute_costs_merge(self.mats, self.procs, bom, self.routes)
+        (left_names, proc_names), (mcodes, pcodes) = plan
+        values = [_values(bom[c]).copy() for c in bom.columns]
+        values += list(self._mat.gather(mcodes).values())
+        values += list(self._proc.gather(pcodes).values())
+        cols = dict(zip(left_names + proc_names, values))
+        missing = [c for c in REQUIRED_COLUMNS if c not in cols]
+        if missing:
+            raise ValueError(f"Ontbrekende kolommen: {missing}")
+        plain = all(
+            isinstance(cols[c], np.ndarray) and cols[c].dtype.kind in "iuf"
+            for c in REQUIRED_COLUMNS
+        )
+        # Kale NumPy-arrays rekenen direct; nullable/object-kolommen via Series (zoals merge)
+        src = cols if plain else {c: pd.Series(cols[c], copy=False) for c in REQUIRED_COLUMNS}
+        for c, vals in _cost_columns(src).items():
+            cols[c] = vals.array if isinstance(vals, pd.Series) else vals
+        df = pd.DataFrame(cols, index=pd.RangeIndex(len(bom)), copy=False)
+        # Onbekende process_route (code -1) kan een meerstapsroute zijn
+        if (pcodes < 0).any():
+            df = _apply_routes(df, self._procs1, self.routes)
+        return df
+
+
+# Voorbereide modellen per (mats, procs, routes)-object: pages, scenario's en Monte Carlo
+# rekenen herhaaldelijk tegen dezelfde (gedeelde) tabellen
+_MODELS = FrameMemo(max_entries=4)
+
+
+def cost_model(mats, procs, routes=None) -> CostModel:
+    """
+    Gedeeld CostModel voor deze tabellen. Hergebruikt zolang het dezelfde objecten zijn
+    en ze niet in-place gewijzigd zijn (zie utils.frame_memo); anders opnieuw opgebouwd.
+    """
+    return _MODELS.get((mats, procs, routes), lambda: CostModel(mats, procs, routes))
+
+
+def compute_costs(mats, procs, bom, routes=None):
+    return cost_model(mats, procs, routes).costs(bom)
+
+
+# --- Streaming (BOM in chunks) -------------------------------------------------
+
+
+@dataclass
+class StreamTotals:
+    lines: int = 0
+    totals: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(COST_COLUMNS, 0.0))
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.lines += len(df)
+        for c in COST_COLUMNS:
+            self.totals[c] += float(df[c].sum())
+
+
+def iter_costs_chunked(
+    mats, procs, bom_path=None, chunksize: int = 100_000, totals: Optional[StreamTotals] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Lees bom.csv per chunk en reken elk chunk door tegen de (kleine) materials/processes-
+    tabellen, met één CostModel voor alle chunks. Geheugen schaalt met chunksize, niet met de BOM.
+    De index loopt door over chunks, zoals bij compute_costs op de hele BOM.
+    """
+    model = cost_model(mats, procs)
+    start = 0
+    for chunk in iter_csv_chunks(bom_path or paths()["bom"], SCHEMA_BOM, chunksize):
+        df = model.costs(chunk)
+        df.index = pd.RangeIndex(start, start + len(df))
+        start += len(df)
+        if totals is not None:
+            totals.add(df)
+        yield df
+
+
+def compute_costs_streaming(
+    mats, procs, bom_path=None, out_csv=None, chunksize: int = 100_000
+) -> StreamTotals:
+    """
+    Streaming variant van compute_costs: schrijft de regels incrementeel naar out_csv
+    (optioneel) en geeft de lopende totalen terug. Totalen zijn gelijk aan
+    compute_costs(...)[col].sum() op afronding in de laatste decimalen na.
+    """
+    totals = StreamTotals()
+    out = Path(out_csv) if out_csv is not None else None
+    first = True
+    for df in iter_costs_chunked(mats, procs, bom_path, chunksize, totals):
+        if out is not None:
+            df.to_csv(out, mode="w" if first else "a", header=first, index=False)
+        first = False
+    if out is not None and first:
+        # Lege BOM: wel een bestand met alleen de header
+        compute_costs(mats, procs, pd.DataFrame(columns=list(SCHEMA_BOM))).to_csv(out, index=False)
+    return totals
+
+
+# --- Batch (meerdere projecten in één pass) -------------------------------------
+
+
+@dataclass
+class BatchCosts:
+    lines: pd.DataFrame  # compute_costs-uitvoer met project-kolom vooraan
+    totals: pd.DataFrame  # per project: aantal regels + som van COST_COLUMNS
+
+
+def _stack_boms(boms: Mapping, project_col: str) -> pd.DataFrame:
+    ids = list(boms)
+    frames = [boms[k] for k in ids]
+    if not frames:
+        return pd.DataFrame(columns=[project_col, *SCHEMA_BOM])
+    body = pd.concat(frames, ignore_index=True)
+    body.insert(0, project_col, np.repeat(np.array(ids, dtype=object), [len(f) for f in frames]))
+    return body
+
+
+def compute_costs_batch(
+    mats,
+    procs,
+    boms: Union[pd.DataFrame, Mapping[str, pd.DataFrame]],
+    project_col: str = "project_id",
+) -> BatchCosts:
+    """
+    Reken veel BOMs in één keer door: één merge met materials/processes voor alle
+    regels i.p.v. één compute_costs per project. `boms` is één DataFrame met een
+    project-kolom, of een mapping {project_id: bom}. Per regel gelijk aan
+    compute_costs(mats, procs, bom) per project.
+    """
+    if isinstance(boms, pd.DataFrame):
+        if project_col not in boms.columns:
+            raise ValueError(f"Ontbrekende kolom: {project_col}")
+        stacked = boms.reset_index(drop=True)
+        projects = pd.unique(stacked[project_col])
+    else:
+        stacked = _stack_boms(boms, project_col)
+        projects = list(boms)
+    lines = compute_costs(mats, procs, stacked)
+    totals = (
+        lines.groupby(project_col, sort=False, dropna=False)[COST_COLUMNS]
+        .sum()
+        .reindex(pd.Index(projects, name=project_col), fill_value=0.0)
+    )
+    counts = lines.groupby(project_col, sort=False, dropna=False).size()
+    totals.insert(0, "lines", counts.reindex(totals.index, fill_value=0).astype(int))
+    return BatchCosts(lines=lines, totals=totals.reset_index())
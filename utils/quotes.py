@@ -1,18 +1,39 @@
+import heapq
+from typing import Dict, List, Optional, Union
+
+import numpy as np
 import pandas as pd
 
+# Staffelquotes (min_qty_kg > 0) gelden pas vanaf die hoeveelheid: ze bepalen niet de
+# basisprijs, alleen de staffels in utils.volume
+BREAK_COLUMN = "min_qty_kg"
+
+
+def tier_mask(quotes: pd.DataFrame) -> np.ndarray:
+    """True voor staffelquotes (min_qty_kg > 0); lege min_qty_kg = gewone quote."""
+    if BREAK_COLUMN not in quotes.columns:
+        return np.zeros(len(quotes), dtype=bool)
+    mins = pd.to_numeric(quotes[BREAK_COLUMN], errors="coerce")
+    return mins.to_numpy(dtype=float, na_value=np.nan) > 0
 
-def best_quotes(quotes: pd.DataFrame) -> pd.DataFrame:
-    q = quotes.copy()
+
+def best_quotes(quotes: Union[pd.DataFrame, "QuoteBook"]) -> pd.DataFrame:
+    if isinstance(quotes, QuoteBook):
+        return quotes.best_frame()
+    tiers = tier_mask(quotes)
+    q = quotes[~tiers].copy() if tiers.any() else quotes.copy()
     q["preferred"] = q.get("preferred", 0)
     q["lead_time_days"] = q.get("lead_time_days", 999_999)
     q = q.sort_values(
         by=["material_id", "preferred", "price_eur_per_kg", "lead_time_days"],
         ascending=[True, False, True, True],
     )
-    return q.groupby("material_id").head(1).reset_index(drop=True)
+    return q.groupby("material_id", observed=True).head(1).reset_index(drop=True)
 
 
-def apply_best_quotes(materials: pd.DataFrame, quotes: pd.DataFrame) -> pd.DataFrame:
+def apply_best_quotes(
+    materials: pd.DataFrame, quotes: Union[pd.DataFrame, "QuoteBook"]
+) -> pd.DataFrame:
     best = best_quotes(quotes)
     m = materials.merge(
         best[["material_id", "price_eur_per_kg", "supplier", "lead_time_days"]],
@@ -29,9 +50,223 @@ def apply_best_quotes(materials: pd.DataFrame, quotes: pd.DataFrame) -> pd.DataF
     return m
 
 
-def join_with_materials(materials: pd.DataFrame, best: pd.DataFrame) -> pd.DataFrame:
+def join_with_materials(
+    materials: pd.DataFrame, best: Union[pd.DataFrame, "QuoteBook"]
+) -> pd.DataFrame:
+    if isinstance(best, QuoteBook):
+        best = best.best_frame()
     return materials.drop(columns=["price_eur_per_kg"], errors="ignore").merge(
         best[["material_id", "supplier", "price_eur_per_kg", "lead_time_days"]],
         on="material_id",
         how="left",
     )
+
+
+# --- QuoteBook: beste quote per materiaal, incrementeel bijgehouden --------------
+
+RANK_COLUMNS = ["preferred", "price_eur_per_kg", "lead_time_days"]
+
+
+def _num(s: pd.Series) -> np.ndarray:
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _rank_parts(q: pd.DataFrame) -> List[np.ndarray]:
+    """
+    Sorteersleutel per quote als kolommen, gelijk aan best_quotes: preferred aflopend,
+    prijs en levertijd oplopend, lege waarden per kolom achteraan (zoals sort_values).
+    """
+    pref = _num(q["preferred"]) if "preferred" in q.columns else np.zeros(len(q))
+    price = _num(q["price_eur_per_kg"])
+    lead = (
+        _num(q["lead_time_days"]) if "lead_time_days" in q.columns else np.full(len(q), 999_999.0)
+    )
+    parts = []
+    for v, sign in ((pref, -1.0), (price, 1.0), (lead, 1.0)):
+        nan = np.isnan(v)
+        parts += [nan, np.where(nan, 0.0, sign * v)]
+    return parts
+
+
+def _row_values(s: pd.Series) -> list:
+    """Kolom als Python-lijst voor de rijtuples; datums blijven np.datetime64 (snel)."""
+    if isinstance(s.dtype, np.dtype):
+        a = s.to_numpy()
+        return list(a) if a.dtype.kind in "Mm" else a.tolist()
+    return s.to_numpy(dtype=object).tolist()
+
+
+def _heap_extend(heap: list, items: list) -> None:
+    """Items toevoegen: per stuk pushen, of bij een grote batch extend + heapify (O(n))."""
+    if len(items) * 8 > len(heap):
+        heap.extend(items)
+        heapq.heapify(heap)
+    else:
+        for it in items:
+            heapq.heappush(heap, it)
+
+
+class QuoteBook:
+    """
+    Beste quote per material_id onder dezelfde rangorde als best_quotes, bij te werken
+    zonder de hele tabel opnieuw te sorteren.
+
+    Per materiaal een heap (sleutel, quote-id); quote-ids lopen op, dus bij gelijke
+    sleutels wint de eerder ingevoegde quote, zoals de stabiele sort in best_quotes.
+    Een batch wordt in één keer gesorteerd (lexsort) en per materiaal als heap
+    toegevoegd. Verlopen quotes worden lui verwijderd: de beste wordt direct vervangen,
+    en een heap (of de verloopheap) die voor meer dan de helft dood is wordt
+    gecompacteerd, zodat ze niet groeien met het aantal verlopen quotes.
+    insert/expire O(log n) geamortiseerd, best(material_id) O(1). best_frame() is gelijk
+    aan best_quotes(tabel met alle levende quotes, in invoegvolgorde).
+    """
+
+    def __init__(self, quotes: Optional[pd.DataFrame] = None):
+        self.columns: List[str] = ["material_id", "supplier", "price_eur_per_kg"]
+        self.dtypes: Optional[pd.Series] = None
+        self._rows: Dict[int, tuple] = {}  # quote-id -> waarden in self.columns-volgorde
+        self._material: Dict[int, object] = {}
+        self._heaps: Dict[object, list] = {}
+        self._best: Dict[object, int] = {}  # material_id -> quote-id
+        self._dead: Dict[object, int] = {}  # aantal verlopen items per heap
+        self._expiry: list = []  # heap (valid_until in ns, quote-id)
+        self._expiring: set = set()  # levende quote-ids met een valid_until
+        self._seq = 0
+        self._frame: Optional[pd.DataFrame] = None
+        if quotes is not None:
+            self.insert(quotes)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # --- Wijzigen ---------------------------------------------------------------
+
+    def insert(self, quotes: pd.DataFrame) -> List[int]:
+        """Voeg quotes toe (achteraan); geeft hun quote-ids terug."""
+        if self.dtypes is None:
+            # Schema van de eerste niet-lege invoer (een lege tabel heeft vaak object-dtypes)
+            self.columns = list(quotes.columns)
+            if not len(quotes):
+                return []
+            self.dtypes = quotes.dtypes
+        elif list(quotes.columns) != self.columns:
+            quotes = quotes.reindex(columns=self.columns)
+        if not len(quotes):
+            return []
+        n = len(quotes)
+        ids = np.arange(self._seq, self._seq + n)
+        self._seq += n
+        id_list = ids.tolist()
+        cols = [_row_values(quotes[c]) for c in self.columns]
+        self._rows.update(zip(id_list, zip(*cols)))
+
+        if "valid_until" in quotes.columns:
+            until = pd.to_datetime(quotes["valid_until"], errors="coerce").to_numpy(
+                dtype="datetime64[ns]"
+            )
+            has = ~np.isnat(until)
+            if has.any():
+                _heap_extend(
+                    self._expiry, list(zip(until[has].astype(np.int64).tolist(), ids[has].tolist()))
+                )
+                self._expiring.update(ids[has].tolist())
+
+        # best_quotes groepeert zonder lege material_id en zonder staffelquotes
+        mats = quotes["material_id"].to_numpy(dtype=object)
+        rank = ~tier_mask(quotes) & ~pd.isna(mats)
+        if rank.any():
+            self._rank(mats[rank], ids[rank], [p[rank] for p in _rank_parts(quotes)])
+        self._frame = None
+        return id_list
+
+    def _rank(self, mats: np.ndarray, ids: np.ndarray, parts: List[np.ndarray]) -> None:
+        """Eén sortering voor de hele batch; daarna per materiaal een gesorteerd blok."""
+        codes, uniques = pd.factorize(mats)
+        order = np.lexsort((ids, *parts[::-1], codes))
+        keys = zip(*(p[order].tolist() for p in parts))
+        items = list(zip(keys, ids[order].tolist()))
+        sorted_codes = codes[order]
+        bounds = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1], True])
+        self._material.update(zip(ids.tolist(), mats.tolist()))
+        for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            m = uniques[sorted_codes[a]]
+            block = items[a:b]
+            heap = self._heaps.get(m)
+            if heap is None:
+                # Een oplopend gesorteerde lijst is al een geldige heap
+                self._heaps[m] = heap = block
+                self._dead[m] = 0
+            else:
+                _heap_extend(heap, block)
+            self._best[m] = heap[0][1]
+
+    def expire(self, quote_ids) -> int:
+        """Verwijder quotes op id; geeft het aantal verwijderde terug."""
+        n = 0
+        for qid in np.atleast_1d(quote_ids).tolist():
+            if self._rows.pop(qid, None) is None:
+                continue
+            n += 1
+            self._expiring.discard(qid)
+            m = self._material.pop(qid, None)
+            if m is None:
+                continue
+            self._dead[m] += 1
+            self._refresh(m)
+        if len(self._expiry) > 2 * len(self._expiring) + 64:
+            self._expiry = [it for it in self._expiry if it[1] in self._expiring]
+            heapq.heapify(self._expiry)
+        if n:
+            self._frame = None
+        return n
+
+    def expire_until(self, when) -> int:
+        """Verwijder alle quotes met valid_until vóór `when` (datum of Timestamp)."""
+        cutoff = pd.Timestamp(when).value
+        out = []
+        while self._expiry and self._expiry[0][0] < cutoff:
+            qid = heapq.heappop(self._expiry)[1]
+            if qid in self._expiring:
+                out.append(qid)
+        return self.expire(out)
+
+    def _refresh(self, m) -> None:
+        """Na een verlopen quote van m: compacteren als de heap vooral dood is, dan de top."""
+        heap = self._heaps[m]
+        if self._dead[m] * 2 > len(heap):
+            heap = [it for it in heap if it[1] in self._rows]
+            heapq.heapify(heap)
+            self._heaps[m] = heap
+            self._dead[m] = 0
+        while heap and heap[0][1] not in self._rows:
+            heapq.heappop(heap)
+            self._dead[m] -= 1
+        if heap:
+            self._best[m] = heap[0][1]
+        else:
+            del self._heaps[m], self._best[m], self._dead[m]
+
+    # --- Opvragen ---------------------------------------------------------------
+
+    def best(self, material_id) -> Optional[dict]:
+        """Beste quote voor één materiaal als dict, of None."""
+        qid = self._best.get(material_id)
+        return None if qid is None else dict(zip(self.columns, self._rows[qid]))
+
+    def best_frame(self) -> pd.DataFrame:
+        """Beste quote per materiaal, zoals best_quotes (gecachet tot de volgende wijziging)."""
+        if self._frame is None:
+            rows = [self._rows[qid] for qid in self._best.values()]
+            df = pd.DataFrame(rows, columns=self.columns)
+            if self.dtypes is not None:
+                df = df.astype(self.dtypes.to_dict())
+            # Zelfde extra kolommen als best_quotes bij een tabel zonder deze kolommen
+            df["preferred"] = df.get("preferred", 0)
+            df["lead_time_days"] = df.get("lead_time_days", 999_999)
+            self._frame = df.sort_values("material_id", kind="mergesort").reset_index(drop=True)
+        return self._frame
+
+    def to_frame(self) -> pd.DataFrame:
+        """Alle levende quotes in invoegvolgorde."""
+        df = pd.DataFrame(list(self._rows.values()), columns=self.columns)
+        return df.astype(self.dtypes.to_dict()) if self.dtypes is not None else df
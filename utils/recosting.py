@@ -0,0 +1,205 @@
+# utils/recosting.py
+"""
+Incrementeel herberekenen van een gecalculeerde BOM.
+
+IncrementalCosting bewaart het laatste resultaat van compute_costs plus een
+omgekeerde index material_id / process_route -> regelposities. Bij nieuwe
+materials/processes (bijv. na een gewijzigde quote of marktfactor) worden alleen
+de ids gezocht waarvan de tabelrij echt anders is (rijhash), en alleen de regels
+die die ids gebruiken opnieuw doorgerekend. Totalen schuiven mee met de delta's.
+
+Het resultaat blijft gelijk aan compute_costs(mats, procs, bom) op de nieuwe tabellen.
+Waar dat incrementeel niet exact kan (andere kolommen/dtypes, dubbele sleutels die de
+BOM raakt, een dtype-wissel in de uitvoer) wordt alles opnieuw berekend (`full=True`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from .pricing import COST_COLUMNS, cost_model
+from .routing import explode_routes
+
+PRICE_COLUMN = "price_eur_per_kg"
+RATE_COLUMNS = ["machine_rate_eur_h", "labor_rate_eur_h", "overhead_pct", "margin_pct"]
+MAX_PARTIAL = 0.1  # boven dit aandeel geraakte regels: volledig herberekenen
+
+
+@dataclass
+class RecostUpdate:
+    rows: np.ndarray  # posities in IncrementalCosting.lines die opnieuw berekend zijn
+    lines: pd.DataFrame  # die regels na herberekening
+    delta: Dict[str, float]  # verandering van de totalen per COST_COLUMN
+    full: bool = False  # True: volledig herberekend (structurele wijziging)
+
+    @property
+    def line_ids(self) -> list:
+        return self.lines["line_id"].tolist() if "line_id" in self.lines.columns else []
+
+
+class _RowIndex:
+    """Omgekeerde index sleutel -> regelposities; lege sleutels apart (merge koppelt NaN aan NaN)."""
+
+    def __init__(self, ids, positions: Optional[np.ndarray] = None):
+        codes, uniques = pd.factorize(ids)
+        order = np.argsort(codes, kind="stable")
+        if positions is not None:
+            # Meerdere sleutels per regel (bewerkingen van een route): posities per sleutel
+            order = positions[order]
+        bounds = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))
+        counts_na = int((codes < 0).sum())
+        groups = np.split(order[counts_na:], bounds[:-1]) if len(uniques) else []
+        self._rows = dict(zip(uniques, groups))
+        self._na_rows = order[:counts_na]
+
+    def __contains__(self, key) -> bool:
+        return bool(len(self._na_rows)) if pd.isna(key) else key in self._rows
+
+    def rows(self, keys) -> np.ndarray:
+        parts = [self._na_rows if pd.isna(k) else self._rows.get(k, ()) for k in keys]
+        return np.unique(np.concatenate(parts)).astype(np.intp) if parts else np.empty(0, np.intp)
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df, index=False, categorize=False).to_numpy()
+
+
+def _changed_keys(old: pd.DataFrame, new: pd.DataFrame, old_hash: np.ndarray, key: str, used):
+    """
+    (sleutels, hashes van `new`): sleutels waarvan de tabelrij toegevoegd, verwijderd of
+    gewijzigd is (hash over de hele rij, sleutel inbegrepen). Sleutels None als de
+    wijziging structureel is voor de BOM.
+    """
+    if new is old:
+        return pd.unique(old[key].iloc[:0]), old_hash
+    if list(old.columns) != list(new.columns) or not old.dtypes.equals(new.dtypes):
+        return None, None
+    for df in (old, new):
+        dup = df[key][df[key].duplicated(keep=False)]
+        if any(k in used for k in dup.unique()):
+            return None, None
+    new_hash = _row_hashes(new)
+    # Hashtabel-isin (pandas) i.p.v. np.isin, dat beide kanten sorteert
+    gone = old[key][~pd.Index(old_hash).isin(new_hash)]
+    came = new[key][~pd.Index(new_hash).isin(old_hash)]
+    return pd.unique(pd.concat([gone, came], ignore_index=True)), new_hash
+
+
+class IncrementalCosting:
+    """
+    Laatste calculatie van één BOM, bij te werken met update()/set_prices()/set_rates().
+
+    `lines` en `totals` zijn na elke update gelijk aan compute_costs op de nieuwe
+    tabellen (totalen op afronding in de laatste decimalen na, zoals bij StreamTotals).
+    Met `group_col` (bijv. de project-kolom van een gestapelde batch-BOM) worden ook
+    `group_totals` per groep bijgehouden, zoals BatchCosts.totals.
+    """
+
+    def __init__(
+        self,
+        mats: pd.DataFrame,
+        procs: pd.DataFrame,
+        bom: pd.DataFrame,
+        group_col: Optional[str] = None,
+        routes: Optional[pd.DataFrame] = None,
+    ):
+        self.bom = bom.reset_index(drop=True)
+        self.group_col = group_col
+        self.routes = routes
+        self._by_material = _RowIndex(self.bom["material_id"])
+        # Per bewerking: een meerstapsroute hangt af van elk process_id in de route
+        known = pd.Index(procs["process_id"]) if "process_id" in procs.columns else None
+        ops = explode_routes(self.bom["process_route"], routes, known)
+        self._by_process = _RowIndex(ops.process_id, ops.line)
+        self._rebuild(mats, procs)
+
+    def _group_sums(self, lines: pd.DataFrame) -> pd.DataFrame:
+        return lines.groupby(self.group_col, sort=False, dropna=False)[COST_COLUMNS].sum()
+
+    def _rebuild(self, mats: pd.DataFrame, procs: pd.DataFrame) -> None:
+        self.mats, self.procs = mats, procs
+        self.lines = cost_model(mats, procs, self.routes).costs(self.bom)
+        self.totals = {c: float(self.lines[c].sum()) for c in COST_COLUMNS}
+        self.group_totals = self._group_sums(self.lines) if self.group_col else None
+        # Dubbele sleutels die de BOM raakt vermenigvuldigen regels: dan niets incrementeel
+        self._exact = len(self.lines) == len(self.bom)
+        self._mat_hash = _row_hashes(mats) if "material_id" in mats.columns else None
+        self._proc_hash = _row_hashes(procs) if "process_id" in procs.columns else None
+        # Alleen kolommen die uit materials/processes komen of berekend worden veranderen
+        self._outputs = [j for j, c in enumerate(self.lines.columns) if c not in self.bom.columns]
+        self._outputs += [
+            self.lines.columns.get_loc(c) for c in COST_COLUMNS if c in self.bom.columns
+        ]
+
+    def _full(
+        self, mats: pd.DataFrame, procs: pd.DataFrame, rows: Optional[np.ndarray] = None
+    ) -> RecostUpdate:
+        before = dict(self.totals)
+        self._rebuild(mats, procs)
+        delta = {c: self.totals[c] - before[c] for c in COST_COLUMNS}
+        if rows is not None:
+            return RecostUpdate(rows, self.lines.iloc[rows], delta)
+        return RecostUpdate(np.arange(len(self.lines)), self.lines, delta, full=True)
+
+    def update(
+        self, mats: Optional[pd.DataFrame] = None, procs: Optional[pd.DataFrame] = None
+    ) -> RecostUpdate:
+        """Neem nieuwe materials en/of processes over; herbereken alleen geraakte regels."""
+        mats = self.mats if mats is None else mats
+        procs = self.procs if procs is None else procs
+        if not self._exact or self._mat_hash is None or self._proc_hash is None:
+            return self._full(mats, procs)
+        mkeys, mhash = _changed_keys(
+            self.mats, mats, self._mat_hash, "material_id", self._by_material
+        )
+        pkeys, phash = _changed_keys(
+            self.procs, procs, self._proc_hash, "process_id", self._by_process
+        )
+        if mkeys is None or pkeys is None:
+            return self._full(mats, procs)
+        rows = np.union1d(self._by_material.rows(mkeys), self._by_process.rows(pkeys))
+        if len(rows) > len(self.bom) * MAX_PARTIAL:
+            # Groot deel geraakt: alles opnieuw is dan goedkoper dan regels terugschrijven
+            return self._full(mats, procs, rows)
+        delta = dict.fromkeys(COST_COLUMNS, 0.0)
+        if len(rows):
+            sub = cost_model(mats, procs, self.routes).costs(self.bom.iloc[rows])
+            if len(sub) != len(rows) or not sub.dtypes.equals(self.lines.dtypes):
+                return self._full(mats, procs)
+            old = self.lines.iloc[rows]
+            delta = {c: float(sub[c].sum()) - float(old[c].sum()) for c in COST_COLUMNS}
+            if self.group_col:
+                d = self._group_sums(sub).sub(self._group_sums(old), fill_value=0.0)
+                self.group_totals = self.group_totals.add(
+                    d.reindex(self.group_totals.index, fill_value=0.0)
+                )
+            for j in self._outputs:
+                self.lines.iloc[rows, j] = sub.iloc[:, j].to_numpy()
+            for c in COST_COLUMNS:
+                self.totals[c] += delta[c]
+        self.mats, self.procs = mats, procs
+        self._mat_hash, self._proc_hash = mhash, phash
+        return RecostUpdate(rows, self.lines.iloc[rows], delta)
+
+    def set_prices(self, prices: Mapping) -> RecostUpdate:
+        """Nieuwe price_eur_per_kg per material_id (bijv. één gewijzigde quote)."""
+        mats = self.mats.copy()
+        hit = mats["material_id"].isin(list(prices)).to_numpy()
+        mats.loc[hit, PRICE_COLUMN] = mats.loc[hit, "material_id"].astype(object).map(prices)
+        return self.update(mats=mats)
+
+    def set_rates(self, rates: Mapping[str, Mapping[str, float]]) -> RecostUpdate:
+        """Nieuwe tarieven per process_id: {process_id: {kolom: waarde}} (kolommen uit RATE_COLUMNS)."""
+        procs = self.procs.copy()
+        ids = procs["process_id"]
+        for pid, cols in rates.items():
+            hit = (ids == pid).fillna(False).to_numpy()
+            for c, v in cols.items():
+                if c not in RATE_COLUMNS:
+                    raise ValueError(f"Onbekende tariefkolom: {c}")
+                procs.loc[hit, c] = v
+        return self.update(procs=procs)
@@ -0,0 +1,103 @@
+# utils/repository.py
+"""
+Eén gedeelde, in-process kopie van de vier datasets voor alle pages/sessies.
+
+Per dataset wordt het geparste frame bewaard met de (size, mtime) van het bestand;
+bij een andere versie wordt opnieuw geladen. Geretourneerde frames worden gedeeld:
+behandel ze als read-only en gebruik .copy() vóór je ze aanpast.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from . import io
+
+LOADERS: Dict[str, Callable[[], pd.DataFrame]] = {
+    "materials": io.load_materials,
+    "processes": io.load_processes,
+    "bom": io.load_bom,
+    "quotes": io.load_quotes,
+}
+
+
+@dataclass
+class RepoStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class DataRepository:
+    def __init__(
+        self,
+        loaders: Optional[Dict[str, Callable[[], pd.DataFrame]]] = None,
+        paths_fn: Callable[[], dict] = io.paths,
+    ):
+        self._loaders = dict(loaders or LOADERS)
+        self._paths = paths_fn
+        # Lock per dataset: twee sessies die tegelijk missen parsen maar één keer
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        self._cache: Dict[str, Tuple[tuple, pd.DataFrame]] = {}
+        self._stats = {name: RepoStats() for name in self._loaders}
+
+    def _version(self, name: str) -> tuple:
+        st = self._paths()[name].stat()
+        return (st.st_size, st.st_mtime_ns)
+
+    def get(self, name: str) -> pd.DataFrame:
+        if name not in self._loaders:
+            raise KeyError(f"Onbekende dataset: {name}")
+        with self._locks[name]:
+            version = self._version(name)
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == version:
+                self._stats[name].hits += 1
+                return cached[1]
+            self._stats[name].misses += 1
+            df = self._loaders[name]()
+            self._cache[name] = (version, df)
+            return df
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        for n in [name] if name else list(self._loaders):
+            with self._locks[n]:
+                self._cache.pop(n, None)
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: asdict(s) for name, s in self._stats.items()}
+
+
+_REPO = DataRepository()
+
+
+def get_repository() -> DataRepository:
+    return _REPO
+
+
+def load_materials() -> pd.DataFrame:
+    return _REPO.get("materials")
+
+
+def load_processes() -> pd.DataFrame:
+    return _REPO.get("processes")
+
+
+def load_bom() -> pd.DataFrame:
+    return _REPO.get("bom")
+
+
+def load_quotes() -> pd.DataFrame:
+    return _REPO.get("quotes")
+
+
+def stats() -> pd.DataFrame:
+    """Hit/miss-tellers per dataset (voor Diagnose)."""
+    df = pd.DataFrame.from_dict(_REPO.stats(), orient="index")
+    df.index.name = "dataset"
+    total = df["hits"] + df["misses"]
+    df["hit_ratio"] = (df["hits"] / total.where(total > 0)).round(3)
+    return df.reset_index()
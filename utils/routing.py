@@ -1,11 +1,154 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 
+# Meerstapsroutes: "LASER_CUT>BENDING>TIG_WELD>PAINT" in process_route, of een route-
+# tabel (route_id, step, process_id, optioneel share). Een process_route die zelf een
+# process_id is blijft één bewerking; bekende process_ids gaan vóór route-ids.
+ROUTE_SEP = ">"
+
+
+@dataclass
+class Operations:
+    line: np.ndarray  # positie van de BOM-regel per bewerking
+    step: np.ndarray  # volgnummer binnen de route (1, 2, ...)
+    process_id: np.ndarray  # object-array
+    share: np.ndarray  # aandeel van runtime_h van de regel (som per regel = 1)
+    routed: np.ndarray  # per BOM-regel: True als de route uit meerdere/andere bewerkingen bestaat
+
+
+def _route_steps(routes: Optional[pd.DataFrame]) -> dict:
+    """route_id -> [(process_id, share)] uit een route-tabel, op volgorde van step."""
+    if routes is None or not len(routes):
+        return {}
+    r = routes.sort_values(["route_id", "step"], kind="mergesort")
+    share = (
+        pd.to_numeric(r["share"], errors="coerce")
+        if "share" in r.columns
+        else pd.Series(np.nan, index=r.index)
+    )
+    out = {}
+    for rid, pids, sh in zip(
+        r["route_id"], r["process_id"].to_numpy(dtype=object), share.to_numpy(dtype=float)
+    ):
+        out.setdefault(rid, []).append((pids, sh))
+    return out
+
+
+def _normalize(steps: list) -> list:
+    """Ontbrekende shares = gelijk deel; daarna geschaald naar som 1."""
+    sh = np.array([s for _, s in steps], dtype=float)
+    sh = np.where(np.isnan(sh), 1.0, sh)
+    total = sh.sum()
+    sh = sh / total if total > 0 else np.full(len(sh), 1.0 / len(sh))
+    return [(p, float(s)) for (p, _), s in zip(steps, sh)]
+
+
+def explode_routes(
+    process_route: pd.Series,
+    routes: Optional[pd.DataFrame] = None,
+    known: Optional[pd.Index] = None,
+) -> Operations:
+    """
+    Eén rij per bewerking. Alleen de unieke routes worden geparsed; het uitklappen
+    naar regels is daarna np.repeat over de route-codes (geen lus per regel).
+    `known` zijn de bestaande process_ids (die blijven altijd één bewerking).
+    """
+    codes, uniques = pd.factorize(process_route.to_numpy(dtype=object))
+    table = _route_steps(routes)
+    known = known if known is not None else pd.Index([])
+    steps, routed_u = [], np.zeros(len(uniques) + 1, dtype=bool)
+    for i, u in enumerate(uniques):
+        if u in known:
+            ops = [(u, 1.0)]
+        elif u in table:
+            ops, routed_u[i] = _normalize(table[u]), True
+        elif isinstance(u, str) and ROUTE_SEP in u:
+            parts = [p.strip() for p in u.split(ROUTE_SEP) if p.strip()]
+            ops, routed_u[i] = [(p, 1.0 / len(parts)) for p in parts] or [(u, 1.0)], True
+        else:
+            ops = [(u, 1.0)]
+        steps.append(ops)
+    steps.append([(None, 1.0)])  # code -1: lege route
+    n_ops = np.array([len(s) for s in steps])
+    flat_pid = np.array([p for s in steps for p, _ in s], dtype=object)
+    flat_share = np.array([sh for s in steps for _, sh in s], dtype=float)
+    offsets = np.concatenate([[0], np.cumsum(n_ops)[:-1]])
+
+    counts = n_ops[codes]
+    line = np.repeat(np.arange(len(codes)), counts)
+    within = np.arange(len(line)) - np.repeat(np.cumsum(counts) - counts, counts)
+    idx = offsets[codes][line] + within
+    return Operations(
+        line=line,
+        step=within + 1,
+        process_id=flat_pid[idx],
+        share=flat_share[idx],
+        routed=routed_u[codes],
+    )
+
+
+def _routing_time(df: pd.DataFrame) -> pd.Series:
+    return (df.get("time_h_per_unit", 0) * df["qty"]).fillna(0) + df.get("setup_h", 0).fillna(0)
+
+
+def compute_routing_cost(
+    bom: pd.DataFrame,
+    routing: pd.DataFrame,
+    routes: Optional[pd.DataFrame] = None,
+    by_operation: bool = False,
+) -> pd.DataFrame:
+    """
+    routing_time_h = time_h_per_unit · qty + setup_h per BOM-regel.
+
+    Meerstapsroutes (zie ROUTE_SEP / `routes`) tellen de tijd van elke bewerking op;
+    per regel zijn time_h_per_unit, setup_h en routing_time_h dan sommen over de
+    bewerkingen en is process_id leeg. Met by_operation=True komt er één rij per
+    bewerking (kolommen step en process_id), zodat routing_summary per machine telt.
+    """
+    known = pd.Index(routing["process_id"]) if "process_id" in routing.columns else None
+    if not by_operation:
+        df = bom.merge(routing, how="left", left_on="process_route", right_on="process_id")
+        df["routing_time_h"] = _routing_time(df)
+        # Alleen regels zonder routing-match kunnen een meerstapsroute zijn
+        miss = df["process_id"].isna().to_numpy() & df["process_route"].notna().to_numpy()
+        if routes is None and not miss.any():
+            return df
+        ops = explode_routes(df["process_route"][miss], routes, known)
+        if not ops.routed.any():
+            return df
+        op_rows = _operation_rows(df[miss][list(bom.columns)], ops, routing)
+        rows = np.flatnonzero(miss)[ops.routed]
+        sums = op_rows.groupby("_line", sort=True)[
+            [c for c in ("time_h_per_unit", "setup_h", "routing_time_h") if c in op_rows.columns]
+        ].sum(min_count=1)
+        sums = sums.reindex(np.flatnonzero(ops.routed))
+        for c in sums.columns:
+            df.loc[df.index[rows], c] = sums[c].to_numpy()
+        df.loc[df.index[rows], "routing_time_h"] = sums["routing_time_h"].fillna(0).to_numpy()
+        return df
+    ops = explode_routes(bom["process_route"], routes, known)
+    return _operation_rows(bom.reset_index(drop=True), ops, routing, keep_all=True).drop(
+        columns="_line"
+    )
+
 
-def compute_routing_cost(bom: pd.DataFrame, routing: pd.DataFrame) -> pd.DataFrame:
-    df = bom.merge(routing, how="left", left_on="process_route", right_on="process_id")
-    df["routing_time_h"] = (df.get("time_h_per_unit", 0) * df["qty"]).fillna(0) + df.get(
-        "setup_h", 0
-    ).fillna(0)
+def _operation_rows(
+    lines: pd.DataFrame, ops: Operations, routing: pd.DataFrame, keep_all: bool = False
+) -> pd.DataFrame:
+    """Bewerkingsrijen (routed regels, of alle met keep_all) met routing en routing_time_h."""
+    take = np.ones(len(ops.line), bool) if keep_all else ops.routed[ops.line]
+    body = lines.iloc[ops.line[take]].reset_index(drop=True)
+    body.insert(0, "_line", ops.line[take])
+    body["step"] = ops.step[take]
+    body["process_id"] = ops.process_id[take]
+    r = routing.drop(
+        columns=[c for c in routing.columns if c in body.columns and c != "process_id"]
+    )
+    df = body.merge(r, how="left", on="process_id")
+    df["routing_time_h"] = _routing_time(df)
     return df
 
 
@@ -0,0 +1,259 @@
+# utils/scenarios.py
+"""
+Scenario-engine voor de Scenario Planner: materiaalprijs ± %, arbeidsloon ± %,
+machinetarief ± % en marge ± %-punten over een al gecalculeerde BOM.
+
+Het totaal is per regel lineair in elke driver:
+
+    total = (mat·(1+m) + mach·(1+k) + lab·(1+l)) · (1+overhead) · (1+marge+dm)
+
+Daarom wordt de BOM één keer gereduceerd tot een paar sommen per kostensoort, en is
+een heel grid (bijv. 50×50×20×5) daarna één gebroadcaste NumPy-bewerking, los van het
+aantal regels. Regels met een NaN-totaal tellen (zoals bij DataFrame.sum) niet mee.
+Resultaten zijn gelijk aan compute_costs op aangepaste tabellen op afronding in de
+laatste decimalen na.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# driver -> (label, eenheid); %-drivers schalen een kostensoort, "margin" telt %-punten op
+DRIVERS = {
+    "material": ("Materiaalprijs", "%"),
+    "labor": ("Arbeidsloon", "%"),
+    "margin": ("Marge", "%-punt"),
+    "machine": ("Machinetarief", "%"),
+}
+# driver -> kostensoort die ermee schaalt
+_SCALES = {"material": "mat", "labor": "lab", "machine": "mach"}
+
+
+@dataclass
+class Scenario:
+    material: float = 0.0  # materiaalprijs ± %
+    labor: float = 0.0  # arbeidsloon ± %
+    margin: float = 0.0  # marge ± %-punten
+    machine: float = 0.0  # machinetarief ± %
+
+
+@dataclass
+class ScenarioGrid:
+    axes: Dict[str, np.ndarray]  # driver -> waarden, in de volgorde van de kubus-assen
+    totals: np.ndarray  # totaal (EUR) per combinatie
+
+    def to_frame(self) -> pd.DataFrame:
+        """Lang formaat: één rij per combinatie met de drivers en total_cost."""
+        mesh = np.meshgrid(*self.axes.values(), indexing="ij")
+        out = pd.DataFrame({k: m.ravel() for k, m in zip(self.axes, mesh)})
+        out["total_cost"] = self.totals.ravel()
+        return out
+
+    def slice2d(self, rows: str, cols: str, **fixed: float) -> pd.DataFrame:
+        """Tabel rows × cols; overige drivers op de dichtstbijzijnde waarde uit `fixed` (anders 0)."""
+        idx = []
+        for name, vals in self.axes.items():
+            if name in (rows, cols):
+                idx.append(slice(None))
+            else:
+                idx.append(int(np.abs(vals - fixed.get(name, 0.0)).argmin()))
+        sub = self.totals[tuple(idx)]
+        names = [n for n in self.axes if n in (rows, cols)]
+        if names != [rows, cols]:
+            sub = sub.T
+        return pd.DataFrame(
+            sub,
+            index=pd.Index(self.axes[rows], name=rows),
+            columns=pd.Index(self.axes[cols], name=cols),
+        )
+
+
+class ScenarioModel:
+    """
+    Voorbereide scenario-rekenaar op de uitvoer van compute_costs (of CostModel.costs).
+    Eén keer O(regels); elk scenario of grid daarna O(grid).
+    """
+
+    def __init__(self, lines: pd.DataFrame):
+        def col(c):
+            return pd.to_numeric(lines[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+        self.lines = lines
+        self._arr = {
+            "mass": col("mass_kg"),
+            "price": col("price_eur_per_kg"),
+            "runtime": col("runtime_h"),
+            "machine": col("machine_rate_eur_h"),
+            "labor": col("labor_rate_eur_h"),
+            "overhead": col("overhead_pct"),
+            "margin": col("margin_pct"),
+        }
+        a = self._arr
+        parts = {
+            "mat": a["mass"] * a["price"],
+            "mach": a["runtime"] * a["machine"],
+            "lab": a["runtime"] * a["labor"],
+        }
+        w = 1 + a["overhead"]
+        c = 1 + a["margin"]
+        # Het NaN-patroon van total_cost hangt niet af van (eindige) drivers
+        total = (parts["mat"] + parts["mach"] + parts["lab"]) * w * c
+        ok = ~np.isnan(total)
+        # total = Σ_x (S_x + dm·T_x)(1 + f_x), met S_x = Σ x·w·c en T_x = Σ x·w
+        self._S = {x: float(np.sum((v * w * c)[ok])) for x, v in parts.items()}
+        self._T = {x: float(np.sum((v * w)[ok])) for x, v in parts.items()}
+        self.base_total = self.total(Scenario())
+
+    # --- Eén scenario -----------------------------------------------------------
+
+    def total(self, scn: Scenario) -> float:
+        dm = scn.margin / 100.0
+        f = {"mat": scn.material, "lab": scn.labor, "mach": scn.machine}
+        return float(sum((self._S[x] + dm * self._T[x]) * (1 + f[x] / 100.0) for x in self._S))
+
+    def costs(self, scn: Scenario) -> pd.DataFrame:
+        """
+        Regels voor één scenario: lines met aangepaste prijs/tarieven en COST_COLUMNS,
+        zoals compute_costs op de aangepaste tabellen (zelfde bewerkingen per regel).
+        """
+        a = self._arr
+        price = a["price"] * (1 + scn.material / 100.0)
+        labor = a["labor"] * (1 + scn.labor / 100.0)
+        machine = a["machine"] * (1 + scn.machine / 100.0)
+        margin_pct = a["margin"] + scn.margin / 100.0
+        out = self.lines.copy()
+        out["price_eur_per_kg"] = price
+        out["labor_rate_eur_h"] = labor
+        out["machine_rate_eur_h"] = machine
+        out["margin_pct"] = margin_pct
+        out["material_cost"] = a["mass"] * price
+        out["process_cost"] = a["runtime"] * (machine + labor)
+        out["overhead"] = (out["material_cost"] + out["process_cost"]) * a["overhead"]
+        out["base_cost"] = out["material_cost"] + out["process_cost"] + out["overhead"]
+        out["margin"] = out["base_cost"] * margin_pct
+        out["total_cost"] = out["base_cost"] + out["margin"]
+        return out
+
+    # --- Grid -------------------------------------------------------------------
+
+    def grid(
+        self,
+        material: Sequence[float] = (0.0,),
+        labor: Sequence[float] = (0.0,),
+        margin: Sequence[float] = (0.0,),
+        machine: Sequence[float] = (0.0,),
+    ) -> ScenarioGrid:
+        """Totaal voor alle combinaties; kubus met assen (material, labor, margin, machine)."""
+        axes = {
+            "material": np.asarray(material, dtype=float),
+            "labor": np.asarray(labor, dtype=float),
+            "margin": np.asarray(margin, dtype=float),
+            "machine": np.asarray(machine, dtype=float),
+        }
+        m = axes["material"][:, None, None, None]
+        lb = axes["labor"][None, :, None, None]
+        dm = axes["margin"][None, None, :, None] / 100.0
+        k = axes["machine"][None, None, None, :]
+        S, T = self._S, self._T
+        totals = (
+            (S["mat"] + dm * T["mat"]) * (1 + m / 100.0)
+            + (S["lab"] + dm * T["lab"]) * (1 + lb / 100.0)
+            + (S["mach"] + dm * T["mach"]) * (1 + k / 100.0)
+        )
+        return ScenarioGrid(axes=axes, totals=totals)
+
+    # --- Gevoeligheid -----------------------------------------------------------
+
+    def slopes(self, at: Optional[Scenario] = None) -> Dict[str, float]:
+        """EUR verandering van het totaal per eenheid driver (1 % of 1 %-punt) rond `at`."""
+        at = at or Scenario()
+        dm = at.margin / 100.0
+        out = {d: (self._S[x] + dm * self._T[x]) / 100.0 for d, x in _SCALES.items()}
+        f = {"mat": at.material, "lab": at.labor, "mach": at.machine}
+        out["margin"] = sum(self._T[x] * (1 + f[x] / 100.0) for x in self._T) / 100.0
+        return {d: out[d] for d in DRIVERS}
+
+    def sensitivity(self, at: Optional[Scenario] = None) -> pd.DataFrame:
+        """
+        Ranking van drivers: EUR per eenheid en elasticiteit (% totaal per eenheid
+        driver), grootste invloed eerst.
+        """
+        at = at or Scenario()
+        base = self.total(at)
+        rows = []
+        for d, s in self.slopes(at).items():
+            label, unit = DRIVERS[d]
+            rows.append(
+                {
+                    "driver": d,
+                    "label": label,
+                    "unit": unit,
+                    "eur_per_unit": s,
+                    "pct_per_unit": 100.0 * s / base if base else np.nan,
+                }
+            )
+        out = pd.DataFrame(rows)
+        out = out.sort_values("eur_per_unit", key=np.abs, ascending=False, kind="mergesort")
+        out.insert(0, "rank", np.arange(1, len(out) + 1))
+        return out.reset_index(drop=True)
+
+    def tornado(
+        self, ranges: Optional[Dict[str, tuple]] = None, at: Optional[Scenario] = None
+    ) -> pd.DataFrame:
+        """
+        Tornado: totaal met elke driver apart op laag/hoog (overige op `at`), gesorteerd
+        op swing. Standaard ±10 % en ±2 %-punten marge.
+        """
+        at = at or Scenario()
+        ranges = ranges or {
+            "material": (-10, 10),
+            "labor": (-10, 10),
+            "margin": (-2, 2),
+            "machine": (-10, 10),
+        }
+        base = self.total(at)
+        rows = []
+        for d, (lo, hi) in ranges.items():
+            t_lo = self.total(Scenario(**{**vars(at), d: lo}))
+            t_hi = self.total(Scenario(**{**vars(at), d: hi}))
+            rows.append(
+                {
+                    "driver": d,
+                    "label": DRIVERS[d][0],
+                    "low": lo,
+                    "high": hi,
+                    "total_low": t_lo,
+                    "total_high": t_hi,
+                    "delta_low": t_lo - base,
+                    "delta_high": t_hi - base,
+                    "swing": abs(t_hi - t_lo),
+                }
+            )
+        out = pd.DataFrame(rows)
+        return out.sort_values("swing", ascending=False, kind="mergesort").reset_index(drop=True)
+
+    def break_even(self, target: float, at: Optional[Scenario] = None) -> pd.DataFrame:
+        """
+        Per driver de waarde (% of %-punt, overige op `at`) waarbij het totaal gelijk is
+        aan `target` (bijv. een offerteprijs of budget). Lineair, dus exact.
+        """
+        at = at or Scenario()
+        base = self.total(at)
+        rows = []
+        for d, s in self.slopes(at).items():
+            value = getattr(at, d) + (target - base) / s if s else np.nan
+            rows.append(
+                {
+                    "driver": d,
+                    "label": DRIVERS[d][0],
+                    "unit": DRIVERS[d][1],
+                    "break_even": value,
+                    # Een prijs/tarief onder -100 % bestaat niet
+                    "feasible": bool(np.isfinite(value) and (d == "margin" or value >= -100)),
+                }
+            )
+        return pd.DataFrame(rows)
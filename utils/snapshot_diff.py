@@ -0,0 +1,175 @@
+# utils/snapshot_diff.py
+"""
+Snelle diff tussen twee materials-tabellen (bijv. materials_db.csv en een snapshot).
+
+Per rij wordt één hash berekend over de vergeleken velden; toegevoegd/verwijderd/
+gewijzigd volgt uit een outer join op de sleutel en een vergelijking van hashes.
+Alleen voor gewijzigde rijen wordt per veld uitgezocht wat er anders is.
+
+Dubbele sleutels worden op volgorde gekoppeld (1e voorkomen met 1e, 2e met 2e, ...)
+via een `occurrence`-teller, zodat ze niet tot een kruisproduct leiden.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+DIFF_FIELDS = ["price_eur_per_kg", "commodity", "description"]
+NUMERIC_FIELDS = ["price_eur_per_kg"]
+OCC_COL = "occurrence"
+_POS_COL = "_pos"
+
+
+def _normalize(df: pd.DataFrame, key: str, fields: Sequence[str], numeric: Sequence[str]):
+    """Sleutel (tekst) + occurrence + genormaliseerde velden + rijhash."""
+    n = len(df)
+    ids = df[key] if key in df.columns else pd.Series([np.nan] * n, index=df.index)
+    ids = ids.astype(object)
+    out = pd.DataFrame({key: ids.where(ids.isna(), ids.astype(str)).to_numpy()})
+    dup = out[key].duplicated()
+    occ = out.groupby(key, dropna=False).cumcount().to_numpy() if dup.any() else np.zeros(n, int)
+    out[OCC_COL] = occ
+    for f in fields:
+        # Vaste dtypes per veld (float / object), zodat gelijke waarden gelijk hashen
+        if f in numeric:
+            vals = df[f] if f in df.columns else pd.Series(np.nan, index=df.index)
+            # + 0.0: -0.0 en 0.0 krijgen dezelfde hash
+            num = pd.to_numeric(vals, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            out[f] = num + 0.0
+        else:
+            s = df[f].astype(object) if f in df.columns else pd.Series(np.nan, index=df.index)
+            s = s.astype(object)
+            out[f] = pd.Series(s.where(s.isna(), s.astype(str)).to_numpy(), dtype=object)
+    if fields:
+        row_hash = pd.util.hash_pandas_object(
+            out[list(fields)], index=False, categorize=False
+        ).to_numpy()
+    else:
+        row_hash = np.zeros(n, dtype=np.uint64)
+    out[_POS_COL] = np.arange(n)
+    return out, row_hash
+
+
+def _label(key_val, occ: int) -> str:
+    return f"{key_val}" if occ == 0 else f"{key_val} (#{occ + 1})"
+
+
+@dataclass
+class SnapshotDiff:
+    """
+    Resultaat van diff_frames. `aligned` is de outer join (één rij per sleutel +
+    occurrence) met <veld>_old/<veld>_new en een `status`:
+    added / removed / changed / same.
+    """
+
+    key: str
+    fields: List[str]
+    aligned: pd.DataFrame = field(repr=False)
+
+    def _rows(self, status: str) -> pd.DataFrame:
+        return self.aligned[self.aligned["status"] == status]
+
+    @property
+    def added(self) -> pd.DataFrame:
+        return self._rows("added")
+
+    @property
+    def removed(self) -> pd.DataFrame:
+        return self._rows("removed")
+
+    @property
+    def changed(self) -> pd.DataFrame:
+        return self._rows("changed")
+
+    def counts(self) -> dict:
+        vc = self.aligned["status"].value_counts()
+        return {s: int(vc.get(s, 0)) for s in ("added", "removed", "changed", "same")}
+
+    def changes(self) -> pd.DataFrame:
+        """Lang formaat: key, occurrence, field, old, new — alleen echt gewijzigde velden."""
+        ch = self.changed
+        parts = []
+        for f in self.fields:
+            old, new = ch[f"{f}_old"], ch[f"{f}_new"]
+            diff = ~((old == new) | (old.isna() & new.isna()))
+            if diff.any():
+                part = ch.loc[diff, [self.key, OCC_COL]].copy()
+                part["field"] = f
+                part["old"] = old[diff].to_numpy()
+                part["new"] = new[diff].to_numpy()
+                parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=[self.key, OCC_COL, "field", "old", "new"])
+        out = pd.concat(parts)
+        # Terug in sleutelvolgorde, velden in opgegeven volgorde
+        out["_f"] = out["field"].map({f: i for i, f in enumerate(self.fields)})
+        out = out.rename_axis("_row").sort_values(["_row", "_f"], kind="mergesort")
+        return out.drop(columns="_f").reset_index(drop=True)
+
+    def summary(self, max_keys: int = 10, max_changed: int = 5) -> str:
+        """Tekstsamenvatting zoals de restore-tool die print."""
+        c = self.counts()
+        out = [f"Toegevoegd: {c['added']} | Verwijderd: {c['removed']} | Gewijzigd: {c['changed']}"]
+        for sign, rows in (("+", self.added), ("-", self.removed)):
+            if len(rows):
+                labels = [_label(k, o) for k, o in zip(rows[self.key], rows[OCC_COL])]
+                out.append(
+                    f" {sign} "
+                    + ", ".join(labels[:max_keys])
+                    + (" …" if len(labels) > max_keys else "")
+                )
+        if c["changed"]:
+            ch = self.changes()
+            first = ch[[self.key, OCC_COL]].drop_duplicates().head(max_changed)
+            ch = ch.merge(first, on=[self.key, OCC_COL], sort=False)
+            lines = []
+            for (k, o), g in ch.groupby([self.key, OCC_COL], sort=False, dropna=False):
+                diffs = [f"{f}: {a} -> {b}" for f, a, b in zip(g["field"], g["old"], g["new"])]
+                lines.append(f"{_label(k, o)}: " + "; ".join(diffs))
+            out.append(" ~ " + " | ".join(lines) + (" …" if c["changed"] > max_changed else ""))
+        return "\n".join(out)
+
+    def price_table(self, price_col: str = "price_eur_per_kg") -> pd.DataFrame:
+        """material_id, old_price, new_price, pct_change voor alle sleutels (outer)."""
+        a = self.aligned
+        old = a[f"{price_col}_old"].astype(float)
+        new = a[f"{price_col}_new"].astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = (new - old) / old
+        return pd.DataFrame(
+            {"material_id": a[self.key], "old_price": old, "new_price": new, "pct_change": pct}
+        ).reset_index(drop=True)
+
+
+def diff_frames(
+    before: pd.DataFrame,
+    after: pd.DataFrame,
+    fields: Sequence[str] = DIFF_FIELDS,
+    key: str = "material_id",
+    numeric: Sequence[str] = NUMERIC_FIELDS,
+) -> SnapshotDiff:
+    """Vergelijk twee tabellen op `key` over `fields` (NaN == NaN)."""
+    fields = list(fields)
+    b, hb = _normalize(before, key, fields, numeric)
+    a, ha = _normalize(after, key, fields, numeric)
+    m = b.merge(
+        a, on=[key, OCC_COL], how="outer", suffixes=("_old", "_new"), indicator=True, sort=True
+    )
+    both = (m["_merge"] == "both").to_numpy()
+    # Hashes via rijpositie vergelijken: uint64 overleeft een outer join (NaN) niet exact
+    differs = np.zeros(len(m), dtype=bool)
+    pos_old = m.loc[both, f"{_POS_COL}_old"].to_numpy(dtype=np.int64)
+    pos_new = m.loc[both, f"{_POS_COL}_new"].to_numpy(dtype=np.int64)
+    differs[both] = hb[pos_old] != ha[pos_new]
+    status = np.select(
+        [m["_merge"] == "right_only", m["_merge"] == "left_only", differs],
+        ["added", "removed", "changed"],
+        default="same",
+    )
+    m = m.drop(columns=["_merge", f"{_POS_COL}_old", f"{_POS_COL}_new"])
+    m["status"] = status
+    return SnapshotDiff(key=key, fields=fields, aligned=m.reset_index(drop=True))
@@ -0,0 +1,542 @@
+# utils/snapshots.py
+"""
+Delta-opslag voor materials-snapshots in data/history.
+
+Naast volledige snapshots (materials_YYYYMMDD.csv) kan een dag als delta worden
+opgeslagen (materials_YYYYMMDD.delta.csv): alleen toegevoegde (+), verwijderde (-) en
+gewijzigde (~) regels t.o.v. de vorige snapshot, op material_id. Zodra de keten van
+de vorige snapshot (base, deltas en refs met de keten van hun doel, zie snapshot_deps)
+`base_every` bestanden lang is, wordt weer een volledige base geschreven, zodat een
+reconstructie nooit meer dan een handvol bestanden hoeft te lezen.
+
+Deltas zijn opt-in: ze besparen schijfruimte maar maken lezen trager (de laatste
+snapshot moet uit base + deltas worden opgebouwd). Standaard schrijft write_snapshot
+volledige snapshots; zet SNAPSHOT_BASE_EVERY of draai tools/compact_history.py.
+
+Een delta wordt alleen geschreven als reconstructie exact dezelfde tabel oplevert
+(zelfde kolommen, volgorde en tekst); anders valt het terug op een volledige snapshot.
+
+Is de inhoud van een dag identiek aan een eerder opgeslagen snapshot (content-hash in
+.snapshot_hashes.csv), dan wordt alleen een verwijzing geschreven
+(materials_YYYYMMDD.ref.csv met de dag van het origineel). Voor lezers is dat gewoon
+een gedateerde snapshot. Het register is een lokale cache (niet in git, stempels met
+mtime kloppen na een clone niet) en wordt bij ontbreken opnieuw opgebouwd uit de
+snapshots. Verwijderen gaat via delete_snapshot, dat refs en deltas die van het
+bestand afhangen eerst oplost.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+SNAP_RE = re.compile(r"materials_(\d{8})(\.delta|\.ref)?\.csv$", re.IGNORECASE)
+OP_COL = "_op"
+ROW_COL = "_row"
+_ID_KEY = "_material_key"
+REF_COL = "_ref"
+REGISTRY_NAME = ".snapshot_hashes.csv"  # dotfile: valt buiten materials_*.csv en *.csv-globs
+_LEGACY_REGISTRY = "snapshot_hashes.csv"  # oude naam, werd mee-gecommit
+# Elke N-de snapshot volledig; 0/1 = altijd volledig (geen deltas, de standaard)
+BASE_EVERY = int(os.getenv("SNAPSHOT_BASE_EVERY", "0"))
+# Standaard voor compact_history (tools/compact_history.py)
+COMPACT_BASE_EVERY = 30
+
+
+def _kind(p: Path) -> str:
+    m = SNAP_RE.search(Path(p).name)
+    return (m.group(2) or "").lower() if m else ""
+
+
+def is_delta(p: Path) -> bool:
+    return _kind(p) == ".delta"
+
+
+def is_ref(p: Path) -> bool:
+    return _kind(p) == ".ref"
+
+
+def snapshot_day(p: Path) -> Optional[str]:
+    m = SNAP_RE.search(Path(p).name)
+    return m.group(1) if m else None
+
+
+def snapshot_files(history_dir: Path) -> List[Path]:
+    """Eén bestand per dag (volledig gaat voor delta, delta voor ref), oplopend op datum."""
+    if not history_dir.exists():
+        return []
+    by_day = {}
+    for p in sorted(history_dir.glob("materials_*.csv"), key=lambda p: p.name, reverse=True):
+        day = snapshot_day(p)
+        if day:
+            by_day[day] = p
+    return [by_day[d] for d in sorted(by_day)]
+
+
+def find_snapshot(history_dir: Path, day: str) -> Optional[Path]:
+    for suffix in ("", ".delta", ".ref"):
+        p = history_dir / f"materials_{day}{suffix}.csv"
+        if p.exists():
+            return p
+    return None
+
+
+# --- Tekstframes: exact zoals in het bestand, zonder type-inferentie ------------
+
+
+def _read_text(p) -> pd.DataFrame:
+    return pd.read_csv(p, dtype=str, keep_default_na=False)
+
+
+def _frame_to_text(df: pd.DataFrame) -> pd.DataFrame:
+    return _read_text(StringIO(df.to_csv(index=False)))
+
+
+def _text_to_frame(text: pd.DataFrame) -> pd.DataFrame:
+    """Parse een tekstframe zoals pd.read_csv het volledige bestand zou parsen."""
+    return pd.read_csv(StringIO(text.to_csv(index=False)))
+
+
+def make_delta(prev: pd.DataFrame, cur: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    Delta van tekstframe prev naar cur, of None als dat niet verliesvrij kan.
+    Sleutel is material_id; zijn die niet uniek, dan de regelpositie (kolom _row).
+    """
+    if list(prev.columns) != list(cur.columns):
+        return None
+    positional = (
+        "material_id" not in cur.columns
+        or prev["material_id"].duplicated().any()
+        or cur["material_id"].duplicated().any()
+    )
+    if positional:
+        p = prev.set_axis(pd.RangeIndex(len(prev)))
+        c = cur.set_axis(pd.RangeIndex(len(cur)))
+    else:
+        p = prev.set_index("material_id", drop=False)
+        c = cur.set_index("material_id", drop=False)
+    common = c.index.intersection(p.index, sort=False)
+    neq = (c.loc[common] != p.loc[common]).any(axis=1)
+    changed = neq.index[neq.to_numpy()]
+    removed = p.index.difference(c.index, sort=False)
+    added = c.index.difference(p.index, sort=False)
+    key = ROW_COL if positional else "material_id"
+    parts = [
+        pd.DataFrame({key: removed, OP_COL: "-"}),
+        c.loc[changed].assign(**{OP_COL: "~"}),
+        c.loc[added].assign(**{OP_COL: "+"}),
+    ]
+    if positional:
+        parts[1][ROW_COL] = changed
+        parts[2][ROW_COL] = added
+    delta = pd.concat(parts, ignore_index=True).fillna("")
+    delta = delta[[OP_COL] + ([ROW_COL] if positional else []) + list(cur.columns)]
+    if not _same(apply_delta(prev, delta), cur):
+        return None
+    return delta
+
+
+def _same(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    return (
+        a.shape == b.shape
+        and list(a.columns) == list(b.columns)
+        and bool((a.to_numpy(dtype=object) == b.to_numpy(dtype=object)).all())
+    )
+
+
+def _apply_keyed(state: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Als apply_delta, maar het resultaat houdt de sleutel als index (voor ketens)."""
+    if delta.empty:
+        return state
+    cols = list(state.columns)
+    op = delta[OP_COL].to_numpy()
+    if ROW_COL in delta.columns:
+        keys = pd.Index(pd.to_numeric(delta[ROW_COL]))
+        state = state.set_axis(pd.RangeIndex(len(state)))
+    else:
+        keys = pd.Index(delta["material_id"], name=_ID_KEY)
+        if state.index.name != _ID_KEY:
+            # Index op material_id één keer opbouwen en door de keten heen hergebruiken
+            state = state.set_axis(pd.Index(state["material_id"], name=_ID_KEY))
+    out = state.drop(index=keys[op == "-"]) if (op == "-").any() else state.copy()
+    chg = op == "~"
+    if chg.any():
+        out.loc[keys[chg], cols] = delta.loc[chg, cols].to_numpy()
+    added = delta.loc[op == "+", cols].set_axis(keys[op == "+"])
+    return pd.concat([out, added]) if len(added) else out
+
+
+def apply_delta(state: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pas een delta toe op een tekstframe: '-' weg, '~' vervangen op dezelfde plek,
+    '+' achteraan in de volgorde van de delta.
+    """
+    return _apply_keyed(state, delta).reset_index(drop=True)
+
+
+# --- Lezen ---------------------------------------------------------------------
+
+
+def _ref_day(p: Path) -> str:
+    # Twee regels ("_ref,sha1" + waarden): zonder pandas lezen, dit gebeurt per scan
+    lines = Path(p).read_text(encoding="utf-8").splitlines()
+    if len(lines) < 2 or not lines[0].startswith(REF_COL):
+        raise ValueError(f"Geen geldig ref-bestand: {Path(p).name}")
+    return lines[1].split(",")[0].strip()
+
+
+def ref_target(p: Path) -> Path:
+    """Snapshot waarnaar een .ref-bestand verwijst (nooit zelf een ref)."""
+    day = _ref_day(p)
+    t = find_snapshot(Path(p).parent, day)
+    if t is None or is_ref(t):
+        raise FileNotFoundError(f"{Path(p).name}: verwezen snapshot {day} ontbreekt")
+    return t
+
+
+def _chain(p: Path) -> List[Path]:
+    """Laatste volledige snapshot t/m p, met alle deltas ertussen."""
+    files = snapshot_files(p.parent)
+    names = [f.name for f in files]
+    if p.name not in names:
+        raise FileNotFoundError(f"Snapshot bestaat niet: {p}")
+    i = names.index(p.name)
+    start = i
+    while start >= 0 and is_delta(files[start]):
+        start -= 1
+    if start < 0:
+        raise ValueError(f"Geen volledige base-snapshot vóór {p.name}")
+    return files[start : i + 1]
+
+
+def snapshot_deps(p: Path) -> List[Path]:
+    """Alle bestanden waar de inhoud van p van afhangt (keten + verwezen snapshots)."""
+    p = Path(p)
+    if is_ref(p):
+        return [p, *snapshot_deps(ref_target(p))]
+    if not is_delta(p):
+        return [p]
+    chain = _chain(p)
+    return [*snapshot_deps(chain[0]), *chain[1:]]
+
+
+def deps_stamp(p: Path) -> str:
+    """(naam, size, mtime_ns) van alle afhankelijkheden; wijzigt als de inhoud kan wijzigen."""
+    return json.dumps([[d.name, d.stat().st_size, d.stat().st_mtime_ns] for d in snapshot_deps(p)])
+
+
+def read_snapshot_text(p: Path) -> pd.DataFrame:
+    p = Path(p)
+    if is_ref(p):
+        return read_snapshot_text(ref_target(p))
+    if not is_delta(p):
+        return _read_text(p)
+    chain = _chain(p)
+    state = read_snapshot_text(chain[0])
+    for d in chain[1:]:
+        state = _apply_keyed(state, _read_text(d))
+    return state.reset_index(drop=True)
+
+
+def read_snapshot(p: Path) -> pd.DataFrame:
+    """Materials-tabel van een snapshot, als pd.read_csv(p) op het volledige bestand."""
+    p = Path(p)
+    if is_ref(p):
+        return read_snapshot(ref_target(p))
+    if not is_delta(p):
+        return pd.read_csv(p)
+    return _text_to_frame(read_snapshot_text(p))
+
+
+def iter_snapshots(history_dir: Path) -> Iterator[Tuple[Path, Optional[pd.DataFrame]]]:
+    """
+    Loop alle snapshots op datum door en reconstrueer deltas incrementeel
+    (elke delta één keer toepassen). Onleesbare snapshots geven (p, None).
+    """
+    state: Optional[pd.DataFrame] = None
+    base: Optional[Path] = None  # tekst van de base pas lezen als er een delta volgt
+    parsed: Optional[pd.DataFrame] = None  # laatst geparste tabel; lege delta = ongewijzigd
+    files = snapshot_files(history_dir)
+    # Geparste tabellen van dagen waarnaar een ref verwijst bewaren (niet opnieuw lezen)
+    wanted = set()
+    for p in files:
+        if is_ref(p):
+            try:
+                wanted.add(_ref_day(p))
+            except Exception:
+                pass
+    by_day: dict = {}
+    for p in files:
+        try:
+            if is_delta(p):
+                if state is None:
+                    if base is None:
+                        raise ValueError(f"Geen base-snapshot vóór {p.name}")
+                    state = read_snapshot_text(base)
+                delta = _read_text(p)
+                if not delta.empty or parsed is None:
+                    state = _apply_keyed(state, delta)
+                    parsed = _text_to_frame(state.reset_index(drop=True))
+            elif is_ref(p):
+                day = _ref_day(p)
+                parsed = by_day[day] if day in by_day else read_snapshot(ref_target(p))
+                state, base = None, p
+            else:
+                parsed = pd.read_csv(p)
+                state, base = None, p
+            if snapshot_day(p) in wanted:
+                by_day[snapshot_day(p)] = parsed
+            yield p, parsed.copy()
+        except Exception:
+            state, base, parsed = None, None, None
+            yield p, None
+
+
+# --- Content-hash register -------------------------------------------------------
+
+
+def content_hash(text: pd.DataFrame) -> str:
+    """sha1 van de gecanonicaliseerde CSV (tekstframe zoals _frame_to_text het maakt)."""
+    return hashlib.sha1(text.to_csv(index=False).encode("utf-8")).hexdigest()
+
+
+def _registry(history_dir: Path) -> pd.DataFrame:
+    p = history_dir / REGISTRY_NAME
+    if not p.exists():
+        return pd.DataFrame(columns=["sha1", "day", "stamp"])
+    return pd.read_csv(p, dtype=str, keep_default_na=False)
+
+
+def _save_registry(history_dir: Path, reg: pd.DataFrame) -> None:
+    p = history_dir / REGISTRY_NAME
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    reg.to_csv(tmp, index=False)
+    os.replace(tmp, p)
+
+
+def register_content(history_dir: Path, sha: str, p: Path) -> None:
+    reg = _registry(history_dir)
+    row = pd.DataFrame({"sha1": [sha], "day": [snapshot_day(p)], "stamp": [deps_stamp(p)]})
+    reg = reg[reg["sha1"] != sha]
+    _save_registry(history_dir, pd.concat([reg, row], ignore_index=True))
+
+
+def find_content(history_dir: Path, sha: str) -> Optional[str]:
+    """
+    Dag van een opgeslagen snapshot met exact deze inhoud, of None. Een entry wordt
+    alleen vertrouwd als de bestanden sinds registratie niet gewijzigd zijn; anders
+    wordt de inhoud opnieuw gehasht (en de entry bijgewerkt of verwijderd).
+    """
+    reg = _registry(history_dir)
+    hit = reg[reg["sha1"] == sha]
+    if hit.empty:
+        return None
+    day, stamp = hit["day"].iloc[0], hit["stamp"].iloc[0]
+    t = find_snapshot(history_dir, day)
+    try:
+        if t is not None and not is_ref(t):
+            if deps_stamp(t) == stamp:
+                return day
+            if content_hash(read_snapshot_text(t)) == sha:
+                register_content(history_dir, sha, t)
+                return day
+    except Exception:
+        pass
+    _save_registry(history_dir, reg[reg["sha1"] != sha])
+    return None
+
+
+def rebuild_registry(history_dir: Path) -> int:
+    """Register opnieuw opbouwen uit alle snapshots (refs tellen niet mee)."""
+    rows = []
+    state: Optional[pd.DataFrame] = None
+    for p in snapshot_files(history_dir):
+        try:
+            if is_delta(p):
+                if state is None:
+                    raise ValueError(f"Geen base-snapshot vóór {p.name}")
+                state = _apply_keyed(state, _read_text(p))
+            else:
+                state = read_snapshot_text(p)
+        except Exception:
+            state = None
+            continue
+        if not is_ref(p):
+            sha = content_hash(state.reset_index(drop=True))
+            rows.append({"sha1": sha, "day": snapshot_day(p), "stamp": deps_stamp(p)})
+    reg = pd.DataFrame(rows, columns=["sha1", "day", "stamp"]).drop_duplicates("sha1")
+    _save_registry(history_dir, reg)
+    (history_dir / _LEGACY_REGISTRY).unlink(missing_ok=True)
+    return len(reg)
+
+
+# --- Schrijven -----------------------------------------------------------------
+
+
+def write_snapshot(
+    df: pd.DataFrame, history_dir: Path, day: Optional[str] = None, base_every: int = BASE_EVERY
+) -> Path:
+    """
+    Schrijf de snapshot van `day` (YYYYMMDD, default vandaag UTC) als delta t.o.v. de
+    vorige snapshot, of volledig als het tijd is voor een nieuwe base of als een
+    delta niet verliesvrij of niet kleiner is. Identieke inhoud als een eerder
+    opgeslagen snapshot wordt alleen als verwijzing (.ref) geschreven.
+    """
+    history_dir.mkdir(parents=True, exist_ok=True)
+    day = day or datetime.utcnow().strftime("%Y%m%d")
+    full = history_dir / f"materials_{day}.csv"
+    cur = _frame_to_text(df)
+    sha = content_hash(cur)
+    if not (history_dir / REGISTRY_NAME).exists() and snapshot_files(history_dir):
+        rebuild_registry(history_dir)
+    same = find_content(history_dir, sha)
+    if same is not None and same != day and _ref_fits(history_dir, same, base_every):
+        out = history_dir / f"materials_{day}.ref.csv"
+        pd.DataFrame({REF_COL: [same], "sha1": [sha]}).to_csv(out, index=False)
+        return out
+    out = _write_data(df, cur, history_dir, day, full, base_every)
+    register_content(history_dir, sha, out)
+    return out
+
+
+def _ref_fits(history_dir: Path, day: str, base_every: int) -> bool:
+    """Past een ref naar `day` binnen de ketenlimiet? (de ref telt zelf ook mee)"""
+    if base_every <= 1:
+        return True
+    try:
+        return len(snapshot_deps(find_snapshot(history_dir, day))) < base_every
+    except (FileNotFoundError, ValueError, TypeError):
+        return False
+
+
+def _write_data(
+    df: pd.DataFrame,
+    cur: pd.DataFrame,
+    history_dir: Path,
+    day: str,
+    full: Path,
+    base_every: int,
+) -> Path:
+    prev = [p for p in snapshot_files(history_dir) if snapshot_day(p) < day]
+    # Ketenlengte van de vorige snapshot, inclusief refs en de keten van hun doel: een
+    # delta op een ref verlengt de keten van de verwezen dag
+    try:
+        depth = len(snapshot_deps(prev[-1])) if prev else 0
+    except (FileNotFoundError, ValueError):
+        depth = base_every
+    if base_every > 1 and prev and depth < base_every:
+        try:
+            delta = make_delta(read_snapshot_text(prev[-1]), cur)
+        except Exception:
+            delta = None
+        if delta is not None and len(delta) < len(cur) // 2:
+            out = history_dir / f"materials_{day}.delta.csv"
+            delta.to_csv(out, index=False)
+            return out
+    df.to_csv(full, index=False)
+    return full
+
+
+def _dependents(history_dir: Path, p: Path) -> List[Path]:
+    """Snapshots (≠ p) waarvan de inhoud via een ref of deltaketen van p afhangt."""
+    out = []
+    for f in snapshot_files(history_dir):
+        if f.name == p.name:
+            continue
+        try:
+            if p.name in {d.name for d in snapshot_deps(f)}:
+                out.append(f)
+        except (FileNotFoundError, ValueError):
+            continue
+    return out
+
+
+def _materialize(p: Path) -> Path:
+    """Vervang een ref/delta door een volledige snapshot met dezelfde inhoud."""
+    full = p.with_name(f"materials_{snapshot_day(p)}.csv")
+    read_snapshot_text(p).to_csv(full, index=False)
+    if full != p:
+        p.unlink()
+    return full
+
+
+def delete_snapshot(history_dir: Path, day: str, resolve: bool = False) -> List[Path]:
+    """
+    Verwijder de snapshot van `day`. Hangen er refs of deltas van af, dan weigert dit
+    (ValueError), tenzij resolve=True: dan worden de directe afhankelijken (refs naar
+    deze dag en de eerstvolgende delta) eerst volledig weggeschreven. Geeft de
+    weggeschreven bestanden terug.
+    """
+    p = find_snapshot(history_dir, day)
+    if p is None:
+        raise FileNotFoundError(f"Snapshot bestaat niet: materials_{day}.csv")
+    deps = _dependents(history_dir, p)
+    if deps and not resolve:
+        names = ", ".join(d.name for d in deps)
+        raise ValueError(f"{p.name} wordt nog gebruikt door: {names} (gebruik resolve=True)")
+    written = []
+    files = snapshot_files(history_dir)
+    nxt = files[[f.name for f in files].index(p.name) + 1 :][:1]
+    for f in deps:
+        direct = (is_ref(f) and _ref_day(f) == day) or (f in nxt and is_delta(f))
+        if direct:
+            written.append(_materialize(f))
+    p.unlink()
+    reg = _registry(history_dir)
+    _save_registry(history_dir, reg[reg["day"] != day])
+    for f in written:
+        register_content(history_dir, content_hash(read_snapshot_text(f)), f)
+    return written
+
+
+def compact_history(history_dir: Path, base_every: int = COMPACT_BASE_EVERY) -> Tuple[int, int]:
+    """
+    Herschrijf bestaande volledige snapshots als deltas (in datumvolgorde).
+    Refs blijven geldig: ze verwijzen naar een dag, en find_snapshot vindt daar de
+    delta. Geeft (aantal omgezet, aantal bases behouden).
+    """
+    converted = kept = 0
+    prev_text: Optional[pd.DataFrame] = None
+    files = snapshot_files(history_dir)
+    # Dagen waarnaar een ref verwijst houden ruimte voor de ref zelf in hun keten; verwijst
+    # een eerdere ref ernaar, dan blijven ze volledig (die keten is al geteld)
+    targets, forward = set(), set()
+    for p in files:
+        if is_ref(p):
+            targets.add(_ref_day(p))
+            if _ref_day(p) > snapshot_day(p):
+                forward.add(_ref_day(p))
+    depth = 0  # len(snapshot_deps(...)) van de vorige snapshot
+    for p in files:
+        cur = read_snapshot_text(p)
+        delta = None
+        day = snapshot_day(p)
+        limit = base_every - 1 if day in targets else base_every
+        convertible = _kind(p) == "" and day not in forward
+        if convertible and prev_text is not None and depth < limit:
+            delta = make_delta(prev_text, cur)
+            if delta is not None and len(delta) >= len(cur) // 2:
+                delta = None
+        if delta is not None:
+            delta.to_csv(p.with_name(f"materials_{day}.delta.csv"), index=False)
+            p.unlink()
+            converted += 1
+            depth += 1
+        elif is_delta(p):
+            depth += 1
+        elif is_ref(p):
+            # Een ref telt met de keten van zijn doel mee
+            depth = len(snapshot_deps(p))
+        else:
+            kept += 1
+            depth = 1
+        prev_text = cur
+    return converted, kept
@@ -0,0 +1,163 @@
+# utils/volume.py
+"""
+Staffelprijzen: kostprijs per stuk over een reeks ordergroottes (1, 10, 100, ...).
+
+De BOM beschrijft één stuk (zoals bij compute_costs). Bij een order van Q stuks:
+
+    materiaal  mass_kg · prijs(Q)            prijs volgt de quote-staffel op Q · kg/stuk
+    proces     runtime_h · tarief + setup_h · tarief / Q     insteltijd eenmalig per order
+
+en daarna overhead en marge zoals in compute_costs. De opzoekingen (materials,
+processes, routing, staffels) gebeuren één keer in VolumeModel; een curve is daarna
+één gebroadcaste (ordergroottes × regels)-bewerking.
+
+Staffels komen uit quotes met een kolom `min_qty_kg`: vanaf die hoeveelheid (kg van dat
+materiaal in de hele order) geldt de quoteprijs, als die lager is dan de basisprijs.
+best_quotes/apply_best_quotes laten staffelquotes buiten de basisprijs, dus dezelfde
+quotetabel kan voor beide worden gebruikt.
+Zonder setup en staffels is de curve vlak en gelijk aan compute_costs.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .pricing import COST_COLUMNS, cost_model
+from .quotes import BREAK_COLUMN, tier_mask
+from .routing import explode_routes
+
+QUANTITIES = (1, 10, 100, 1_000, 10_000)
+
+
+@dataclass
+class VolumeCurve:
+    lines: pd.DataFrame  # lang: per ordergrootte × regel de kosten per stuk
+    totals: pd.DataFrame  # per ordergrootte: kosten per stuk + ordertotaal
+
+
+def _num(s: pd.Series) -> np.ndarray:
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _setup_hours(
+    lines: pd.DataFrame, routing: Optional[pd.DataFrame], routes: Optional[pd.DataFrame]
+) -> np.ndarray:
+    """
+    setup_h per regel uit routing (process_id, setup_h); eerste rij per proces, anders 0.
+    Bij een meerstapsroute de som over de bewerkingen.
+    """
+    if routing is None or "setup_h" not in routing.columns:
+        return np.zeros(len(lines))
+    first = routing.drop_duplicates("process_id")
+    ids = pd.Index(first["process_id"])
+    ops = explode_routes(lines["process_route"], routes, ids)
+    pos = ids.get_indexer(ops.process_id)
+    setup = np.nan_to_num(_num(first["setup_h"]))
+    per_op = np.where(pos >= 0, setup[np.maximum(pos, 0)], 0.0)
+    return np.bincount(ops.line, weights=per_op, minlength=len(lines))
+
+
+class VolumeModel:
+    """Voorbereide staffelcalculatie van één BOM; curve() per reeks ordergroottes."""
+
+    def __init__(
+        self,
+        mats: pd.DataFrame,
+        procs: pd.DataFrame,
+        bom: pd.DataFrame,
+        quotes: Optional[pd.DataFrame] = None,
+        routing: Optional[pd.DataFrame] = None,
+        routes: Optional[pd.DataFrame] = None,
+    ):
+        self.base = cost_model(mats, procs, routes).costs(bom)
+        b = self.base
+        self.mass = _num(b["mass_kg"])
+        self.price = _num(b["price_eur_per_kg"])
+        self.rate = _num(b["machine_rate_eur_h"]) + _num(b["labor_rate_eur_h"])
+        self.runtime = _num(b["runtime_h"])
+        self.overhead = _num(b["overhead_pct"])
+        self.margin = _num(b["margin_pct"])
+        self.setup_h = _setup_hours(b, routing, routes)
+
+        # kg per stuk per materiaal (over alle regels): bepaalt de staffel bij Q stuks
+        self._mcodes, self._muniq = pd.factorize(b["material_id"])
+        self._kg = np.bincount(
+            self._mcodes[self._mcodes >= 0],
+            weights=np.nan_to_num(self.mass[self._mcodes >= 0]),
+            minlength=len(self._muniq),
+        )
+        self._breaks = self._tiers(quotes)
+
+    def _tiers(self, quotes: Optional[pd.DataFrame]):
+        """Staffels als arrays: (materiaalcode, drempel kg, prijs) per quoterij."""
+        empty = (np.empty(0, np.intp), np.empty(0), np.empty(0))
+        if quotes is None or BREAK_COLUMN not in quotes.columns or not len(self._muniq):
+            return empty
+        mins, price = _num(quotes[BREAK_COLUMN]), _num(quotes["price_eur_per_kg"])
+        codes = pd.Index(self._muniq).get_indexer(quotes["material_id"])
+        keep = (codes >= 0) & tier_mask(quotes) & ~np.isnan(price)
+        return codes[keep], mins[keep], price[keep]
+
+    def prices(self, quantities: Sequence[float]) -> np.ndarray:
+        """(ordergroottes × regels): materiaalprijs per regel bij elke ordergrootte."""
+        qs = np.asarray(quantities, dtype=float)
+        codes, mins, price = self._breaks
+        # Laagste bereikte staffelprijs per materiaal; inf = geen staffel bereikt. De
+        # laatste kolom vangt code -1 (onbekend materiaal) op en blijft inf.
+        tier_price = np.full((len(qs), len(self._muniq) + 1), np.inf)
+        qi, ti = np.nonzero(mins[None, :] <= qs[:, None] * self._kg[codes][None, :])
+        np.minimum.at(tier_price, (qi, codes[ti]), price[ti])
+        return np.minimum(self.price, tier_price[:, self._mcodes])
+
+    def curve(self, quantities: Sequence[float] = QUANTITIES) -> VolumeCurve:
+        qs = np.asarray(quantities, dtype=float)
+        if (qs <= 0).any():
+            raise ValueError("Ordergroottes moeten > 0 zijn.")
+        q = qs[:, None]
+        price = self.prices(qs)
+        cost = {"material_cost": self.mass * price}
+        setup = self.setup_h * self.rate / q
+        cost["process_cost"] = self.runtime * self.rate + setup
+        cost["overhead"] = (cost["material_cost"] + cost["process_cost"]) * self.overhead
+        cost["base_cost"] = cost["material_cost"] + cost["process_cost"] + cost["overhead"]
+        cost["margin"] = cost["base_cost"] * self.margin
+        cost["total_cost"] = cost["base_cost"] + cost["margin"]
+
+        shape = price.shape
+        # Regels herhaald per ordergrootte; id-kolommen behouden hun dtype (take op de array)
+        rows = np.tile(np.arange(len(self.base)), len(qs))
+        cols = {"order_qty": np.repeat(qs, shape[1])}
+        for c in ("line_id", "material_id", "process_route"):
+            if c in self.base.columns:
+                cols[c] = self.base[c].array.take(rows)
+        cols["price_eur_per_kg"] = price.ravel()
+        cols["setup_cost"] = np.broadcast_to(setup, shape).ravel()
+        for c in COST_COLUMNS:
+            cols[c] = np.broadcast_to(cost[c], shape).ravel()
+        cols["order_total"] = cols["total_cost"] * cols["order_qty"]
+        lines = pd.DataFrame(cols, copy=False)
+
+        totals = pd.DataFrame({"order_qty": qs})
+        # Regels met een NaN-totaal tellen, zoals bij DataFrame.sum, niet mee
+        totals["setup_cost"] = np.nansum(np.broadcast_to(setup, shape), axis=1)
+        for c in COST_COLUMNS:
+            totals[c] = np.nansum(np.broadcast_to(cost[c], shape), axis=1)
+        totals["order_total"] = totals["total_cost"] * qs
+        return VolumeCurve(lines=lines, totals=totals)
+
+
+def volume_curve(
+    mats: pd.DataFrame,
+    procs: pd.DataFrame,
+    bom: pd.DataFrame,
+    quantities: Sequence[float] = QUANTITIES,
+    quotes: Optional[pd.DataFrame] = None,
+    routing: Optional[pd.DataFrame] = None,
+    routes: Optional[pd.DataFrame] = None,
+) -> VolumeCurve:
+    """Kosten per stuk (per regel en totaal) voor elke ordergrootte in `quantities`."""
+    return VolumeModel(mats, procs, bom, quotes, routing, routes).curve(quantities)